@@ -1,16 +1,35 @@
 import os
-from fastapi import FastAPI
+from contextlib import asynccontextmanager
+from fastapi import FastAPI, Request
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse
 from app.routes import all_routes
+from app.routes.chat import init_chat_model
+from app.services.admission import OverloadedError, retry_after_header
+from app.services.pension_simulation import shutdown_simulation_pool
+from app.services.price_client import close_price_client
 from dotenv import load_dotenv
 
 # Load environment variables
 load_dotenv()
 
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Build the chat model handle once instead of per request
+    init_chat_model()
+    yield
+    # Release pooled upstream connections
+    await close_price_client()
+    # Stop Monte Carlo worker processes
+    shutdown_simulation_pool()
+
+
 app = FastAPI(
     title="SafeSpend API",
     description="Islamic Finance Calculator API",
-    version="1.0.0"
+    version="1.0.0",
+    lifespan=lifespan
 )
 
 # CORS setup - allow local development and Vercel deployments
@@ -36,6 +55,15 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Calls shed by an upstream concurrency limiter become a 503 with a retry hint
+@app.exception_handler(OverloadedError)
+async def overloaded_handler(request: Request, exc: OverloadedError):
+    return JSONResponse(
+        status_code=503,
+        content={"detail": f"Service is busy, please retry shortly ({exc.name})"},
+        headers=retry_after_header(exc.retry_after)
+    )
+
 # Health check endpoint
 @app.get("/")
 async def root():
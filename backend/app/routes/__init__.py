@@ -9,6 +9,7 @@ from .partnership import router as partnership_router
 from .pension import router as pension_router
 from .prices import router as prices_router
 from .chat import router as chat_router
+from .sweep import router as sweep_router
 
 all_routes = [
     zakat_router, 
@@ -21,5 +22,6 @@ all_routes = [
     partnership_router, 
     pension_router,
     prices_router,
-    chat_router
+    chat_router,
+    sweep_router
 ]
@@ -1,17 +1,35 @@
-from fastapi import APIRouter, HTTPException
+from fastapi import APIRouter, Depends, HTTPException
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel
 from typing import List, Optional
+import json
 import os
 from pathlib import Path
 from dotenv import load_dotenv
 import google.generativeai as genai
 
+from app.services.admission import (
+    LeasedStreamingResponse,
+    OverloadedError,
+    create_concurrency_limiter,
+    create_rate_limiter,
+    rate_limit
+)
+from app.services.calculator_intents import answer_calculator_question
+from app.services.chat_cache import create_chat_cache
+from app.services.chat_context import create_conversation_context
+from app.services.llm import create_llm
+from app.services.retrieval import load_knowledge_base
+
 # Load environment variables from the backend folder's .env file
 backend_dir = Path(__file__).resolve().parent.parent.parent
 env_path = backend_dir / ".env"
 load_dotenv(dotenv_path=env_path)
 
-router = APIRouter(tags=["chat"])
+# Each client gets one chat request a second with bursts of 10 (CHAT_RATE_LIMIT_*)
+chat_rate_limiter = create_rate_limiter("chat", rate=1.0, burst=10.0)
+
+router = APIRouter(tags=["chat"], dependencies=[Depends(rate_limit(chat_rate_limiter))])
 
 # Configure Gemini API
 GEMINI_API_KEY = os.getenv("GEMINI_API_KEY")
@@ -30,10 +48,15 @@ class ChatMessage(BaseModel):
 class ChatRequest(BaseModel):
     message: str
     history: Optional[List[ChatMessage]] = []
+    # Lets the server cache the rolling summary of older turns between requests
+    conversation_id: Optional[str] = None
 
 
 class ChatResponse(BaseModel):
     reply: str
+    cached: bool = False
+    # "llm", "cache", "faq" (local knowledge base) or "calculator" (computed locally)
+    source: str = "llm"
 
 
 SYSTEM_PROMPT = """You are an Islamic finance assistant.
@@ -42,44 +65,162 @@ If the question is unrelated, respond with exactly: "I can only assist with Isla
 Be concise and helpful."""
 
 
+# Model handle is built once (at startup) and shared by every request
+_llm = None
+
+# Replies to repeated questions are served from cache instead of Gemini
+reply_cache = create_chat_cache()
+
+# Keeps prompts inside a fixed token budget however long the conversation gets
+conversation_context = create_conversation_context()
+
+# Local index over the calculator docs and a curated FAQ
+knowledge_base = load_knowledge_base()
+
+# At most 8 LLM calls in flight; up to 32 more may queue for 10 seconds (GEMINI_MAX_CONCURRENCY etc.)
+llm_limiter = create_concurrency_limiter("gemini", max_concurrency=8, max_queue=32, queue_budget=10.0)
+
+
+def init_chat_model():
+    """Create the shared LLM handle"""
+    global _llm
+    _llm = create_llm(GEMINI_API_KEY)
+    return _llm
+
+
+def get_llm():
+    """Return the shared LLM handle, or a 503 if chat is not configured"""
+    if _llm is None:
+        # Serverless runtimes may skip the startup hook
+        init_chat_model()
+    if _llm is None:
+        raise HTTPException(
+            status_code=503,
+            detail="Chat service is not configured. Please set GEMINI_API_KEY environment variable."
+        )
+    return _llm
+
+
+def build_prompt(request: ChatRequest, references: List[str] = ()) -> str:
+    """Create the prompt with system instruction and history, within the token budget"""
+    return conversation_context.build_prompt(
+        SYSTEM_PROMPT,
+        request.history or [],
+        request.message,
+        request.conversation_id,
+        references
+    )
+
+
+def retrieve(message: str):
+    """Look the message up in the knowledge base: (direct answer or None, reference passages)"""
+    if knowledge_base is None:
+        return None, []
+    result = knowledge_base.lookup(message)
+    references = [f"{p.title}: {p.text}" for p in result.passages]
+    return result.answer, references
+
+
+def sse_event(data: dict, event: Optional[str] = None) -> str:
+    """Format one Server-Sent Event"""
+    prefix = f"event: {event}\n" if event else ""
+    return f"{prefix}data: {json.dumps(data)}\n\n"
+
+
 @router.post("/chat", response_model=ChatResponse)
 async def chat(request: ChatRequest):
     """
     Chat endpoint that proxies requests to Gemini API.
     Keeps API key secure on the server side.
     """
-    if not GEMINI_API_KEY:
-        raise HTTPException(
-            status_code=503,
-            detail="Chat service is not configured. Please set GEMINI_API_KEY environment variable."
-        )
+    # Calculator questions are answered with exact figures from the calculators themselves
+    calculator_reply = await answer_calculator_question(request.message)
+    if calculator_reply is not None:
+        return ChatResponse(reply=calculator_reply, source="calculator")
+    
+    cache_key = reply_cache.make_key(request.message, request.history or [])
+    cached_reply = reply_cache.get(cache_key)
+    if cached_reply is not None:
+        return ChatResponse(reply=cached_reply, cached=True, source="cache")
+    
+    # Confident FAQ matches are answered locally; otherwise the top passages go to the LLM
+    faq_answer, references = retrieve(request.message)
+    if faq_answer is not None:
+        return ChatResponse(reply=faq_answer, source="faq")
+    
+    llm = get_llm()
     
     try:
-        model = genai.GenerativeModel("models/gemini-2.5-flash")
-        
-        # Build conversation history for context
-        history_text = ""
-        for msg in request.history:
-            role = "User" if msg.role == "user" else "Assistant"
-            history_text += f"{role}: {msg.text}\n"
-        
-        # Create the prompt with system instruction and history
-        full_prompt = f"""{SYSTEM_PROMPT}
-
-Conversation history:
-{history_text}
-
-User: {request.message}
-
-Please respond helpfully:"""
-        
-        response = model.generate_content(full_prompt)
-        reply = response.text.strip()
+        async with llm_limiter.slot():
+            reply = await llm.generate(build_prompt(request, references))
+        reply_cache.put(cache_key, reply)
         
         return ChatResponse(reply=reply)
         
+    except OverloadedError:
+        raise
     except Exception as e:
         raise HTTPException(
             status_code=500,
             detail=f"Error generating response: {str(e)}"
-        )
\ No newline at end of file
+        )
+
+
+@router.post("/chat/stream")
+async def chat_stream(request: ChatRequest):
+    """
+    Streaming chat endpoint.
+    Sends the reply as Server-Sent Events: one `data: {"text": ...}` event per
+    chunk, then an `event: done` event (or `event: error` if generation fails).
+    """
+    local_reply = await answer_calculator_question(request.message)
+    source = "calculator"
+    if local_reply is None:
+        cache_key = reply_cache.make_key(request.message, request.history or [])
+        local_reply = reply_cache.get(cache_key)
+        source = "cache"
+    if local_reply is None:
+        local_reply, references = retrieve(request.message)
+        source = "faq"
+    
+    headers = {"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    if local_reply is not None:
+        async def events():
+            yield sse_event({"text": local_reply})
+            yield sse_event({"cached": source == "cache", "source": source}, event="done")
+        return StreamingResponse(events(), media_type="text/event-stream", headers=headers)
+
+    llm = get_llm()
+    prompt = build_prompt(request, references)
+    
+    # Take the LLM slot before the response starts, so an overload is still a plain 503.
+    # The response gives the slot back however it ends, even if the body never starts.
+    lease = await llm_limiter.lease()
+    
+    async def events():
+        parts = []
+        try:
+            async for text in llm.stream(prompt):
+                parts.append(text)
+                yield sse_event({"text": text})
+        except Exception as e:
+            yield sse_event({"detail": f"Error generating response: {str(e)}"}, event="error")
+            return
+        finally:
+            # Free the slot as soon as generation stops, not when the connection closes
+            lease.release()
+        # Only complete replies are cached
+        reply_cache.put(cache_key, "".join(parts).strip())
+        yield sse_event({}, event="done")
+    
+    return LeasedStreamingResponse(events(), lease, media_type="text/event-stream", headers=headers)
+
+
+@router.get("/chat/cache-stats")
+async def get_chat_cache_stats():
+    """Report size and hit-rate counters for the reply cache, and LLM admission counters"""
+    return {
+        **reply_cache.stats(),
+        "llm_limit": llm_limiter.stats(),
+        "rate_limit": chat_rate_limiter.stats()
+    }
@@ -1,9 +1,38 @@
 from fastapi import APIRouter, HTTPException
-from pydantic import BaseModel
+from pydantic import BaseModel, Field
+from typing import List
 from math import ceil
+import numpy as np
+
+from app.services.irr import IRR_MAX_PERIODS, annualize, payment_flows, rounded_rate, solve_irr
 
 router = APIRouter()
 
+# Months between installments for each payment schedule (lump-sum pays once, at delivery)
+PAYMENT_INTERVAL_MONTHS = {
+    "monthly": 1,
+    "quarterly": 3,
+    "semi-annual": 6
+}
+
+# Longest delivery period the effective rate is solved for (the solver works on a month
+# grid this wide); single quotes past it leave effective_annual_rate empty, batches reject them
+MAX_DELIVERY_MONTHS = IRR_MAX_PERIODS
+
+DELIVERY_ERROR = "delivery_period_months must be positive"
+
+BATCH_DELIVERY_ERROR = f"delivery_period_months must be between 1 and {MAX_DELIVERY_MONTHS}"
+
+def calculate_istisna_effective_rate(funded_amount, installment_amount, number_of_payments, interval_months):
+    """
+    Effective annual rate (%) of istisna installments against the amount funded
+    (cost and additional costs less the advance), first installment one interval in.
+    Works element-wise on NumPy arrays; NaN where no rate exists.
+    """
+    flows = payment_flows(funded_amount, installment_amount, number_of_payments, interval_months, interval_months)
+    # Nothing is funded when the advance covers the costs
+    return np.where(np.atleast_1d(funded_amount) > 0, annualize(solve_irr(flows)) * 100, np.nan)
+
 class IstisnaInput(BaseModel):
     manufacturing_cost: float
     profit_margin_percentage: float
@@ -14,6 +43,9 @@ class IstisnaInput(BaseModel):
 
 @router.post("/istisna")
 async def calculate_istisna(data: IstisnaInput):
+    if data.delivery_period_months < 1:
+        raise HTTPException(status_code=400, detail=DELIVERY_ERROR)
+
     try:
         # Extract values
         cost = data.manufacturing_cost
@@ -29,9 +61,7 @@ async def calculate_istisna(data: IstisnaInput):
 
         # Calculate number of payments
         frequency_map = {
-            "monthly": 1,
-            "quarterly": 3,
-            "semi-annual": 6,
+            **PAYMENT_INTERVAL_MONTHS,
             "lump-sum": delivery_months  # single payment at end
         }
 
@@ -47,6 +77,14 @@ async def calculate_istisna(data: IstisnaInput):
         # Installment amount
         installment_amount = financed_amount / number_of_payments if number_of_payments > 0 else financed_amount
 
+        # Annualized rate that allows for the timing of the installments (comparable to a loan APR)
+        effective_annual_rate = calculate_istisna_effective_rate(
+            cost + additional - advance,
+            installment_amount,
+            number_of_payments,
+            interval
+        )[0] if interval * number_of_payments <= MAX_DELIVERY_MONTHS else np.nan
+
         return {
             "total_sale_price": round(total_sale_price, 2),
             "advance_payment": round(advance, 2),
@@ -54,8 +92,43 @@ async def calculate_istisna(data: IstisnaInput):
             "installment_amount": round(installment_amount, 2),
             "number_of_payments": number_of_payments,
             "profit_amount": round(profit_amount, 2),
-            "payment_schedule": schedule
+            "payment_schedule": schedule,
+            "effective_annual_rate": rounded_rate(effective_annual_rate)
         }
 
     except Exception as e:
         raise HTTPException(status_code=400, detail=f"Calculation failed: {str(e)}")
+
+class IstisnaBatchInput(BaseModel):
+    contracts: List[IstisnaInput] = Field(min_length=1)
+
+@router.post("/istisna/effective-rate")
+async def calculate_istisna_effective_rates(data: IstisnaBatchInput):
+    """Effective annual rate (%) of many istisna contracts, solved together"""
+    contracts = data.contracts
+    invalid = [i for i, c in enumerate(contracts) if c.payment_schedule not in PAYMENT_INTERVAL_MONTHS and c.payment_schedule != "lump-sum"]
+    if invalid:
+        raise HTTPException(status_code=400, detail=f"Invalid payment schedule in contract {invalid[0]}")
+    invalid = [i for i, c in enumerate(contracts) if not 1 <= c.delivery_period_months <= MAX_DELIVERY_MONTHS]
+    if invalid:
+        raise HTTPException(status_code=400, detail=f"Contract {invalid[0]}: {BATCH_DELIVERY_ERROR}")
+
+    def column(name):
+        return np.array([getattr(c, name) for c in contracts], dtype=np.float64)
+
+    cost = column("manufacturing_cost")
+    additional = column("additional_costs")
+    advance = column("advance_payment")
+    delivery_months = column("delivery_period_months")
+    lump_sum = np.array([c.payment_schedule == "lump-sum" for c in contracts])
+
+    interval = np.where(lump_sum, delivery_months, [PAYMENT_INTERVAL_MONTHS.get(c.payment_schedule, 1) for c in contracts])
+    number_of_payments = np.where(lump_sum, 1, np.ceil(delivery_months / np.maximum(interval, 1))).astype(np.int64)
+    financed_amount = cost * (1 + column("profit_margin_percentage") / 100) + additional - advance
+    installment_amount = financed_amount / np.maximum(number_of_payments, 1)
+
+    rates = calculate_istisna_effective_rate(cost + additional - advance, installment_amount, number_of_payments, interval)
+    return {
+        "count": len(rates),
+        "effective_annual_rate": [rounded_rate(r) for r in rates]
+    }
@@ -1,8 +1,14 @@
 # leasing.py
 
-from fastapi import APIRouter, HTTPException
+from fastapi import APIRouter, HTTPException, Request
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel, Field
-from typing import Dict, Any, Optional
+from typing import Dict, Any, Iterator, List, Literal, Optional
+import io
+import numpy as np
+
+from app.services.columnar import parse_numeric_csv
+from app.services.irr import IRR_MAX_PERIODS, annualize, payment_flows, rounded_rate, solve_irr
 
 router = APIRouter()
 
@@ -42,6 +48,28 @@ def calculate_monthly_payment(depreciation_payment: float, finance_payment: floa
     """Calculate total monthly lease payment"""
     return depreciation_payment + finance_payment + monthly_tax
 
+def calculate_lease_effective_rate(
+    capitalized_cost: float,
+    depreciation_payment: float,
+    finance_payment: float,
+    residual_value: float,
+    lease_term_months: int
+) -> float:
+    """
+    Effective annual rate (%) of a lease: pre-tax payments in advance (months 0 to
+    term - 1) and the residual value at the end, against the capitalized cost.
+    Works element-wise on NumPy arrays; NaN where no rate exists.
+    """
+    flows = payment_flows(
+        capitalized_cost,
+        np.add(depreciation_payment, finance_payment),
+        lease_term_months,
+        0,
+        balloon=residual_value,
+        balloon_period=lease_term_months
+    )
+    return np.where(np.atleast_1d(capitalized_cost) > 0, annualize(solve_irr(flows)) * 100, np.nan)
+
 def calculate_due_at_signing(
     first_month_payment: float,
     down_payment: float,
@@ -118,6 +146,7 @@ class LeasingResponse(BaseModel):
     # Financial Details
     money_factor: float
     annual_interest_rate: float
+    effective_annual_rate: Optional[float] = None
     
     # Total Costs
     due_at_signing: float
@@ -194,6 +223,15 @@ def calculate_leasing(data: LeasingRequest) -> Dict[str, Any]:
             data.maintenance_package
         )
         
+        # Annualized rate from the payment timing (comparable to a loan APR)
+        effective_annual_rate = calculate_lease_effective_rate(
+            capitalized_cost,
+            depreciation_payment,
+            finance_payment,
+            residual_value,
+            data.lease_term_months
+        )[0] if data.lease_term_months <= IRR_MAX_PERIODS else np.nan
+        
         # Additional calculations
         monthly_mileage_limit = data.annual_mileage / 12
         
@@ -223,6 +261,7 @@ def calculate_leasing(data: LeasingRequest) -> Dict[str, Any]:
             # Financial Details
             "money_factor": round(money_factor, 6),
             "annual_interest_rate": round(annual_interest_rate, 2),
+            "effective_annual_rate": rounded_rate(effective_annual_rate),
             
             # Total Costs
             "due_at_signing": round(due_at_signing, 2),
@@ -256,4 +295,238 @@ def convert_rate(interest_rate: Optional[float] = None, money_factor: Optional[f
             "interest_rate": convert_money_factor_to_interest_rate(money_factor)
         }
     else:
-        raise HTTPException(status_code=400, detail="Either interest_rate or money_factor must be provided")
\ No newline at end of file
+        raise HTTPException(status_code=400, detail="Either interest_rate or money_factor must be provided")
+
+# Lease schedules
+# The per-lease helpers above are plain arithmetic, so they also work element-wise
+# on NumPy arrays (one element per vehicle)
+
+LEASE_SCHEDULE_COLUMNS = [
+    "vehicle",
+    "month",
+    "depreciation",
+    "rent_charge",
+    "tax",
+    "payment",
+    "remaining_balance",
+    "cumulative_paid"
+]
+
+# Vehicles per streamed chunk (at most 84 rows each), keeping memory flat for whole fleets
+SCHEDULE_CHUNK_VEHICLES = 500
+
+SCHEDULE_ROW_FORMATS = {
+    "csv": "%d,%d,%.2f,%.2f,%.2f,%.2f,%.2f,%.2f",
+    "ndjson": "{" + ",".join(
+        f'"{c}":%d' if c in ("vehicle", "month") else f'"{c}":%.2f' for c in LEASE_SCHEDULE_COLUMNS
+    ) + "}"
+}
+
+SCHEDULE_MEDIA_TYPES = {
+    "csv": "text/csv",
+    "ndjson": "application/x-ndjson"
+}
+
+def calculate_lease_terms(
+    vehicle_price: np.ndarray,
+    down_payment: np.ndarray,
+    trade_in_value: np.ndarray,
+    lease_term_months: np.ndarray,
+    residual_value_percentage: np.ndarray,
+    money_factor: np.ndarray,
+    sales_tax_rate: np.ndarray
+) -> Dict[str, np.ndarray]:
+    """Calculate the fixed monthly lease terms for many vehicles at once"""
+    capitalized_cost = calculate_capitalized_cost(vehicle_price, down_payment, trade_in_value)
+    residual_value = calculate_residual_value(vehicle_price, residual_value_percentage)
+    total_depreciation = calculate_depreciation(capitalized_cost, residual_value)
+    depreciation_payment = calculate_depreciation_payment(total_depreciation, lease_term_months)
+    finance_payment = calculate_finance_payment(capitalized_cost, residual_value, money_factor)
+    monthly_tax = calculate_monthly_tax(depreciation_payment, finance_payment, sales_tax_rate)
+    
+    return {
+        "capitalized_cost": capitalized_cost,
+        "residual_value": residual_value,
+        "depreciation_payment": depreciation_payment,
+        "finance_payment": finance_payment,
+        "monthly_tax": monthly_tax,
+        "monthly_payment": calculate_monthly_payment(depreciation_payment, finance_payment, monthly_tax)
+    }
+
+def calculate_lease_schedule(terms: Dict[str, np.ndarray], lease_term_months: np.ndarray, first_vehicle: int = 0) -> Dict[str, np.ndarray]:
+    """
+    Expand per-vehicle lease terms into month-by-month schedule columns.
+    Rows run vehicle by vehicle, one row per month of each vehicle's term.
+    """
+    terms_months = np.asarray(lease_term_months, dtype=np.int64)
+    
+    # Row -> vehicle index, and month number within that vehicle's term
+    vehicle = np.repeat(np.arange(len(terms_months)), terms_months)
+    starts = np.cumsum(terms_months) - terms_months
+    month = np.arange(len(vehicle)) - np.repeat(starts, terms_months) + 1
+    
+    depreciation = terms["depreciation_payment"][vehicle]
+    payment = terms["monthly_payment"][vehicle]
+    
+    return {
+        "vehicle": vehicle + first_vehicle,
+        "month": month,
+        "depreciation": depreciation,
+        "rent_charge": terms["finance_payment"][vehicle],
+        "tax": terms["monthly_tax"][vehicle],
+        "payment": payment,
+        "remaining_balance": terms["capitalized_cost"][vehicle] - depreciation * month,
+        "cumulative_paid": payment * month
+    }
+
+def resolve_money_factors(money_factor: np.ndarray, interest_rate: np.ndarray) -> np.ndarray:
+    """Per-vehicle money factor, converted from the interest rate where none is given (NaN = missing)"""
+    missing = np.isnan(money_factor) & np.isnan(interest_rate)
+    if missing.any():
+        raise HTTPException(
+            status_code=400,
+            detail=f"Vehicle {int(np.argmax(missing))}: either money_factor or interest_rate must be provided"
+        )
+    return np.where(np.isnan(money_factor), convert_interest_rate_to_money_factor(interest_rate), money_factor)
+
+def iter_schedule_chunks(fleet: Dict[str, np.ndarray]) -> Iterator[Dict[str, np.ndarray]]:
+    """Yield schedule columns a chunk of vehicles at a time"""
+    for start in range(0, len(fleet["vehicle_price"]), SCHEDULE_CHUNK_VEHICLES):
+        chunk = {k: v[start:start + SCHEDULE_CHUNK_VEHICLES] for k, v in fleet.items()}
+        terms = calculate_lease_terms(
+            chunk["vehicle_price"],
+            chunk["down_payment"],
+            chunk["trade_in_value"],
+            chunk["lease_term_months"],
+            chunk["residual_value_percentage"],
+            chunk["money_factor"],
+            chunk["sales_tax_rate"]
+        )
+        yield calculate_lease_schedule(terms, chunk["lease_term_months"], first_vehicle=start)
+
+def stream_schedule(fleet: Dict[str, np.ndarray], fmt: str) -> Iterator[str]:
+    """Render schedule chunks as CSV (with header) or NDJSON text"""
+    if fmt == "csv":
+        yield ",".join(LEASE_SCHEDULE_COLUMNS) + "\n"
+    for columns in iter_schedule_chunks(fleet):
+        buffer = io.StringIO()
+        np.savetxt(buffer, np.column_stack([columns[c] for c in LEASE_SCHEDULE_COLUMNS]), fmt=SCHEDULE_ROW_FORMATS[fmt])
+        yield buffer.getvalue()
+
+def lease_schedule_response(fleet: Dict[str, np.ndarray], fmt: str):
+    """Validate fleet columns and return the schedule as columnar JSON or a CSV/NDJSON stream"""
+    fleet["lease_term_months"] = fleet["lease_term_months"].astype(np.int64)
+    if (fleet["vehicle_price"] <= 0).any() or (fleet["lease_term_months"] <= 0).any():
+        raise HTTPException(status_code=400, detail="vehicle_price and lease_term_months must be positive")
+    
+    if fmt in SCHEDULE_ROW_FORMATS:
+        return StreamingResponse(stream_schedule(fleet, fmt), media_type=SCHEDULE_MEDIA_TYPES[fmt])
+    
+    columns = {c: [] for c in LEASE_SCHEDULE_COLUMNS}
+    for chunk in iter_schedule_chunks(fleet):
+        for c in LEASE_SCHEDULE_COLUMNS:
+            values = chunk[c] if c in ("vehicle", "month") else np.round(chunk[c], 2)
+            columns[c].extend(values.tolist())
+    return {"count": len(columns["month"]), "columns": columns}
+
+class LeaseScheduleRequest(BaseModel):
+    vehicles: List[LeasingRequest] = Field(min_length=1, description="One lease per vehicle")
+
+@router.post("/leasing/schedule")
+def calculate_lease_schedule_fleet(
+    data: LeaseScheduleRequest,
+    format: Literal["json", "ndjson", "csv"] = "json"
+):
+    """
+    Month-by-month schedule (depreciation, rent charge, tax, remaining capitalized
+    balance and cumulative paid) for one or more leases.
+    Use format=ndjson or format=csv to stream large fleets.
+    """
+    vehicles = data.vehicles
+    
+    def column(name):
+        return np.array([getattr(v, name) for v in vehicles], dtype=np.float64)
+    
+    fleet = {
+        c: column(c)
+        for c in ("vehicle_price", "down_payment", "trade_in_value", "lease_term_months", "residual_value_percentage", "sales_tax_rate")
+    }
+    fleet["money_factor"] = resolve_money_factors(
+        np.array([np.nan if v.money_factor is None else v.money_factor for v in vehicles]),
+        np.array([np.nan if v.interest_rate is None else v.interest_rate for v in vehicles])
+    )
+    return lease_schedule_response(fleet, format)
+
+LEASE_FLEET_CSV_COLUMNS = [
+    "vehicle_price",
+    "down_payment",
+    "trade_in_value",
+    "lease_term_months",
+    "residual_value_percentage",
+    "money_factor",
+    "interest_rate",
+    "sales_tax_rate"
+]
+
+@router.post("/leasing/schedule/csv")
+async def calculate_lease_schedule_csv(
+    request: Request,
+    format: Literal["json", "ndjson", "csv"] = "csv"
+):
+    """
+    Schedule for a fleet uploaded as a CSV request body, one vehicle per row.
+    Columns: vehicle_price and lease_term_months (required), money_factor or
+    interest_rate, and optionally down_payment, trade_in_value,
+    residual_value_percentage (default 60) and sales_tax_rate.
+    """
+    
+    try:
+        text = (await request.body()).decode("utf-8")
+        fleet = parse_numeric_csv(
+            text,
+            LEASE_FLEET_CSV_COLUMNS,
+            required=("vehicle_price", "lease_term_months"),
+            defaults={"residual_value_percentage": 60.0, "money_factor": np.nan, "interest_rate": np.nan}
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=f"Invalid CSV: {str(e)}")
+    
+    fleet["money_factor"] = resolve_money_factors(fleet["money_factor"], fleet.pop("interest_rate"))
+    return lease_schedule_response(fleet, format)
+
+@router.post("/leasing/effective-rate")
+def calculate_lease_effective_rates(data: LeaseScheduleRequest):
+    """Effective annual rate (%) of many leases, solved together"""
+    vehicles = data.vehicles
+    # The solver works on a month grid IRR_MAX_PERIODS wide
+    invalid = [i for i, v in enumerate(vehicles) if v.lease_term_months > IRR_MAX_PERIODS]
+    if invalid:
+        raise HTTPException(status_code=400, detail=f"Vehicle {invalid[0]}: lease_term_months must be at most {IRR_MAX_PERIODS}")
+    
+    def column(name):
+        return np.array([getattr(v, name) for v in vehicles], dtype=np.float64)
+    
+    money_factor = resolve_money_factors(
+        np.array([np.nan if v.money_factor is None else v.money_factor for v in vehicles]),
+        np.array([np.nan if v.interest_rate is None else v.interest_rate for v in vehicles])
+    )
+    terms = calculate_lease_terms(
+        column("vehicle_price"),
+        column("down_payment"),
+        column("trade_in_value"),
+        column("lease_term_months"),
+        column("residual_value_percentage"),
+        money_factor,
+        column("sales_tax_rate")
+    )
+    rates = calculate_lease_effective_rate(
+        terms["capitalized_cost"],
+        terms["depreciation_payment"],
+        terms["finance_payment"],
+        terms["residual_value"],
+        column("lease_term_months")
+    )
+    return {
+        "count": len(rates),
+        "effective_annual_rate": [rounded_rate(r) for r in rates]
+    }
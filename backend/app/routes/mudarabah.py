@@ -1,7 +1,13 @@
-from fastapi import APIRouter, HTTPException
+from fastapi import APIRouter, HTTPException, Request
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel, Field, field_validator, model_validator
-from typing import Dict, Any
+from typing import Dict, Any, Iterator, List, Literal, Optional
+from datetime import date
+import io
 import logging
+import numpy as np
+
+from app.services.columnar import parse_date_column, parse_numeric_csv
 
 # Configure logging for this module
 logger = logging.getLogger(__name__)
@@ -199,6 +205,323 @@ async def calculate_profit_sharing(data: ProfitSharingRequest) -> Dict[str, Any]
         logger.error(f"Unexpected error: {e}")
         raise HTTPException(status_code=500, detail=f"Error calculating profit sharing: {str(e)}")
 
+# Profit pools
+# Many depositors (Rabb-ul-Mal) share one pool managed by the bank (Mudarib).
+# Each account's share follows its daily product (sum of daily balances over the
+# period) times the weightage of its tier.
+
+def calculate_daily_products(
+    account: np.ndarray,
+    day: np.ndarray,
+    amount_minor: np.ndarray,
+    days: int
+) -> Dict[str, np.ndarray]:
+    """
+    Daily products from a ledger of signed amounts (minor units) posted on day
+    offsets 0..days-1. Amounts posted before the period belong on day 0.
+    Returns one entry per account, in account order, and the ledger row of each
+    account's last posting.
+    """
+    order = np.lexsort((day, account))
+    acc = account[order]
+    posted = day[order]
+    amounts = amount_minor[order]
+
+    first = np.ones(len(acc), dtype=bool)
+    first[1:] = acc[1:] != acc[:-1]
+    last = np.ones(len(acc), dtype=bool)
+    last[:-1] = first[1:]
+    group = np.cumsum(first) - 1
+    starts = np.flatnonzero(first)
+
+    # Running balance per account: one cumulative sum, restarted at each account
+    running = np.cumsum(amounts)
+    balance = running - (running[starts] - amounts[starts])[group]
+
+    # Each balance holds from its posting day until the account's next posting (or period end)
+    until = np.empty_like(posted)
+    until[:-1] = posted[1:]
+    until[last] = days
+    held = np.maximum(balance, 0) * (until - posted)
+
+    return {
+        "account": acc[starts],
+        "daily_product": np.bincount(group, weights=held / 100),
+        "closing_balance": balance[last] / 100,
+        "last_row": order[last]
+    }
+
+def distribute_pool(
+    daily_product: np.ndarray,
+    tier: np.ndarray,
+    tier_weights: np.ndarray,
+    days: int,
+    total_revenue: float,
+    total_expenses: float,
+    rabbul_mal_profit_ratio: float,
+    mudarib_profit_ratio: float,
+    mudarib_investment: float = 0.0
+) -> Dict[str, Any]:
+    """
+    Share a period's pool result among accounts.
+    Profit: the depositors' share (calculate_profit_distribution) is split by
+    weighted daily product. Loss: the capital providers bear it in proportion
+    to capital (calculate_loss_distribution), split by unweighted daily product.
+    """
+    net_profit = calculate_net_profit(total_revenue, total_expenses)
+    weighted_product = daily_product * tier_weights[tier]
+
+    depositors_profit, mudarib_profit = calculate_profit_distribution(net_profit, rabbul_mal_profit_ratio, mudarib_profit_ratio)
+
+    # Average capital over the period
+    depositor_capital = daily_product.sum() / days
+    depositors_loss, _ = calculate_loss_distribution(net_profit, depositor_capital, depositor_capital + mudarib_investment) if depositor_capital + mudarib_investment > 0 else (0, 0)
+
+    total_weighted = weighted_product.sum()
+    total_product = daily_product.sum()
+    profit_share = depositors_profit * weighted_product / total_weighted if total_weighted > 0 else np.zeros(len(daily_product))
+    loss_share = depositors_loss * daily_product / total_product if total_product > 0 else np.zeros(len(daily_product))
+
+    return {
+        "net_profit": net_profit,
+        "depositors_profit": depositors_profit,
+        "mudarib_profit": mudarib_profit,
+        "depositors_loss": depositors_loss,
+        "mudarib_loss": abs(min(net_profit, 0)) - depositors_loss,
+        "weighted_product": weighted_product,
+        "profit_share": profit_share,
+        "loss_share": loss_share
+    }
+
+POOL_ACCOUNT_COLUMNS = [
+    "account",
+    "tier",
+    "average_balance",
+    "closing_balance",
+    "daily_product",
+    "weighted_product",
+    "profit_share",
+    "loss_share"
+]
+
+POOL_ROW_FORMATS = {
+    "csv": "%d,%d,%.2f,%.2f,%.2f,%.2f,%.2f,%.2f",
+    "ndjson": "{" + ",".join(
+        f'"{c}":%d' if c in ("account", "tier") else f'"{c}":%.2f' for c in POOL_ACCOUNT_COLUMNS
+    ) + "}"
+}
+
+POOL_MEDIA_TYPES = {
+    "csv": "text/csv",
+    "ndjson": "application/x-ndjson"
+}
+
+# Accounts per streamed chunk
+POOL_CHUNK_ACCOUNTS = 100000
+
+class PoolParameters(BaseModel):
+    period_start: date
+    period_end: date = Field(description="Last day of the period (inclusive)")
+    total_revenue: float = Field(ge=0, description="Pool revenue for the period")
+    total_expenses: float = Field(ge=0, description="Pool expenses for the period")
+    rabbul_mal_profit_ratio: float = Field(ge=0, le=100, description="Depositors' profit share %")
+    mudarib_profit_ratio: float = Field(ge=0, le=100, description="Bank's (Mudarib) profit share %")
+    tier_weights: List[float] = Field(default=[1.0], min_length=1, description="Weightage of each tier, indexed by the ledger's tier column")
+    tier_names: Optional[List[str]] = Field(default=None, description="Optional display name of each tier")
+    mudarib_investment: float = Field(ge=0, default=0, description="Bank's own capital in the pool (bears its share of a loss)")
+
+    @model_validator(mode='after')
+    def validate_pool(self):
+        total = self.rabbul_mal_profit_ratio + self.mudarib_profit_ratio
+        if total != 100:
+            raise ValueError(f'Profit sharing ratios must sum to 100%, currently {total}%')
+        if self.period_end < self.period_start:
+            raise ValueError('period_end must not be before period_start')
+        if any(w < 0 for w in self.tier_weights):
+            raise ValueError('Tier weights must not be negative')
+        return self
+
+class PoolLedgerRequest(PoolParameters):
+    # Columnar ledger: one element per posting (positive = deposit, negative = withdrawal)
+    account: List[int]
+    tier: List[int]
+    date: List[date]
+    amount: List[float]
+
+def run_pool_distribution(
+    params: PoolParameters,
+    account: np.ndarray,
+    tier: np.ndarray,
+    posted: np.ndarray,
+    amount: np.ndarray,
+    fmt: str
+):
+    """Compute daily products and shares for a ledger, and render the summary or per-account stream"""
+    if len({len(account), len(tier), len(posted), len(amount)}) > 1:
+        raise HTTPException(status_code=400, detail="All ledger columns must have the same length")
+    if len(account) == 0:
+        raise HTTPException(status_code=400, detail="Ledger is empty")
+    tier_weights = np.asarray(params.tier_weights, dtype=np.float64)
+    if tier.min() < 0 or tier.max() >= len(tier_weights):
+        raise HTTPException(status_code=400, detail=f"Tier must be between 0 and {len(tier_weights) - 1}")
+
+    start = np.datetime64(params.period_start, "D")
+    days = int((np.datetime64(params.period_end, "D") - start).astype(int)) + 1
+    day = (posted - start).astype(np.int64)
+
+    # Postings after the period don't count; earlier ones form the opening balance
+    in_period = day < days
+    account, tier, day, amount = account[in_period], tier[in_period], np.maximum(day[in_period], 0), amount[in_period]
+    amount_minor = np.round(amount * 100).astype(np.int64)
+
+    products = calculate_daily_products(account.astype(np.int64), day, amount_minor, days)
+    account_tier = tier[products["last_row"]].astype(np.int64)
+    daily_product = products["daily_product"]
+
+    pool = distribute_pool(
+        daily_product,
+        account_tier,
+        tier_weights,
+        days,
+        params.total_revenue,
+        params.total_expenses,
+        params.rabbul_mal_profit_ratio,
+        params.mudarib_profit_ratio,
+        params.mudarib_investment
+    )
+    # Otherwise the depositors' share would be reported but paid to nobody
+    if pool["depositors_profit"] > 0 and pool["weighted_product"].sum() <= 0:
+        raise HTTPException(
+            status_code=400,
+            detail="No weighted depositor capital in the period to share the profit; check the posting dates and tier weights"
+        )
+
+    columns = {
+        "account": products["account"],
+        "tier": account_tier,
+        "average_balance": daily_product / days,
+        "closing_balance": products["closing_balance"],
+        "daily_product": daily_product,
+        "weighted_product": pool["weighted_product"],
+        "profit_share": pool["profit_share"],
+        "loss_share": pool["loss_share"]
+    }
+
+    if fmt in POOL_ROW_FORMATS:
+        def rows() -> Iterator[str]:
+            if fmt == "csv":
+                yield ",".join(POOL_ACCOUNT_COLUMNS) + "\n"
+            for i in range(0, len(daily_product), POOL_CHUNK_ACCOUNTS):
+                buffer = io.StringIO()
+                np.savetxt(
+                    buffer,
+                    np.column_stack([columns[c][i:i + POOL_CHUNK_ACCOUNTS] for c in POOL_ACCOUNT_COLUMNS]),
+                    fmt=POOL_ROW_FORMATS[fmt]
+                )
+                yield buffer.getvalue()
+        return StreamingResponse(rows(), media_type=POOL_MEDIA_TYPES[fmt])
+
+    # Per-tier summary
+    n_tiers = len(tier_weights)
+    tier_accounts = np.bincount(account_tier, minlength=n_tiers)
+    tier_average_balance = np.bincount(account_tier, weights=daily_product, minlength=n_tiers) / days
+    tier_profit = np.bincount(account_tier, weights=pool["profit_share"], minlength=n_tiers)
+    tier_loss = np.bincount(account_tier, weights=pool["loss_share"], minlength=n_tiers)
+    names = params.tier_names or [f"tier {i}" for i in range(n_tiers)]
+
+    tiers = [
+        {
+            "tier": i,
+            "name": names[i] if i < len(names) else f"tier {i}",
+            "weightage": float(tier_weights[i]),
+            "accounts": int(tier_accounts[i]),
+            "average_balance": round(float(tier_average_balance[i]), 2),
+            "profit_share": round(float(tier_profit[i]), 2),
+            "loss_share": round(float(tier_loss[i]), 2),
+            # Annualized rate of return on the tier's average balance
+            "annualized_return": round(float((tier_profit[i] - tier_loss[i]) / tier_average_balance[i] * 365 / days * 100), 2) if tier_average_balance[i] > 0 else 0
+        }
+        for i in range(n_tiers)
+    ]
+
+    return {
+        "period_days": days,
+        "accounts": len(daily_product),
+        "net_profit": round(pool["net_profit"], 2),
+        "depositors_profit_share": round(pool["depositors_profit"], 2),
+        "mudarib_profit_share": round(pool["mudarib_profit"], 2),
+        "depositors_loss_share": round(pool["depositors_loss"], 2),
+        "mudarib_loss_share": round(pool["mudarib_loss"], 2),
+        "average_pool_balance": round(float(daily_product.sum() / days), 2),
+        "tiers": tiers,
+        "account_results": {
+            c: (columns[c].tolist() if c in ("account", "tier") else np.round(columns[c], 2).tolist())
+            for c in POOL_ACCOUNT_COLUMNS
+        } if len(daily_product) <= POOL_CHUNK_ACCOUNTS else None
+    }
+
+@router.post("/mudarabah/pool")
+async def distribute_profit_pool(
+    data: PoolLedgerRequest,
+    format: Literal["json", "ndjson", "csv"] = "json"
+):
+    """
+    Distribute a period's pool profit (or loss) across depositors from a columnar ledger.
+    Use format=csv or format=ndjson to stream the per-account results.
+    """
+    return run_pool_distribution(
+        data,
+        np.asarray(data.account, dtype=np.int64),
+        np.asarray(data.tier, dtype=np.int64),
+        np.asarray(data.date, dtype="datetime64[D]"),
+        np.asarray(data.amount, dtype=np.float64),
+        format
+    )
+
+@router.post("/mudarabah/pool/csv")
+async def distribute_profit_pool_csv(
+    request: Request,
+    period_start: date,
+    period_end: date,
+    total_revenue: float,
+    total_expenses: float,
+    rabbul_mal_profit_ratio: float,
+    mudarib_profit_ratio: float,
+    tier_weights: str = "1",
+    mudarib_investment: float = 0,
+    format: Literal["json", "ndjson", "csv"] = "csv"
+):
+    """
+    Pool distribution for a ledger uploaded as a CSV request body with columns
+    account, tier, date (YYYY-MM-DD) and amount (negative for withdrawals).
+    tier_weights is a comma-separated list, e.g. 1,1.25,1.5.
+    """
+    try:
+        params = PoolParameters(
+            period_start=period_start,
+            period_end=period_end,
+            total_revenue=total_revenue,
+            total_expenses=total_expenses,
+            rabbul_mal_profit_ratio=rabbul_mal_profit_ratio,
+            mudarib_profit_ratio=mudarib_profit_ratio,
+            tier_weights=[float(w) for w in tier_weights.split(",")],
+            mudarib_investment=mudarib_investment
+        )
+        text = (await request.body()).decode("utf-8")
+        ledger = parse_numeric_csv(text, ["account", "tier", "amount"], required=("account", "amount"))
+        posted = parse_date_column(text, "date")
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=f"Invalid pool request: {str(e)}")
+
+    return run_pool_distribution(
+        params,
+        ledger["account"].astype(np.int64),
+        ledger["tier"].astype(np.int64),
+        posted,
+        ledger["amount"],
+        format
+    )
+
 # Utility endpoint for ratio validation
 @router.post("/profit-sharing/validate-ratios")
 async def validate_ratios(rabbul_mal_ratio: float, mudarib_ratio: float):
@@ -1,7 +1,11 @@
-from fastapi import APIRouter
-from pydantic import BaseModel
-from typing import Literal
-import math
+from fastapi import APIRouter, HTTPException
+from pydantic import BaseModel, Field
+from typing import Dict, Any, List, Literal, Optional
+from datetime import date
+from functools import lru_cache
+import numpy as np
+
+from app.services.irr import IRR_MAX_PERIODS, annualize, payment_flows, rounded_rate, solve_irr
 
 router = APIRouter()
 
@@ -18,41 +22,120 @@ class MurabahaInput(BaseModel):
     grace_period_months: int = 0
     early_settlement_discount: float = 0  # percentage
 
-@router.post("/murabaha")
-async def calculate_murabaha(data: MurabahaInput):
-    # Calculate profit amount
-    if data.profit_margin_amount > 0:
-        total_profit = data.profit_margin_amount
-    else:
-        total_profit = data.asset_cost * (data.profit_margin_percentage / 100)
+# Payments per year for each payment frequency
+PAYMENTS_PER_YEAR = {
+    "monthly": 12,
+    "quarterly": 4,
+    "semi-annual": 2,
+    "annual": 1
+}
 
-    total_sale_price = data.asset_cost + total_profit
+# Longest term the effective rate is solved for (the solver works on a month grid this
+# wide); single quotes past it leave effective_annual_rate empty, batches reject them
+MAX_TERM_MONTHS = IRR_MAX_PERIODS
 
-    total_additional_fees = data.processing_fee + data.documentation_fee + data.insurance_cost
-    total_price_with_fees = total_sale_price + total_additional_fees
+TERM_ERROR = "payment_term_months must be positive, and grace_period_months must not be negative"
+
+BATCH_TERM_ERROR = f"payment_term_months must be between 1 and {MAX_TERM_MONTHS}, and grace_period_months must not be negative"
 
-    financed_amount = total_price_with_fees - data.down_payment
+def invalid_murabaha_terms(payment_term_months, grace_period_months, max_term: Optional[int] = None) -> np.ndarray:
+    """Mask of contracts whose term or grace period cannot be scheduled (or exceeds `max_term`)"""
+    term = np.atleast_1d(payment_term_months)
+    invalid = (term <= 0) | (np.atleast_1d(grace_period_months) < 0)
+    return invalid | (term > max_term) if max_term is not None else invalid
+
+def calculate_murabaha_terms(
+    asset_cost,
+    profit_margin_percentage,
+    payment_term_months,
+    payments_per_year,
+    profit_margin_amount=0,
+    down_payment=0,
+    additional_fees=0,
+    grace_period_months=0
+):
+    """
+    Calculate the sale price and installments of a murabaha.
+    Works element-wise on NumPy arrays as well as on plain numbers.
+    """
+    # A fixed profit amount overrides the margin percentage
+    total_profit = np.where(
+        np.asarray(profit_margin_amount) > 0,
+        profit_margin_amount,
+        np.multiply(asset_cost, np.divide(profit_margin_percentage, 100))
+    )
+    total_sale_price = asset_cost + total_profit
+    financed_amount = total_sale_price + additional_fees - down_payment
 
     # Grace period adjustment (no payments, but profit still accumulates)
-    effective_term = data.payment_term_months - data.grace_period_months
-    if effective_term <= 0:
-        effective_term = data.payment_term_months  # fallback
-
-    # Determine payment frequency
-    freq_map = {
-        "monthly": 12,
-        "quarterly": 4,
-        "semi-annual": 2,
-        "annual": 1
+    effective_term = np.subtract(payment_term_months, grace_period_months)
+    effective_term = np.where(effective_term <= 0, payment_term_months, effective_term)  # fallback
+
+    number_of_payments = np.ceil(np.round(effective_term / 12 * np.asarray(payments_per_year), 9)).astype(np.int64)
+    installment_amount = np.divide(
+        financed_amount,
+        number_of_payments,
+        out=np.zeros(np.broadcast(financed_amount, number_of_payments).shape),
+        where=number_of_payments > 0
+    )
+    total_of_payments = installment_amount * number_of_payments
+
+    return {
+        "total_profit": total_profit,
+        "total_sale_price": total_sale_price,
+        "financed_amount": financed_amount,
+        "number_of_payments": number_of_payments,
+        "installment_amount": installment_amount,
+        "total_of_payments": total_of_payments,
+        "total_cost": down_payment + total_of_payments + additional_fees
     }
-    payments_per_year = freq_map.get(data.payment_frequency, 12)
-    number_of_payments = math.ceil((effective_term / 12) * payments_per_year)
 
-    installment_amount = financed_amount / number_of_payments if number_of_payments > 0 else 0
+def calculate_murabaha_effective_rate(
+    asset_cost,
+    down_payment,
+    installment_amount,
+    number_of_payments,
+    payments_per_year,
+    payment_term_months,
+    grace_period_months=0
+):
+    """
+    Effective annual rate (%) of murabaha installments against the credit extended
+    (asset cost less down payment), allowing for when each installment falls due.
+    Works element-wise on NumPy arrays; NaN where no rate exists.
+    """
+    period_months = 12 // np.asarray(payments_per_year)
+    # The first installment falls one period after the grace months
+    grace = np.where(np.less(grace_period_months, payment_term_months), grace_period_months, 0)
+    credit = np.subtract(asset_cost, down_payment)
+    flows = payment_flows(credit, installment_amount, number_of_payments, grace + period_months, period_months)
+    # Nothing is financed when the down payment covers the asset
+    return np.where(np.atleast_1d(credit) > 0, annualize(solve_irr(flows)) * 100, np.nan)
 
-    # Total payments made over time
-    total_of_payments = installment_amount * number_of_payments
-    total_cost = data.down_payment + total_of_payments + total_additional_fees
+@router.post("/murabaha")
+async def calculate_murabaha(data: MurabahaInput):
+    if invalid_murabaha_terms(data.payment_term_months, data.grace_period_months).any():
+        raise HTTPException(status_code=400, detail=TERM_ERROR)
+
+    total_additional_fees = data.processing_fee + data.documentation_fee + data.insurance_cost
+
+    terms = calculate_murabaha_terms(
+        data.asset_cost,
+        data.profit_margin_percentage,
+        data.payment_term_months,
+        PAYMENTS_PER_YEAR.get(data.payment_frequency, 12),
+        profit_margin_amount=data.profit_margin_amount,
+        down_payment=data.down_payment,
+        additional_fees=total_additional_fees,
+        grace_period_months=data.grace_period_months
+    )
+    total_profit = float(terms["total_profit"])
+    total_sale_price = float(terms["total_sale_price"])
+    financed_amount = float(terms["financed_amount"])
+    number_of_payments = int(terms["number_of_payments"])
+    installment_amount = float(terms["installment_amount"])
+    total_of_payments = float(terms["total_of_payments"])
+    total_cost = float(terms["total_cost"])
 
     # Early settlement logic
     early_settlement_amount = 0
@@ -65,6 +148,17 @@ async def calculate_murabaha(data: MurabahaInput):
     # Effective profit rate
     effective_profit_rate = (total_profit / data.asset_cost) * 100 if data.asset_cost else 0
 
+    # Annualized rate that allows for the timing of the installments (comparable to a loan APR)
+    effective_annual_rate = calculate_murabaha_effective_rate(
+        data.asset_cost,
+        data.down_payment,
+        installment_amount,
+        number_of_payments,
+        PAYMENTS_PER_YEAR.get(data.payment_frequency, 12),
+        data.payment_term_months,
+        data.grace_period_months
+    )[0] if data.payment_term_months <= MAX_TERM_MONTHS else np.nan
+
     return {
         "asset_cost": round(data.asset_cost, 2),
         "total_profit": round(total_profit, 2),
@@ -81,5 +175,196 @@ async def calculate_murabaha(data: MurabahaInput):
         "total_cost": round(total_cost, 2),
         "early_settlement_amount": round(early_settlement_amount, 2),
         "early_settlement_savings": round(early_settlement_savings, 2),
-        "effective_profit_rate": round(effective_profit_rate, 2)
+        "effective_profit_rate": round(effective_profit_rate, 2),
+        "effective_annual_rate": rounded_rate(effective_annual_rate)
+    }
+
+class MurabahaBatchInput(BaseModel):
+    contracts: List[MurabahaInput] = Field(min_length=1)
+
+@router.post("/murabaha/effective-rate")
+async def calculate_murabaha_effective_rates(data: MurabahaBatchInput):
+    """Effective annual rate (%) of many murabaha contracts, solved together"""
+    contracts = data.contracts
+
+    def column(name):
+        return np.array([getattr(c, name) for c in contracts], dtype=np.float64)
+
+    invalid = np.flatnonzero(invalid_murabaha_terms(column("payment_term_months"), column("grace_period_months"), MAX_TERM_MONTHS))
+    if len(invalid):
+        raise HTTPException(status_code=400, detail=f"Contract {invalid[0]}: {BATCH_TERM_ERROR}")
+
+    payments_per_year = np.array([PAYMENTS_PER_YEAR.get(c.payment_frequency, 12) for c in contracts])
+    terms = calculate_murabaha_terms(
+        column("asset_cost"),
+        column("profit_margin_percentage"),
+        column("payment_term_months"),
+        payments_per_year,
+        profit_margin_amount=column("profit_margin_amount"),
+        down_payment=column("down_payment"),
+        additional_fees=column("processing_fee") + column("documentation_fee") + column("insurance_cost"),
+        grace_period_months=column("grace_period_months")
+    )
+    rates = calculate_murabaha_effective_rate(
+        column("asset_cost"),
+        column("down_payment"),
+        terms["installment_amount"],
+        terms["number_of_payments"],
+        payments_per_year,
+        column("payment_term_months"),
+        column("grace_period_months")
+    )
+    return {
+        "count": len(rates),
+        "effective_annual_rate": [rounded_rate(r) for r in rates]
+    }
+
+
+# Installment schedules
+
+def add_months(start: date, months: np.ndarray) -> np.ndarray:
+    """Dates `months` calendar months after `start`, clamped to the end of shorter months"""
+    month = np.datetime64(start, "M") + np.asarray(months, dtype=np.int64)
+    month_start = month.astype("datetime64[D]")
+    month_length = ((month + 1).astype("datetime64[D]") - month_start).astype(np.int64)
+    return month_start + np.minimum(start.day, month_length) - 1
+
+def profit_allocation(total_profit: float, number_of_payments: int, method: str) -> np.ndarray:
+    """Share of the deferred profit earned with each installment"""
+    if method == "rule_of_78":
+        # Sum of digits: earlier installments, on a larger balance, carry more profit
+        weights = np.arange(number_of_payments, 0, -1, dtype=np.float64)
+    else:
+        weights = np.ones(number_of_payments)
+    return total_profit * weights / weights.sum()
+
+class MurabahaSchedule:
+    """
+    Installment schedule of one murabaha with prefix sums over the installments.
+
+    Index k in the `*_after` arrays means "after k installments have been paid"
+    (k = 0 is before the first one), so the outstanding balance, unearned profit
+    and early settlement amount at any point are single array lookups.
+    """
+
+    def __init__(
+        self,
+        financed_amount: float,
+        total_profit: float,
+        number_of_payments: int,
+        installment_amount: float,
+        due_dates: np.ndarray,
+        profit_recognition: str = "rule_of_78",
+        profit_rebate_percentage: float = 100
+    ):
+        self.due_dates = due_dates
+        self.installment = np.full(number_of_payments, installment_amount)
+        self.profit = profit_allocation(total_profit, number_of_payments, profit_recognition)
+        self.principal = self.installment - self.profit
+
+        self.paid_after = np.concatenate(([0.0], np.cumsum(self.installment)))
+        self.earned_profit_after = np.concatenate(([0.0], np.cumsum(self.profit)))
+        self.balance_after = financed_amount - self.paid_after
+        self.deferred_profit_after = total_profit - self.earned_profit_after
+
+        # Early settlement: the outstanding balance less a rebate (ibra') on the unearned profit
+        self.rebate_after = self.deferred_profit_after * (profit_rebate_percentage / 100)
+        self.settlement_after = self.balance_after - self.rebate_after
+
+    def __len__(self) -> int:
+        return len(self.installment)
+
+    def settlement(self, paid_installments) -> Dict[str, Any]:
+        """Early settlement quote(s) after `paid_installments` installments (scalar or array)"""
+        k = np.asarray(paid_installments, dtype=np.int64)
+        if (k < 0).any() or (k > len(self)).any():
+            raise IndexError(f"Installment index must be between 0 and {len(self)}")
+        return {
+            "paid_installments": k,
+            "outstanding_balance": self.balance_after[k],
+            "deferred_profit": self.deferred_profit_after[k],
+            "rebate": self.rebate_after[k],
+            "settlement_amount": self.settlement_after[k]
+        }
+
+class MurabahaScheduleInput(MurabahaInput):
+    start_date: Optional[date] = Field(default=None, description="Contract date (defaults to today)")
+    profit_recognition: Literal["rule_of_78", "straight_line"] = "rule_of_78"
+    profit_rebate_percentage: float = Field(default=100, ge=0, le=100, description="Share of unearned profit waived on early settlement")
+    settle_after: Optional[List[int]] = Field(default=None, description="Installment counts to quote early settlement for")
+
+@lru_cache(maxsize=256)
+def build_murabaha_schedule(params: str) -> MurabahaSchedule:
+    """Build (and remember) the schedule for a JSON-encoded MurabahaScheduleInput"""
+    data = MurabahaScheduleInput.model_validate_json(params)
+    payments_per_year = PAYMENTS_PER_YEAR.get(data.payment_frequency, 12)
+    terms = calculate_murabaha_terms(
+        data.asset_cost,
+        data.profit_margin_percentage,
+        data.payment_term_months,
+        payments_per_year,
+        profit_margin_amount=data.profit_margin_amount,
+        down_payment=data.down_payment,
+        additional_fees=data.processing_fee + data.documentation_fee + data.insurance_cost,
+        grace_period_months=data.grace_period_months
+    )
+    number_of_payments = int(terms["number_of_payments"])
+
+    # The first installment falls one period after the grace months
+    grace = data.grace_period_months if data.grace_period_months < data.payment_term_months else 0
+    period_months = 12 // payments_per_year
+    due_dates = add_months(data.start_date, grace + period_months * np.arange(1, number_of_payments + 1))
+
+    return MurabahaSchedule(
+        float(terms["financed_amount"]),
+        float(terms["total_profit"]),
+        number_of_payments,
+        float(terms["installment_amount"]),
+        due_dates,
+        data.profit_recognition,
+        data.profit_rebate_percentage
+    )
+
+@router.post("/murabaha/schedule")
+async def calculate_murabaha_schedule(data: MurabahaScheduleInput):
+    """
+    Installment-by-installment schedule with due dates, the profit and cost share
+    of each installment, and the early settlement amount after every installment.
+    """
+    if data.start_date is None:
+        data.start_date = date.today()
+    if invalid_murabaha_terms(data.payment_term_months, data.grace_period_months).any():
+        raise HTTPException(status_code=400, detail=TERM_ERROR)
+
+    schedule = build_murabaha_schedule(data.model_dump_json(exclude={"settle_after"}))
+
+    response = {
+        "number_of_payments": len(schedule),
+        "installment_amount": round(float(schedule.installment[0]), 2) if len(schedule) else 0,
+        "schedule": {
+            "installment": list(range(1, len(schedule) + 1)),
+            "due_date": schedule.due_dates.astype(str).tolist(),
+            "amount": np.round(schedule.installment, 2).tolist(),
+            "profit": np.round(schedule.profit, 2).tolist(),
+            "principal": np.round(schedule.principal, 2).tolist(),
+            "remaining_balance": np.round(schedule.balance_after[1:], 2).tolist(),
+            "deferred_profit": np.round(schedule.deferred_profit_after[1:], 2).tolist()
+        },
+        # Index k = settling after k installments (k = 0 settles before the first one)
+        "early_settlement": {
+            "amount": np.round(schedule.settlement_after, 2).tolist(),
+            "rebate": np.round(schedule.rebate_after, 2).tolist()
+        }
     }
+
+    if data.settle_after is not None:
+        try:
+            quotes = schedule.settlement(data.settle_after)
+        except IndexError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+        response["settlement_quotes"] = {
+            k: (v.tolist() if k == "paid_installments" else np.round(v, 2).tolist())
+            for k, v in quotes.items()
+        }
+
+    return response
@@ -1,29 +1,504 @@
-from fastapi import APIRouter, HTTPException
-from pydantic import BaseModel
-from typing import List
+from fastapi import APIRouter, HTTPException, Request
+from fastapi.responses import StreamingResponse
+from pydantic import BaseModel, Field
+from typing import Dict, Any, Iterator, List, Literal, Optional
+from functools import lru_cache
+import csv
+import io
+import json
+import numpy as np
+
+from app.routes.murabaha import PAYMENTS_PER_YEAR
+from app.services.columnar import iter_csv_chunks
 
 router = APIRouter()
 
+# Largest intermediate product that is safe in int64 arithmetic
+INT64_SAFE = 2 ** 62
+
+def to_minor_units(values: np.ndarray, decimals: int) -> np.ndarray:
+    """Convert amounts to integer minor units (e.g. paisa for decimals=2)"""
+    return np.round(np.asarray(values, dtype=np.float64) * 10 ** decimals).astype(np.int64)
+
+def largest_remainder_allocation(weights: np.ndarray, units: int) -> np.ndarray:
+    """
+    Split `units` whole units in proportion to non-negative integer `weights` so the
+    parts sum to exactly `units`: everyone gets the floor of their exact share, and
+    the units left over go one each to the largest remainders (earlier rows win ties).
+    """
+    if units < 0:
+        return -largest_remainder_allocation(weights, -units)
+
+    # Exact integer arithmetic, in int64 where it cannot overflow and Python ints otherwise
+    largest = int(weights.max(initial=0))
+    safe = largest * max(units, len(weights), 1) < INT64_SAFE
+    exact = weights if safe else weights.astype(object)
+    total = int(exact.sum())
+    if total <= 0:
+        raise ValueError("Total weight must be greater than zero")
+
+    scaled = exact * units
+    base, remainder = scaled // total, scaled % total
+    leftover = units - int(base.sum())
+    if leftover:
+        # Stable ordering on the negated remainders keeps ties in row order
+        winners = np.argsort(-remainder, kind="stable")[:leftover]
+        base[winners] += 1
+    return base.astype(np.int64)
+
+def calculate_partnership_shares(
+    investment: np.ndarray,
+    amount: Optional[float] = None,
+    profit_ratio: Optional[np.ndarray] = None,
+    precision: int = 2,
+    decimals: int = 2
+) -> Dict[str, np.ndarray]:
+    """
+    Ownership percentages (to `precision` decimals, summing to exactly 100) and,
+    when `amount` is given, each partner's part of it (to `decimals` decimals,
+    summing to exactly `amount`).
+
+    A profit follows `profit_ratio` when one is agreed, otherwise capital; a loss
+    always follows capital.
+    """
+    capital = to_minor_units(investment, decimals)
+    if (capital < 0).any():
+        raise ValueError("Investments must not be negative")
+
+    percentage_units = largest_remainder_allocation(capital, 100 * 10 ** precision)
+    shares = {"percentage": percentage_units / 10 ** precision}
+
+    if amount is not None:
+        amount_units = int(round(amount * 10 ** decimals))
+        if amount_units > 0 and profit_ratio is not None:
+            # Ratios are weights; scale them to integers at a fine resolution
+            weights = to_minor_units(profit_ratio, 6)
+        else:
+            weights = capital
+        shares["amount"] = largest_remainder_allocation(weights, amount_units) / 10 ** decimals
+
+    return shares
+
 class Partner(BaseModel):
     name: str
-    investment: float
+    investment: float = Field(ge=0)
+    # Agreed profit-sharing ratio (any scale); losses always follow investment
+    profit_ratio: Optional[float] = Field(default=None, ge=0)
 
 class PartnershipRequest(BaseModel):
-    partners: List[Partner]
+    partners: List[Partner] = Field(min_length=1)
+    # Profit (positive) or loss (negative) to allocate among the partners
+    amount: Optional[float] = None
+    precision: int = Field(default=2, ge=0, le=6, description="Decimals of the percentages")
+    decimals: int = Field(default=2, ge=0, le=6, description="Decimals (minor units) of the currency")
+
+SPLIT_MEDIA_TYPES = {
+    "csv": "text/csv",
+    "ndjson": "application/x-ndjson"
+}
+
+# Partners per streamed chunk
+SPLIT_CHUNK_PARTNERS = 100000
+
+def stream_split(names: np.ndarray, investment: np.ndarray, shares: Dict[str, np.ndarray], fmt: str) -> Iterator[str]:
+    """Render the split as CSV (with header) or NDJSON text, a chunk of partners at a time"""
+    columns = ["percentage"] + (["amount"] if "amount" in shares else [])
+    if fmt == "csv":
+        yield ",".join(["name", "investment"] + columns) + "\n"
+
+    for start in range(0, len(names), SPLIT_CHUNK_PARTNERS):
+        stop = start + SPLIT_CHUNK_PARTNERS
+        rows = zip(names[start:stop].tolist(), investment[start:stop].tolist(), *(shares[c][start:stop].tolist() for c in columns))
+        if fmt == "csv":
+            # Quotes names that contain commas or quotes
+            buffer = io.StringIO()
+            csv.writer(buffer, lineterminator="\n").writerows(rows)
+            yield buffer.getvalue()
+        else:
+            yield "".join(
+                json.dumps(dict(zip(["name", "investment"] + columns, row))) + "\n"
+                for row in rows
+            )
+
+def split_response(
+    names: np.ndarray,
+    investment: np.ndarray,
+    profit_ratio: Optional[np.ndarray],
+    amount: Optional[float],
+    precision: int,
+    decimals: int,
+    fmt: str
+):
+    """Calculate the split and return it as JSON or a CSV/NDJSON stream"""
+    try:
+        shares = calculate_partnership_shares(investment, amount, profit_ratio, precision, decimals)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    if fmt in SPLIT_MEDIA_TYPES:
+        return StreamingResponse(stream_split(names, investment, shares, fmt), media_type=SPLIT_MEDIA_TYPES[fmt])
+
+    columns = {"name": names.tolist(), **{c: v.tolist() for c, v in shares.items()}}
+    split_result = [dict(zip(columns, row)) for row in zip(*columns.values())]
+
+    result = {
+        "split": split_result,
+        "total_investment": round(float(investment.sum()), decimals)
+    }
+    if amount is not None:
+        result["amount"] = amount
+    return result
 
 @router.post("/business-partnership-split")
-def calculate_partnership_split(data: PartnershipRequest):
-    total_investment = sum(p.investment for p in data.partners)
+def calculate_partnership_split(
+    data: PartnershipRequest,
+    format: Literal["json", "ndjson", "csv"] = "json"
+):
+    """
+    Ownership percentages that add up to exactly 100, and optionally each
+    partner's part of a profit or loss, reconciled to the last minor unit.
+    """
+    partners = data.partners
+    investment = np.array([p.investment for p in partners], dtype=np.float64)
 
-    if total_investment == 0:
+    if investment.sum() == 0:
         raise HTTPException(status_code=400, detail="Total investment cannot be zero.")
 
-    split_result = []
-    for partner in data.partners:
-        percentage = (partner.investment / total_investment) * 100
-        split_result.append({
-            "name": partner.name,
-            "percentage": percentage
-        })
+    ratios = [p.profit_ratio for p in partners]
+    if any(r is not None for r in ratios) and any(r is None for r in ratios):
+        raise HTTPException(status_code=400, detail="Give a profit_ratio for every partner or for none.")
+    profit_ratio = np.array(ratios, dtype=np.float64) if ratios[0] is not None else None
+
+    return split_response(
+        np.array([p.name for p in partners], dtype=object),
+        investment,
+        profit_ratio,
+        data.amount,
+        data.precision,
+        data.decimals,
+        format
+    )
+
+def parse_partner_chunk(text: str) -> Dict[str, np.ndarray]:
+    """
+    Parse a partner CSV chunk (header plus rows) with the csv module, so quoted
+    names such as "Smith, John" stay in one field. A blank profit_ratio is NaN.
+    """
+    reader = csv.reader(io.StringIO(text))
+    header = [h.strip().lower() for h in next(reader, [])]
+    missing = [c for c in ("name", "investment") if c not in header]
+    if missing:
+        raise ValueError(f"CSV is missing required column(s): {', '.join(missing)}")
+    rows = [row for row in reader if row]
+
+    def column(name: str, blank: str = "") -> List[str]:
+        i = header.index(name)
+        try:
+            return [row[i].strip() or blank for row in rows]
+        except IndexError:
+            raise ValueError(f"Every row needs the {name} column")
+
+    ratio = column("profit_ratio", "nan") if "profit_ratio" in header else ["nan"] * len(rows)
+    return {
+        "name": np.array(column("name"), dtype=object),
+        "investment": np.array(column("investment"), dtype=np.float64),
+        "profit_ratio": np.array(ratio, dtype=np.float64)
+    }
+
+@router.post("/business-partnership-split/csv")
+async def calculate_partnership_split_csv(
+    request: Request,
+    amount: Optional[float] = None,
+    precision: int = 2,
+    decimals: int = 2,
+    format: Literal["json", "ndjson", "csv"] = "csv"
+):
+    """
+    Split for a partner list uploaded as a CSV request body with columns name and
+    investment, and optionally profit_ratio. Streams CSV by default.
+
+    The upload is read and parsed a chunk of partners at a time, so only the
+    parsed columns are held, never the whole body.
+    """
+    if not 0 <= precision <= 6 or not 0 <= decimals <= 6:
+        raise HTTPException(status_code=400, detail="precision and decimals must be between 0 and 6")
+
+    chunks = []
+    try:
+        async for text in iter_csv_chunks(request.stream(), SPLIT_CHUNK_PARTNERS):
+            chunks.append(parse_partner_chunk(text))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=f"Invalid CSV: {str(e)}")
+    columns = {c: np.concatenate([chunk[c] for chunk in chunks]) for c in ("name", "investment", "profit_ratio")}
+    names = columns["name"]
+
+    if len(names) == 0 or columns["investment"].sum() == 0:
+        raise HTTPException(status_code=400, detail="Total investment cannot be zero.")
+
+    profit_ratio = columns["profit_ratio"]
+    if np.isnan(profit_ratio).all():
+        profit_ratio = None
+    elif np.isnan(profit_ratio).any():
+        raise HTTPException(status_code=400, detail="Give a profit_ratio for every partner or for none.")
+
+    return split_response(names, columns["investment"], profit_ratio, amount, precision, decimals, format)
+
+
+# Diminishing musharakah
+
+def calculate_diminishing_musharakah_terms(
+    property_value,
+    customer_contribution,
+    term_months,
+    annual_rental_rate,
+    payments_per_year,
+    payment_structure="level"
+) -> Dict[str, np.ndarray]:
+    """
+    Terms of one or many diminishing musharakah contracts (element-wise over arrays).
+
+    The bank's initial share is bought back in `number_of_payments` instalments
+    while the customer pays rent on the bank's remaining share each period:
+    - "level": a constant payment (rent + buyout), the buyout growing as the rent falls
+    - "equal_units": the same buyout every period, the payment falling with the rent
+    """
+    property_value, customer_contribution, term_months, annual_rental_rate, payments_per_year = np.broadcast_arrays(
+        *(np.asarray(a, dtype=np.float64) for a in (property_value, customer_contribution, term_months, annual_rental_rate, payments_per_year))
+    )
+    bank_share = np.maximum(property_value - customer_contribution, 0)
+    number_of_payments = np.maximum(np.ceil(term_months * payments_per_year / 12), 1)
+    rate = annual_rental_rate / 100 / payments_per_year
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        level_payment = np.where(
+            rate > 0,
+            bank_share * rate / (1 - (1 + rate) ** -number_of_payments),
+            bank_share / number_of_payments
+        )
+    level = np.asarray(payment_structure) == "level"
+    unit_buyout = bank_share / number_of_payments
+
+    # Rent over the whole term: level = payments less the share bought; equal units = rate x (sum of balances)
+    level_rent = level_payment * number_of_payments - bank_share
+    unit_rent = rate * bank_share * (number_of_payments + 1) / 2
+    total_rent = np.where(level, level_rent, unit_rent)
+
+    return {
+        "bank_share": bank_share,
+        "number_of_payments": number_of_payments,
+        "rate": rate,
+        "first_payment": np.where(level, level_payment, unit_buyout + rate * bank_share),
+        "last_payment": np.where(level, level_payment, unit_buyout * (1 + rate)),
+        "total_rent": total_rent,
+        "total_payments": bank_share + total_rent
+    }
+
+def diminishing_musharakah_position(terms: Dict[str, np.ndarray], elapsed_periods, payment_structure="level") -> Dict[str, np.ndarray]:
+    """
+    Bank's remaining share and rent paid so far after `elapsed_periods` payments,
+    in closed form so a whole portfolio is priced without building schedules.
+    """
+    bank_share, n, rate = terms["bank_share"], terms["number_of_payments"], terms["rate"]
+    k = np.minimum(np.asarray(elapsed_periods, dtype=np.float64), n)
+    level = np.asarray(payment_structure) == "level"
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        growth = (1 + rate) ** k
+        level_payment = terms["first_payment"]
+        level_balance = np.where(
+            rate > 0,
+            bank_share * growth - level_payment * (growth - 1) / rate,
+            bank_share - level_payment * k
+        )
+    level_balance = np.where(k >= n, 0, np.maximum(level_balance, 0))
+    unit_balance = bank_share * (1 - k / n)
+    balance = np.where(level, level_balance, unit_balance)
+
+    bought = bank_share - balance
+    rent_paid = np.where(
+        level,
+        level_payment * k - bought,
+        rate * bank_share * (k - k * (k - 1) / (2 * n))
+    )
+    return {
+        "elapsed_periods": k,
+        "outstanding_bank_share": balance,
+        "bought_to_date": bought,
+        "rent_paid": rent_paid
+    }
+
+class DiminishingMusharakahSchedule:
+    """
+    Period-by-period diminishing musharakah schedule with prefix sums.
+
+    Index k in the `*_after` arrays means "after k payments" (k = 0 is at
+    signing), so the ownership split and early buyout price at any period are
+    single array lookups.
+    """
+
+    def __init__(self, property_value: float, terms: Dict[str, np.ndarray], payment_structure: str = "level"):
+        n = int(terms["number_of_payments"])
+        bank_share = float(terms["bank_share"])
+        rate = float(terms["rate"])
+        self.property_value = property_value
+
+        if payment_structure == "level":
+            payment = float(terms["first_payment"])
+            # Balance before each payment, from the closed form (no running loop)
+            growth = (1 + rate) ** np.arange(n)
+            balance_before = bank_share * growth - (payment * (growth - 1) / rate if rate > 0 else payment * np.arange(n))
+            self.rent = balance_before * rate
+            self.buyout = payment - self.rent
+            # Absorb rounding drift into the last buyout so the bank's share reaches exactly zero
+            self.buyout[-1] = bank_share - self.buyout[:-1].sum()
+        else:
+            self.buyout = np.full(n, bank_share / n)
+            self.rent = rate * bank_share * (1 - np.arange(n) / n)
+        self.payment = self.rent + self.buyout
+
+        self.bought_after = np.concatenate(([0.0], np.cumsum(self.buyout)))
+        self.rent_paid_after = np.concatenate(([0.0], np.cumsum(self.rent)))
+        self.bank_share_after = bank_share - self.bought_after
+        self.bank_share_after[-1] = 0.0
+        self.bank_percentage_after = self.bank_share_after / property_value * 100
+        self.customer_percentage_after = 100 - self.bank_percentage_after
+
+    def __len__(self) -> int:
+        return len(self.payment)
+
+    def quote(self, elapsed_periods, current_property_value: Optional[float] = None) -> Dict[str, Any]:
+        """
+        Ownership split and early buyout price after `elapsed_periods` payments
+        (scalar or array). The buyout is the bank's remaining share at the agreed
+        valuation, or its ownership fraction of `current_property_value` if given.
+        """
+        k = np.asarray(elapsed_periods, dtype=np.int64)
+        if (k < 0).any() or (k > len(self)).any():
+            raise IndexError(f"Period must be between 0 and {len(self)}")
+        quote = {
+            "elapsed_periods": k,
+            "bank_percentage": self.bank_percentage_after[k],
+            "customer_percentage": self.customer_percentage_after[k],
+            "rent_paid": self.rent_paid_after[k],
+            "early_buyout_amount": self.bank_share_after[k]
+        }
+        if current_property_value is not None:
+            quote["early_buyout_amount"] = self.bank_percentage_after[k] / 100 * current_property_value
+        return quote
+
+class DiminishingMusharakahInput(BaseModel):
+    property_value: float = Field(gt=0, description="Agreed value of the property")
+    customer_contribution: float = Field(ge=0, default=0, description="Customer's initial share")
+    term_months: int = Field(gt=0, le=360, description="Term in months (up to 30 years)")
+    annual_rental_rate: float = Field(ge=0, le=100, description="Annual rent as a % of the bank's share")
+    payment_frequency: Literal["monthly", "quarterly", "semi-annual", "annual"] = "monthly"
+    payment_structure: Literal["level", "equal_units"] = "level"
+
+class DiminishingMusharakahScheduleInput(DiminishingMusharakahInput):
+    quote_after: Optional[List[int]] = Field(default=None, description="Periods to quote ownership and early buyout for")
+    current_property_value: Optional[float] = Field(default=None, gt=0, description="Market value used for buyout quotes")
+
+class DiminishingMusharakahContract(DiminishingMusharakahInput):
+    elapsed_periods: int = Field(ge=0, default=0, description="Payments made so far")
+
+class DiminishingMusharakahPortfolioInput(BaseModel):
+    contracts: List[DiminishingMusharakahContract] = Field(min_length=1)
+
+def diminishing_musharakah_terms(data: DiminishingMusharakahInput) -> Dict[str, np.ndarray]:
+    if data.customer_contribution >= data.property_value:
+        raise HTTPException(status_code=400, detail="customer_contribution must be less than property_value")
+    return calculate_diminishing_musharakah_terms(
+        data.property_value,
+        data.customer_contribution,
+        data.term_months,
+        data.annual_rental_rate,
+        PAYMENTS_PER_YEAR[data.payment_frequency],
+        data.payment_structure
+    )
+
+@lru_cache(maxsize=256)
+def build_diminishing_musharakah_schedule(params: str) -> DiminishingMusharakahSchedule:
+    """Build (and remember) the schedule for a JSON-encoded DiminishingMusharakahInput"""
+    data = DiminishingMusharakahInput.model_validate_json(params)
+    return DiminishingMusharakahSchedule(data.property_value, diminishing_musharakah_terms(data), data.payment_structure)
+
+@router.post("/diminishing-musharakah/schedule")
+def calculate_diminishing_musharakah_schedule(data: DiminishingMusharakahScheduleInput):
+    """
+    Per-period rent on the bank's remaining share, unit buyouts and the
+    ownership split after every payment, with optional early buyout quotes.
+    """
+    schedule = build_diminishing_musharakah_schedule(
+        data.model_dump_json(include=set(DiminishingMusharakahInput.model_fields))
+    )
+
+    response = {
+        "bank_share": round(float(schedule.bank_share_after[0]), 2),
+        "number_of_payments": len(schedule),
+        "total_rent": round(float(schedule.rent_paid_after[-1]), 2),
+        "total_payments": round(float(schedule.payment.sum()), 2),
+        "schedule": {
+            "period": list(range(1, len(schedule) + 1)),
+            "payment": np.round(schedule.payment, 2).tolist(),
+            "rent": np.round(schedule.rent, 2).tolist(),
+            "buyout": np.round(schedule.buyout, 2).tolist(),
+            "bank_share": np.round(schedule.bank_share_after[1:], 2).tolist(),
+            "bank_percentage": np.round(schedule.bank_percentage_after[1:], 2).tolist(),
+            "customer_percentage": np.round(schedule.customer_percentage_after[1:], 2).tolist()
+        }
+    }
+
+    if data.quote_after is not None:
+        try:
+            quotes = schedule.quote(data.quote_after, data.current_property_value)
+        except IndexError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+        response["quotes"] = {
+            k: (v.tolist() if k == "elapsed_periods" else np.round(v, 2).tolist())
+            for k, v in quotes.items()
+        }
+
+    return response
+
+@router.post("/diminishing-musharakah/portfolio")
+def calculate_diminishing_musharakah_portfolio(data: DiminishingMusharakahPortfolioInput):
+    """Terms and current position of every contract in a portfolio, computed together"""
+    contracts = data.contracts
+
+    def column(name):
+        return np.array([getattr(c, name) for c in contracts], dtype=np.float64)
+
+    property_value = column("property_value")
+    if (column("customer_contribution") >= property_value).any():
+        raise HTTPException(status_code=400, detail="customer_contribution must be less than property_value")
+
+    structure = np.array([c.payment_structure for c in contracts])
+    terms = calculate_diminishing_musharakah_terms(
+        property_value,
+        column("customer_contribution"),
+        column("term_months"),
+        column("annual_rental_rate"),
+        np.array([PAYMENTS_PER_YEAR[c.payment_frequency] for c in contracts]),
+        structure
+    )
+    position = diminishing_musharakah_position(terms, column("elapsed_periods"), structure)
+    bank_percentage = position["outstanding_bank_share"] / property_value * 100
 
-    return {"split": split_result}
+    return {
+        "count": len(contracts),
+        "contracts": {
+            "number_of_payments": terms["number_of_payments"].astype(int).tolist(),
+            "first_payment": np.round(terms["first_payment"], 2).tolist(),
+            "total_rent": np.round(terms["total_rent"], 2).tolist(),
+            "elapsed_periods": position["elapsed_periods"].astype(int).tolist(),
+            "bank_percentage": np.round(bank_percentage, 2).tolist(),
+            "rent_paid": np.round(position["rent_paid"], 2).tolist(),
+            "early_buyout_amount": np.round(position["outstanding_bank_share"], 2).tolist()
+        },
+        "totals": {
+            "bank_share": round(float(terms["bank_share"].sum()), 2),
+            "outstanding_bank_share": round(float(position["outstanding_bank_share"].sum()), 2),
+            "rent_paid": round(float(position["rent_paid"].sum()), 2),
+            "remaining_rent": round(float((terms["total_rent"] - position["rent_paid"]).sum()), 2)
+        }
+    }
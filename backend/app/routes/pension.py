@@ -1,6 +1,11 @@
-from fastapi import APIRouter
-from pydantic import BaseModel
+from fastapi import APIRouter, HTTPException
+from pydantic import BaseModel, Field
+from typing import List, Literal, Optional
 from math import pow
+import time
+import numpy as np
+
+from app.services.pension_simulation import PENSION_MC_MAX_CELLS, simulate_paths, summarize_paths
 
 router = APIRouter()
 
@@ -17,8 +22,8 @@ def calculate_pension(data: PensionInput):
     n_months = n_years * 12
     monthly_rate = (data.expected_return_rate / 100) / 12
 
-    # Future Value of Monthly Contributions (FV of annuity)
-    fv = data.monthly_contribution * ((pow(1 + monthly_rate, n_months) - 1) / monthly_rate)
+    # Future Value of Monthly Contributions (FV of annuity; just the contributions at a 0% return)
+    fv = data.monthly_contribution * float(annuity_factor(n_months, monthly_rate))
 
     # Adjust for inflation
     inflation_adjustment = pow(1 + (data.inflation_rate / 100), n_years)
@@ -31,3 +36,273 @@ def calculate_pension(data: PensionInput):
         "monthly_contribution": data.monthly_contribution,
         "expected_return_rate": data.expected_return_rate
     }
+
+
+class PensionSimulationInput(PensionInput):
+    paths: int = Field(default=10000, gt=0, le=2000000, description="Number of simulated paths")
+    seed: Optional[int] = Field(default=None, description="Seed for reproducible results")
+    distribution: Literal["normal", "lognormal", "student_t"] = "normal"
+    return_volatility: float = Field(default=15.0, ge=0, description="Annual volatility of returns in %")
+    inflation_volatility: float = Field(default=1.0, ge=0, description="Annual volatility of inflation in %")
+    degrees_of_freedom: float = Field(default=5.0, gt=2, description="Degrees of freedom for student_t returns")
+    percentiles: List[float] = Field(default=[5, 25, 50, 75, 95], min_length=1)
+    target_corpus: Optional[float] = Field(default=None, gt=0, description="Target value in today's money")
+
+@router.post("/pension-planner/simulate")
+async def simulate_pension(data: PensionSimulationInput):
+    """
+    Monte Carlo version of the planner: random monthly returns and yearly inflation.
+    Values are inflation-adjusted, like future_value in /pension-planner.
+    """
+    n_years = data.retirement_age - data.current_age
+    if n_years <= 0:
+        raise HTTPException(status_code=400, detail="retirement_age must be after current_age")
+    if any(p < 0 or p > 100 for p in data.percentiles):
+        raise HTTPException(status_code=400, detail="Percentiles must be between 0 and 100")
+    if data.paths * n_years > PENSION_MC_MAX_CELLS:
+        raise HTTPException(
+            status_code=400,
+            detail=f"paths x years is {data.paths * n_years}; the limit is {PENSION_MC_MAX_CELLS}"
+        )
+
+    started = time.perf_counter()
+    real_values = await simulate_paths(
+        data.paths,
+        data.seed,
+        years=n_years,
+        monthly_contribution=data.monthly_contribution,
+        annual_return=data.expected_return_rate / 100,
+        annual_volatility=data.return_volatility / 100,
+        annual_inflation=data.inflation_rate / 100,
+        inflation_volatility=data.inflation_volatility / 100,
+        distribution=data.distribution,
+        degrees_of_freedom=data.degrees_of_freedom
+    )
+    summary = summarize_paths(real_values, data.percentiles, data.target_corpus)
+
+    # Same as /pension-planner's future_value, but also defined for a 0% return
+    deterministic = real_future_value(
+        data.monthly_contribution,
+        0,
+        n_years,
+        0,
+        data.expected_return_rate / 100 / 12,
+        0,
+        data.inflation_rate / 100
+    )
+
+    return {
+        "paths": data.paths,
+        "seed": data.seed,
+        "distribution": data.distribution,
+        "years_until_retirement": n_years,
+        "ages": list(range(data.current_age + 1, data.retirement_age + 1)),
+        "deterministic_future_value": round(float(deterministic), 2),
+        **summary,
+        "elapsed_seconds": round(time.perf_counter() - started, 3)
+    }
+
+
+# Goal seek
+# The helpers below work element-wise on NumPy arrays (one element per goal)
+
+def annuity_factor(months, monthly_rate):
+    """Value after `months` of 1 contributed at the end of each month"""
+    months = np.asarray(months, dtype=np.float64)
+    monthly_rate = np.asarray(monthly_rate, dtype=np.float64)
+    safe_rate = np.where(monthly_rate == 0, 1.0, monthly_rate)
+    return np.where(monthly_rate == 0, months, np.expm1(months * np.log1p(monthly_rate)) / safe_rate)
+
+def escalating_contribution_factor(years, monthly_rate, escalation):
+    """
+    Value after `years` whole years of contributing 1 a month in the first year,
+    with the monthly amount rising by `escalation` at the start of each later year.
+    """
+    years = np.asarray(years, dtype=np.float64)
+    year_growth = (1 + np.asarray(monthly_rate)) ** 12
+    escalation_growth = 1 + np.asarray(escalation)
+    gap = year_growth - escalation_growth
+    # Geometric sum of escalation_growth^y * year_growth^(years - 1 - y) over the years
+    same = np.isclose(gap, 0)
+    years_sum = np.where(
+        same,
+        years * year_growth ** np.maximum(years - 1, 0),
+        (year_growth ** years - escalation_growth ** years) / np.where(same, 1.0, gap)
+    )
+    return annuity_factor(12, monthly_rate) * years_sum
+
+def real_future_value(
+    monthly_contribution,
+    current_savings,
+    years,
+    extra_months,
+    monthly_rate,
+    escalation,
+    inflation
+):
+    """Value in today's money after `years` whole years plus `extra_months` months"""
+    years = np.asarray(years, dtype=np.float64)
+    extra_months = np.asarray(extra_months, dtype=np.float64)
+    total_months = years * 12 + extra_months
+
+    nominal = (
+        current_savings * (1 + monthly_rate) ** total_months
+        + monthly_contribution * escalating_contribution_factor(years, monthly_rate, escalation) * (1 + monthly_rate) ** extra_months
+        + monthly_contribution * (1 + escalation) ** years * annuity_factor(extra_months, monthly_rate)
+    )
+    return nominal / (1 + inflation) ** (total_months / 12)
+
+def solve_required_contribution(
+    target,
+    current_savings,
+    years,
+    monthly_rate,
+    escalation,
+    inflation
+):
+    """First-year monthly contribution reaching `target` (today's money) in `years` - closed form"""
+    nominal_target = target * (1 + inflation) ** years
+    from_savings = current_savings * (1 + monthly_rate) ** (12 * np.asarray(years, dtype=np.float64))
+    per_unit = escalating_contribution_factor(years, monthly_rate, escalation)
+    return np.maximum(nominal_target - from_savings, 0) / per_unit
+
+# Values within half a cent count as reaching the target, so a target taken from
+# a rounded result (e.g. the planner's future_value) is reached on time
+TARGET_TOLERANCE = 0.005
+
+def solve_years_to_target(
+    target,
+    monthly_contribution,
+    current_savings,
+    max_years,
+    monthly_rate,
+    escalation,
+    inflation
+):
+    """
+    Months until the inflation-adjusted value first reaches `target`, or -1 if it
+    never does within `max_years`. The value is bracketed on a yearly grid, then
+    the month is found within the bracketing year.
+    """
+    n = len(target)
+    target = np.asarray(target, dtype=np.float64) - TARGET_TOLERANCE
+    year_grid = np.arange(int(np.max(max_years)) + 1)
+    column = lambda a: np.broadcast_to(np.asarray(a, dtype=np.float64), (n,))[:, None]
+
+    values = real_future_value(
+        column(monthly_contribution),
+        column(current_savings),
+        year_grid[None, :],
+        0,
+        column(monthly_rate),
+        column(escalation),
+        column(inflation)
+    )
+    reached = (values >= column(target)) & (year_grid[None, :] <= column(max_years))
+    found = reached.any(axis=1)
+    first_year = np.argmax(reached, axis=1)
+
+    # Months 1..12 into the year before the first year on target
+    base_year = np.maximum(first_year - 1, 0)[:, None]
+    month_grid = np.arange(1, 13)[None, :]
+    month_values = real_future_value(
+        column(monthly_contribution),
+        column(current_savings),
+        base_year,
+        month_grid,
+        column(monthly_rate),
+        column(escalation),
+        column(inflation)
+    )
+    first_month = np.argmax(month_values >= column(target), axis=1) + 1
+
+    months = np.where(first_year == 0, 0, base_year[:, 0] * 12 + first_month)
+    return np.where(found, months, -1)
+
+class PensionGoalBase(BaseModel):
+    current_age: int = Field(ge=0)
+    target_corpus: float = Field(gt=0, description="Target value in today's money")
+    expected_return_rate: float  # annual rate in %
+    inflation_rate: float = 0.0
+    contribution_escalation: float = Field(default=0.0, description="Yearly increase of the monthly contribution in %")
+    current_savings: float = Field(default=0.0, ge=0)
+
+class RequiredContributionInput(PensionGoalBase):
+    retirement_age: int
+
+class RetirementAgeInput(PensionGoalBase):
+    monthly_contribution: float = Field(ge=0)
+    max_retirement_age: int = Field(default=100, le=120)
+
+class RequiredContributionBatch(BaseModel):
+    goals: List[RequiredContributionInput] = Field(min_length=1)
+
+class RetirementAgeBatch(BaseModel):
+    goals: List[RetirementAgeInput] = Field(min_length=1)
+
+def goal_column(goals, name: str) -> np.ndarray:
+    return np.array([getattr(g, name) for g in goals], dtype=np.float64)
+
+def solve_contribution_goals(goals: List[RequiredContributionInput]) -> List[dict]:
+    years = goal_column(goals, "retirement_age") - goal_column(goals, "current_age")
+    if (years <= 0).any():
+        raise HTTPException(status_code=400, detail="retirement_age must be after current_age")
+
+    contribution = solve_required_contribution(
+        goal_column(goals, "target_corpus"),
+        goal_column(goals, "current_savings"),
+        years,
+        goal_column(goals, "expected_return_rate") / 100 / 12,
+        goal_column(goals, "contribution_escalation") / 100,
+        goal_column(goals, "inflation_rate") / 100
+    )
+    return [
+        {
+            "required_monthly_contribution": round(float(c), 2),
+            "years_until_retirement": int(y),
+            "target_corpus": g.target_corpus
+        }
+        for c, y, g in zip(contribution, years, goals)
+    ]
+
+def solve_retirement_age_goals(goals: List[RetirementAgeInput]) -> List[dict]:
+    current_age = goal_column(goals, "current_age")
+    months = solve_years_to_target(
+        goal_column(goals, "target_corpus"),
+        goal_column(goals, "monthly_contribution"),
+        goal_column(goals, "current_savings"),
+        np.maximum(goal_column(goals, "max_retirement_age") - current_age, 0),
+        goal_column(goals, "expected_return_rate") / 100 / 12,
+        goal_column(goals, "contribution_escalation") / 100,
+        goal_column(goals, "inflation_rate") / 100
+    )
+    return [
+        {
+            "reachable": bool(m >= 0),
+            "years_needed": round(m / 12, 2) if m >= 0 else None,
+            # Earliest whole age by which the target is reached
+            "retirement_age": int(age + np.ceil(m / 12)) if m >= 0 else None,
+            "target_corpus": g.target_corpus
+        }
+        for m, age, g in zip(months, current_age, goals)
+    ]
+
+@router.post("/pension-planner/required-contribution")
+def calculate_required_contribution(data: RequiredContributionInput):
+    """Monthly contribution (first year, before escalation) needed to reach the target by retirement_age"""
+    return solve_contribution_goals([data])[0]
+
+@router.post("/pension-planner/required-contribution/batch")
+def calculate_required_contribution_batch(data: RequiredContributionBatch):
+    """Required contributions for many goals in one call"""
+    return {"results": solve_contribution_goals(data.goals)}
+
+@router.post("/pension-planner/retirement-age")
+def calculate_retirement_age(data: RetirementAgeInput):
+    """Earliest age at which the monthly contribution reaches the target"""
+    return solve_retirement_age_goals([data])[0]
+
+@router.post("/pension-planner/retirement-age/batch")
+def calculate_retirement_age_batch(data: RetirementAgeBatch):
+    """Retirement ages for many goals in one call"""
+    return {"results": solve_retirement_age_goals(data.goals)}
@@ -1,19 +1,55 @@
-from fastapi import APIRouter, HTTPException
+from fastapi import APIRouter, Depends, HTTPException
 from pydantic import BaseModel
-import requests
+import asyncio
+import logging
 import os
+from functools import partial
 from typing import Optional
-from datetime import datetime, timedelta
+from datetime import datetime, timezone
+from pathlib import Path
 
-router = APIRouter(tags=["prices"])
+from app.services.admission import create_rate_limiter, rate_limit
+from app.services.fx import FxTable, UnsupportedCurrencyError
+from app.services.price_cache import PriceCache
+from app.services.price_history import open_price_history
+from app.services.price_snapshot import open_snapshot_store
+from app.services.price_providers import CallableProvider, FileProvider, ProviderRegistry
+from app.services.price_client import (
+    get_price_client,
+    METALS_LIVE_URL,
+    GOLD_API_URL,
+    EXCHANGE_RATE_URL
+)
 
-# Cache for prices to avoid excessive API calls
-_price_cache = {
-    "gold": None,
-    "silver": None,
-    "last_updated": None,
-    "cache_duration": timedelta(minutes=5)  # Cache for 5 minutes
-}
+# Each client gets 10 price requests a second with bursts of 40 (PRICES_RATE_LIMIT_*)
+prices_rate_limiter = create_rate_limiter("prices", rate=10.0, burst=40.0)
+
+router = APIRouter(tags=["prices"], dependencies=[Depends(rate_limit(prices_rate_limiter))])
+
+logger = logging.getLogger(__name__)
+
+# Prices are fresh for 5 minutes; past that the last good value is still
+# served (while a refresh runs in the background) up to a hard maximum age
+PRICE_CACHE_TTL_SECONDS = float(os.getenv("PRICE_CACHE_TTL_SECONDS", "300"))
+PRICE_CACHE_MAX_STALENESS_SECONDS = float(os.getenv("PRICE_CACHE_MAX_STALENESS_SECONDS", "3600"))
+
+# 1 troy ounce = 31.1035 grams
+GRAMS_PER_OUNCE = 31.1035
+
+# Fallback prices based on approximate market rates
+# Gold: ~$2,650/oz, Silver: ~$31/oz (as of late 2024)
+FALLBACK_GOLD_USD = 2650.0
+FALLBACK_SILVER_USD = 31.0
+FALLBACK_USD_TO_PKR = 278.0
+
+# Upstream fetches give up after the budget; a slow provider is hedged with the
+# next one after the hedge delay, and a failing one is skipped for the cooldown
+PRICE_FETCH_BUDGET_SECONDS = float(os.getenv("PRICE_FETCH_BUDGET_SECONDS", "5"))
+PRICE_HEDGE_DELAY_SECONDS = float(os.getenv("PRICE_HEDGE_DELAY_SECONDS", "1"))
+PROVIDER_FAILURE_THRESHOLD = int(os.getenv("PRICE_PROVIDER_FAILURE_THRESHOLD", "3"))
+PROVIDER_COOLDOWN_SECONDS = float(os.getenv("PRICE_PROVIDER_COOLDOWN_SECONDS", "60"))
+
+DEFAULT_PRICE_STUB_DIR = Path(__file__).resolve().parent.parent / "data" / "price_stubs"
 
 class MetalPricesResponse(BaseModel):
     gold_price_per_gram: float
@@ -23,167 +59,329 @@ class MetalPricesResponse(BaseModel):
     currency: str
     last_updated: str
     source: str
+    cache_age_seconds: Optional[float] = None
 
 
-def fetch_metal_prices_from_api() -> dict:
-    """
-    Fetch live gold and silver prices from a free API.
-    Uses metals.live API which provides free tier access.
-    """
+def parse_metals_live(data, source: str = "metals.live") -> Optional[dict]:
+    """Extract gold and silver USD/oz prices from a metals.live spot payload"""
+    if not data:
+        return None
+    
+    # metals.live returns array with gold and silver spot prices
+    gold_price_usd = None
+    silver_price_usd = None
+    
+    for metal in data:
+        if metal.get("metal") == "gold":
+            gold_price_usd = metal.get("price")
+        elif metal.get("metal") == "silver":
+            silver_price_usd = metal.get("price")
+    
+    if gold_price_usd and silver_price_usd:
+        return {
+            "gold_usd": gold_price_usd,
+            "silver_usd": silver_price_usd,
+            "source": source
+        }
+    return None
+
+
+def parse_exchange_rates(data, source: str = "exchangerate-api") -> Optional[FxTable]:
+    """Build the full rate table from an exchangerate-api payload"""
+    if not data or not data.get("rates"):
+        return None
+    return FxTable.from_rates(data.get("base", "USD"), data["rates"], source=source)
+
+
+async def fetch_metals_live() -> Optional[dict]:
+    """Fetch gold and silver spot prices from metals.live (no key required)"""
     try:
-        # Using metals.live free API (no key required)
-        response = requests.get(
-            "https://api.metals.live/v1/spot",
-            timeout=10
-        )
-        
-        if response.status_code == 200:
-            data = response.json()
-            # metals.live returns array with gold and silver spot prices
-            gold_price_usd = None
-            silver_price_usd = None
-            
-            for metal in data:
-                if metal.get("metal") == "gold":
-                    gold_price_usd = metal.get("price")
-                elif metal.get("metal") == "silver":
-                    silver_price_usd = metal.get("price")
-            
-            if gold_price_usd and silver_price_usd:
-                return {
-                    "gold_usd": gold_price_usd,
-                    "silver_usd": silver_price_usd,
-                    "source": "metals.live"
-                }
+        data = await get_price_client().get_json(METALS_LIVE_URL, "/v1/spot")
+        return parse_metals_live(data)
     except Exception as e:
-        print(f"metals.live API error: {e}")
+        logger.warning(f"metals.live API error: {e}")
     
-    # Fallback to goldapi.io if available (requires API key)
+    return None
+
+
+async def fetch_goldapi() -> Optional[dict]:
+    """Fetch gold and silver prices from goldapi.io (requires GOLD_API_KEY)"""
     gold_api_key = os.getenv("GOLD_API_KEY")
-    if gold_api_key:
-        try:
-            headers = {"x-access-token": gold_api_key}
-            gold_resp = requests.get(
-                "https://www.goldapi.io/api/XAU/USD",
-                headers=headers,
-                timeout=10
-            )
-            silver_resp = requests.get(
-                "https://www.goldapi.io/api/XAG/USD", 
-                headers=headers,
-                timeout=10
-            )
-            
-            if gold_resp.status_code == 200 and silver_resp.status_code == 200:
-                gold_data = gold_resp.json()
-                silver_data = silver_resp.json()
-                return {
-                    "gold_usd": gold_data.get("price"),
-                    "silver_usd": silver_data.get("price"),
-                    "source": "goldapi.io"
-                }
-        except Exception as e:
-            print(f"goldapi.io API error: {e}")
+    if not gold_api_key:
+        return None
+    
+    try:
+        client = get_price_client()
+        headers = {"x-access-token": gold_api_key}
+        # XAU and XAG are independent lookups, so issue them together
+        gold_data, silver_data = await asyncio.gather(
+            client.get_json(GOLD_API_URL, "/api/XAU/USD", headers=headers),
+            client.get_json(GOLD_API_URL, "/api/XAG/USD", headers=headers)
+        )
+        
+        if gold_data and silver_data and gold_data.get("price") and silver_data.get("price"):
+            return {
+                "gold_usd": gold_data.get("price"),
+                "silver_usd": silver_data.get("price"),
+                "source": "goldapi.io"
+            }
+    except Exception as e:
+        logger.warning(f"goldapi.io API error: {e}")
     
     return None
 
 
-def get_usd_to_pkr_rate() -> float:
-    """Fetch current USD to PKR exchange rate"""
+async def fetch_exchange_rate_api() -> Optional[FxTable]:
+    """Fetch the full USD rate table from exchangerate-api.com"""
     try:
         # Using exchangerate-api.com free tier
-        response = requests.get(
-            "https://api.exchangerate-api.com/v4/latest/USD",
-            timeout=10
-        )
-        if response.status_code == 200:
-            data = response.json()
-            return data.get("rates", {}).get("PKR", 278.0)  # Fallback rate
+        data = await get_price_client().get_json(EXCHANGE_RATE_URL, "/v4/latest/USD")
+        return parse_exchange_rates(data)
     except Exception as e:
-        print(f"Exchange rate API error: {e}")
+        logger.warning(f"Exchange rate API error: {e}")
     
-    # Fallback to approximate rate if API fails
-    return 278.0
+    return None
+
+
+def configure_price_providers(registry: ProviderRegistry):
+    """
+    Register the price provider chain.
+
+    PRICE_PROVIDERS=upstream (default) uses the live APIs in order
+    metals.live -> goldapi.io and exchangerate-api. PRICE_PROVIDERS=local swaps
+    them for file-backed stand-ins reading PRICE_STUB_DIR, with optional
+    PRICE_STUB_LATENCY_SECONDS and PRICE_STUB_FAILURE_RATE injected.
+    """
+    registry.clear()
+    
+    if os.getenv("PRICE_PROVIDERS", "upstream") == "local":
+        stub_dir = Path(os.getenv("PRICE_STUB_DIR", str(DEFAULT_PRICE_STUB_DIR)))
+        latency = float(os.getenv("PRICE_STUB_LATENCY_SECONDS", "0"))
+        failure_rate = float(os.getenv("PRICE_STUB_FAILURE_RATE", "0"))
+        registry.register(FileProvider(
+            "local-metals", "metals", stub_dir / "metals_live.json",
+            partial(parse_metals_live, source="local-metals"), latency=latency, failure_rate=failure_rate
+        ))
+        registry.register(FileProvider(
+            "local-exchange-rate", "fx", stub_dir / "exchange_rate.json",
+            partial(parse_exchange_rates, source="local-exchange-rate"), latency=latency, failure_rate=failure_rate
+        ))
+        return
+    
+    registry.register(CallableProvider("metals.live", "metals", fetch_metals_live))
+    registry.register(CallableProvider("goldapi.io", "metals", fetch_goldapi))
+    registry.register(CallableProvider("exchangerate-api", "fx", fetch_exchange_rate_api))
+
+
+price_providers = ProviderRegistry(
+    budget=PRICE_FETCH_BUDGET_SECONDS,
+    hedge_delay=PRICE_HEDGE_DELAY_SECONDS,
+    failure_threshold=PROVIDER_FAILURE_THRESHOLD,
+    cooldown=PROVIDER_COOLDOWN_SECONDS
+)
+configure_price_providers(price_providers)
+
+
+async def fetch_metal_prices_from_api() -> Optional[dict]:
+    """
+    Fetch live gold and silver prices from the provider chain.
+    Providers are raced within the fetch budget; the first valid answer wins.
+    """
+    return await price_providers.race("metals")
+
+
+async def fetch_exchange_rates() -> Optional[FxTable]:
+    """Fetch the full exchange-rate table, or None if every provider fails"""
+    return await price_providers.race("fx")
+
+
+# Workers on the same host share the latest prices and one refresh schedule
+price_snapshot = open_snapshot_store()
+
+# Every upstream sample is also appended to an on-disk time series
+price_history = open_price_history()
+
+
+def record_metal_sample(prices: dict, fetched_at: float):
+    """Append a fetched gold/silver sample to the price history"""
+    if price_history is None:
+        return
+    price_history.record("gold_usd", fetched_at, prices["gold_usd"])
+    price_history.record("silver_usd", fetched_at, prices["silver_usd"])
+
+
+def record_fx_sample(table: FxTable, fetched_at: float):
+    """Append every rate of a fetched table to the price history (units per USD)"""
+    if price_history is None:
+        return
+    usd = table.rates[table.index["USD"]] if "USD" in table else None
+    if usd is None:
+        return
+    for code, rate in zip(table.codes, table.rates):
+        price_history.record(f"fx_{code}", fetched_at, rate / usd)
+
+metal_price_cache = PriceCache(
+    "metals",
+    fetch_metal_prices_from_api,
+    ttl=PRICE_CACHE_TTL_SECONDS,
+    max_staleness=PRICE_CACHE_MAX_STALENESS_SECONDS,
+    snapshot=price_snapshot,
+    refresh_lease=PRICE_FETCH_BUDGET_SECONDS * 2,
+    on_refresh=record_metal_sample
+)
+# The whole rate table is cached, so every currency pair is served from one fetch
+fx_rate_cache = PriceCache(
+    "fx_rates",
+    fetch_exchange_rates,
+    ttl=PRICE_CACHE_TTL_SECONDS,
+    max_staleness=PRICE_CACHE_MAX_STALENESS_SECONDS,
+    snapshot=price_snapshot,
+    refresh_lease=PRICE_FETCH_BUDGET_SECONDS * 2,
+    encode=FxTable.to_dict,
+    decode=FxTable.from_dict,
+    on_refresh=record_fx_sample
+)
+
+# Fallback to approximate rate if API fails
+FALLBACK_FX_TABLE = FxTable.from_rates("USD", {"USD": 1.0, "PKR": FALLBACK_USD_TO_PKR}, source="fallback")
+
+
+async def get_fx_table() -> FxTable:
+    """Get the cached exchange-rate table (USD based)"""
+    entry = await fx_rate_cache.get()
+    if entry is not None:
+        return entry.value
+    return FALLBACK_FX_TABLE
+
+
+async def get_usd_to_pkr_rate() -> float:
+    """Get the cached USD to PKR exchange rate"""
+    table = await get_fx_table()
+    return table.rate("USD", "PKR")
+
+
+def currency_rate(table: FxTable, from_currency: str, to_currency: str) -> float:
+    """Cross rate between two currencies, as a 400 error if either is unknown"""
+    try:
+        return table.rate(from_currency, to_currency)
+    except UnsupportedCurrencyError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+
+def get_historical_metal_prices(at: datetime, currency: str) -> MetalPricesResponse:
+    """Resolve gold and silver prices from the latest recorded samples at or before `at`"""
+    if price_history is None:
+        raise HTTPException(status_code=404, detail="Price history is not enabled")
+    
+    # Naive timestamps are taken as UTC
+    if at.tzinfo is None:
+        at = at.replace(tzinfo=timezone.utc)
+    ts = at.timestamp()
+    
+    gold = price_history.at("gold_usd", ts)
+    silver = price_history.at("silver_usd", ts)
+    usd_to_currency = price_history.at(f"fx_{currency}", ts)
+    if gold is None or silver is None:
+        raise HTTPException(status_code=404, detail=f"No metal prices recorded at or before {at.isoformat()}")
+    if usd_to_currency is None:
+        raise HTTPException(status_code=404, detail=f"No {currency} exchange rate recorded at or before {at.isoformat()}")
+    
+    gold_per_gram = (gold[1] / GRAMS_PER_OUNCE) * usd_to_currency[1]
+    silver_per_gram = (silver[1] / GRAMS_PER_OUNCE) * usd_to_currency[1]
+    
+    return MetalPricesResponse(
+        gold_price_per_gram=round(gold_per_gram, 2),
+        silver_price_per_gram=round(silver_per_gram, 2),
+        gold_price_per_ounce=round(gold[1], 2),
+        silver_price_per_ounce=round(silver[1], 2),
+        currency=currency,
+        last_updated=datetime.utcfromtimestamp(gold[0]).isoformat(),
+        source="history"
+    )
 
 
 @router.get("/prices/metals", response_model=MetalPricesResponse)
-async def get_metal_prices():
+async def get_metal_prices(currency: str = "PKR", at: Optional[datetime] = None):
     """
-    Get live gold and silver prices in PKR per gram.
+    Get live gold and silver prices per gram (PKR unless another currency is given).
     Prices are cached for 5 minutes to avoid excessive API calls.
+    Pass `at` (ISO datetime or unix seconds) to get the prices recorded at that time.
     """
-    global _price_cache
+    currency = currency.upper()
     
-    now = datetime.utcnow()
+    if at is not None:
+        return get_historical_metal_prices(at, currency)
     
-    # Check cache
-    if (_price_cache["last_updated"] and 
-        _price_cache["gold"] and 
-        _price_cache["silver"] and
-        now - _price_cache["last_updated"] < _price_cache["cache_duration"]):
-        
-        return MetalPricesResponse(
-            gold_price_per_gram=_price_cache["gold"]["per_gram_pkr"],
-            silver_price_per_gram=_price_cache["silver"]["per_gram_pkr"],
-            gold_price_per_ounce=_price_cache["gold"]["per_ounce_usd"],
-            silver_price_per_ounce=_price_cache["silver"]["per_ounce_usd"],
-            currency="PKR",
-            last_updated=_price_cache["last_updated"].isoformat(),
-            source=_price_cache.get("source", "cache")
-        )
-    
-    # Fetch fresh prices
-    prices = fetch_metal_prices_from_api()
+    return await get_live_metal_prices(currency)
+
+
+async def get_live_metal_prices(currency: str = "PKR") -> MetalPricesResponse:
+    """Gold and silver prices per gram in `currency` from the price caches"""
+    # Metal prices and the exchange rate are cached (and refreshed) independently
+    metals, fx = await asyncio.gather(metal_price_cache.get(), fx_rate_cache.get())
     
-    if not prices:
-        # Use fallback prices based on approximate market rates
-        # Gold: ~$2,650/oz, Silver: ~$31/oz (as of late 2024)
+    if metals is not None:
+        prices = metals.value
+        last_updated = datetime.utcfromtimestamp(metals.fetched_at)
+        cache_age = round(metals.age(), 1)
+    else:
         prices = {
-            "gold_usd": 2650.0,
-            "silver_usd": 31.0,
+            "gold_usd": FALLBACK_GOLD_USD,
+            "silver_usd": FALLBACK_SILVER_USD,
             "source": "fallback (market closed or API unavailable)"
         }
+        last_updated = datetime.utcnow()
+        cache_age = None
     
-    # Get exchange rate
-    usd_to_pkr = get_usd_to_pkr_rate()
-    
-    # Convert from USD per troy ounce to PKR per gram
-    # 1 troy ounce = 31.1035 grams
-    GRAMS_PER_OUNCE = 31.1035
+    fx_table = fx.value if fx is not None else FALLBACK_FX_TABLE
+    usd_to_currency = currency_rate(fx_table, "USD", currency)
     
-    gold_per_gram_pkr = (prices["gold_usd"] / GRAMS_PER_OUNCE) * usd_to_pkr
-    silver_per_gram_pkr = (prices["silver_usd"] / GRAMS_PER_OUNCE) * usd_to_pkr
-    
-    # Update cache
-    _price_cache["gold"] = {
-        "per_ounce_usd": prices["gold_usd"],
-        "per_gram_pkr": round(gold_per_gram_pkr, 2)
-    }
-    _price_cache["silver"] = {
-        "per_ounce_usd": prices["silver_usd"],
-        "per_gram_pkr": round(silver_per_gram_pkr, 2)
-    }
-    _price_cache["last_updated"] = now
-    _price_cache["source"] = prices["source"]
+    # Convert from USD per troy ounce to the target currency per gram
+    gold_per_gram = (prices["gold_usd"] / GRAMS_PER_OUNCE) * usd_to_currency
+    silver_per_gram = (prices["silver_usd"] / GRAMS_PER_OUNCE) * usd_to_currency
     
     return MetalPricesResponse(
-        gold_price_per_gram=round(gold_per_gram_pkr, 2),
-        silver_price_per_gram=round(silver_per_gram_pkr, 2),
+        gold_price_per_gram=round(gold_per_gram, 2),
+        silver_price_per_gram=round(silver_per_gram, 2),
         gold_price_per_ounce=round(prices["gold_usd"], 2),
         silver_price_per_ounce=round(prices["silver_usd"], 2),
-        currency="PKR",
-        last_updated=now.isoformat(),
-        source=prices["source"]
+        currency=currency,
+        last_updated=last_updated.isoformat(),
+        source=prices["source"],
+        cache_age_seconds=cache_age
     )
 
 
 @router.get("/prices/exchange-rate")
-async def get_exchange_rate():
-    """Get current USD to PKR exchange rate"""
-    rate = get_usd_to_pkr_rate()
+async def get_exchange_rate(base: str = "USD", target: str = "PKR"):
+    """Get the current exchange rate for any currency pair (USD to PKR by default)"""
+    base = base.upper()
+    target = target.upper()
+    table = await get_fx_table()
     return {
-        "usd_to_pkr": rate,
-        "currency_pair": "USD/PKR",
+        # Kept for older clients; None when the rate table has no USD or PKR
+        "usd_to_pkr": table.rate("USD", "PKR") if "USD" in table and "PKR" in table else None,
+        "rate": currency_rate(table, base, target),
+        "currency_pair": f"{base}/{target}",
+        "source": table.source,
         "timestamp": datetime.utcnow().isoformat()
     }
 
+
+@router.get("/prices/cache-stats")
+async def get_price_cache_stats():
+    """Report age and hit/miss counters for the price caches"""
+    return {
+        "metals": metal_price_cache.stats(),
+        "exchange_rate": fx_rate_cache.stats()
+    }
+
+
+@router.get("/prices/providers")
+async def get_price_provider_status():
+    """Report the provider chain and each provider's circuit state"""
+    return {
+        "providers": price_providers.status(),
+        "upstream_limits": get_price_client().stats(),
+        "rate_limit": prices_rate_limiter.stats()
+    }
@@ -0,0 +1,280 @@
+from fastapi import APIRouter, HTTPException
+from pydantic import BaseModel, Field
+from typing import Dict, Any, List, Literal, Optional, Union
+import math
+import os
+import numpy as np
+
+from app.routes.leasing import (
+    calculate_due_at_signing,
+    calculate_lease_terms,
+    calculate_total_costs,
+    convert_interest_rate_to_money_factor
+)
+from app.routes.murabaha import PAYMENTS_PER_YEAR, calculate_murabaha_terms
+
+router = APIRouter(tags=["sweep"])
+
+# Largest grid evaluated in one request
+SWEEP_MAX_CELLS = int(os.getenv("SWEEP_MAX_CELLS", "1000000"))
+
+class SweepRange(BaseModel):
+    # Inclusive range: start, start + step, ... up to stop
+    start: float
+    stop: float
+    step: float = Field(gt=0)
+
+    def count(self) -> int:
+        """Number of values, worked out without materializing them"""
+        return max(math.floor((self.stop - self.start) / self.step + 1e-9) + 1, 0)
+
+    def values(self) -> np.ndarray:
+        return self.start + self.step * np.arange(self.count())
+
+SweepAxis = Union[List[float], SweepRange]
+
+def axis_length(axis) -> int:
+    """Number of values on an axis (a list, an array or a SweepRange)"""
+    return axis.count() if isinstance(axis, SweepRange) else len(axis)
+
+def check_grid_size(axes: Dict[str, Any]):
+    """
+    Reject empty axes and grids over SWEEP_MAX_CELLS before anything is expanded.
+    The cell count is a Python int, so huge axes cannot wrap around.
+    """
+    lengths = {name: axis_length(axis) for name, axis in axes.items()}
+    for name, length in lengths.items():
+        if length == 0:
+            raise HTTPException(status_code=400, detail=f"Sweep axis '{name}' has no values")
+    cells = math.prod(lengths.values())
+    if cells > SWEEP_MAX_CELLS:
+        raise HTTPException(status_code=400, detail=f"Sweep grid has {cells} cells; the limit is {SWEEP_MAX_CELLS}")
+
+def axis_values(
+    name: str,
+    axis: SweepAxis,
+    gt: Optional[float] = None,
+    ge: Optional[float] = None,
+    le: Optional[float] = None,
+    integer: bool = False
+) -> np.ndarray:
+    """
+    Expand one sweep axis (explicit values or a range) into an array, checking every
+    value against the same bounds as the scalar request field (gt/ge/le, whole numbers).
+    """
+    if axis_length(axis) > SWEEP_MAX_CELLS:
+        raise HTTPException(status_code=400, detail=f"Sweep axis '{name}' has {axis_length(axis)} values; the limit is {SWEEP_MAX_CELLS}")
+    values = axis.values() if isinstance(axis, SweepRange) else np.asarray(axis, dtype=np.float64)
+    if len(values) == 0:
+        raise HTTPException(status_code=400, detail=f"Sweep axis '{name}' has no values")
+    bad = ~np.isfinite(values)
+    limits = []
+    if gt is not None:
+        bad |= values <= gt
+        limits.append(f"> {gt:g}")
+    if ge is not None:
+        bad |= values < ge
+        limits.append(f">= {ge:g}")
+    if le is not None:
+        bad |= values > le
+        limits.append(f"<= {le:g}")
+    if integer:
+        # A range step can leave float noise (e.g. 12.000000000001), so round before checking
+        rounded = np.round(values)
+        bad |= ~np.isclose(values, rounded, rtol=0, atol=1e-9)
+        values = rounded
+        limits.append("whole numbers")
+    if bad.any():
+        detail = f"Sweep axis '{name}' has an invalid value {values[np.argmax(bad)]:g}"
+        raise HTTPException(status_code=400, detail=f"{detail}; values must be {', '.join(limits) or 'finite'}")
+    return values
+
+def build_grid(axes: Dict[str, np.ndarray]) -> Dict[str, np.ndarray]:
+    """Flatten the Cartesian product of the axes into one column per axis (C order)"""
+    check_grid_size(axes)
+    mesh = np.meshgrid(*axes.values(), indexing="ij")
+    return {name: m.ravel() for name, m in zip(axes, mesh)}
+
+def select_top_k(values: np.ndarray, top_k: Optional[int]) -> np.ndarray:
+    """Indexes of the `top_k` smallest values in ascending order (all cells if top_k is None)"""
+    if top_k is None or top_k >= len(values):
+        return np.argsort(values, kind="stable")
+    best = np.argpartition(values, top_k - 1)[:top_k]
+    return best[np.argsort(values[best], kind="stable")]
+
+def sweep_response(
+    axes: Dict[str, Any],
+    grid: Dict[str, np.ndarray],
+    results: Dict[str, np.ndarray],
+    sort_by: str,
+    top_k: Optional[int]
+) -> Dict[str, Any]:
+    """
+    Without top_k: the axes plus result columns in grid (C) order, which is compact
+    because the axis values are not repeated per cell.
+    With top_k: the best cells, with their parameters, sorted by `sort_by`.
+    """
+    rounded = {k: np.round(v, 2) for k, v in results.items()}
+    response = {
+        "cells": len(results[sort_by]),
+        "axes": {k: (v.tolist() if isinstance(v, np.ndarray) else v) for k, v in axes.items()},
+        "shape": [len(v) for v in axes.values()],
+        "sort_by": sort_by
+    }
+    if top_k is None:
+        response["results"] = {k: v.tolist() for k, v in rounded.items()}
+        return response
+
+    best = select_top_k(results[sort_by], top_k)
+    response["top"] = {
+        "cell": best.tolist(),
+        **{k: v[best].tolist() for k, v in grid.items()},
+        **{k: v[best].tolist() for k, v in rounded.items()}
+    }
+    return response
+
+class LeasingSweepRequest(BaseModel):
+    vehicle_price: float = Field(gt=0, description="Vehicle price")
+    trade_in_value: float = Field(ge=0, default=0, description="Trade-in value")
+    sales_tax_rate: float = Field(ge=0, le=50, default=0, description="Sales tax rate percentage")
+    acquisition_fee: float = Field(ge=0, default=0, description="Acquisition fee")
+    disposition_fee: float = Field(ge=0, default=0, description="Disposition fee")
+    security_deposit: float = Field(ge=0, default=0, description="Security deposit")
+    first_month_payment: bool = Field(default=False, description="Include first month payment upfront")
+
+    # Swept parameters (a list of values or a {start, stop, step} range)
+    lease_term_months: SweepAxis = Field(description="Lease terms in months")
+    residual_value_percentage: SweepAxis = Field(description="Residual value percentages")
+    money_factor: Optional[SweepAxis] = Field(default=None, description="Money factors")
+    interest_rate: Optional[SweepAxis] = Field(default=None, description="Annual interest rates (used when money_factor is omitted)")
+    down_payment: SweepAxis = Field(default=[0], description="Down payment amounts")
+
+    sort_by: Literal["monthly_payment", "total_cost"] = "monthly_payment"
+    top_k: Optional[int] = Field(default=None, gt=0, description="Return only the k cheapest variants")
+
+class MurabahaSweepRequest(BaseModel):
+    asset_cost: float = Field(gt=0, description="Asset cost")
+    down_payment: float = Field(ge=0, default=0, description="Down payment")
+    additional_fees: float = Field(ge=0, default=0, description="Processing, documentation and insurance fees")
+    grace_period_months: int = Field(ge=0, default=0, description="Grace period in months")
+
+    # Swept parameters
+    payment_term_months: SweepAxis = Field(description="Terms in months")
+    payment_frequency: List[Literal["monthly", "quarterly", "semi-annual", "annual"]] = Field(default=["monthly"], min_length=1)
+    profit_margin_percentage: SweepAxis = Field(description="Profit margin percentages")
+
+    sort_by: Literal["monthly_payment", "total_cost"] = "monthly_payment"
+    top_k: Optional[int] = Field(default=None, gt=0, description="Return only the k cheapest variants")
+
+# Bounds on each swept value, matching the scalar LeasingRequest fields
+LEASING_AXIS_BOUNDS = {
+    "lease_term_months": {"gt": 0, "integer": True},
+    "residual_value_percentage": {"gt": 0, "le": 100},
+    "money_factor": {"ge": 0},
+    "interest_rate": {"ge": 0},
+    "down_payment": {"ge": 0}
+}
+
+# Bounds on each swept value for murabaha (terms are whole months, margins are not negative)
+MURABAHA_AXIS_BOUNDS = {
+    "payment_term_months": {"gt": 0, "integer": True},
+    "profit_margin_percentage": {"ge": 0}
+}
+
+@router.post("/sweep/leasing")
+def sweep_leasing(data: LeasingSweepRequest) -> Dict[str, Any]:
+    """Evaluate every combination of term, residual %, money factor and down payment in one pass"""
+
+    if data.money_factor is not None:
+        rate_axis = ("money_factor", data.money_factor)
+    elif data.interest_rate is not None:
+        rate_axis = ("interest_rate", data.interest_rate)
+    else:
+        raise HTTPException(status_code=400, detail="Either money_factor or interest_rate must be provided")
+
+    swept = {
+        "lease_term_months": data.lease_term_months,
+        "residual_value_percentage": data.residual_value_percentage,
+        rate_axis[0]: rate_axis[1],
+        "down_payment": data.down_payment
+    }
+    check_grid_size(swept)
+    axes = {name: axis_values(name, axis, **LEASING_AXIS_BOUNDS[name]) for name, axis in swept.items()}
+    grid = build_grid(axes)
+
+    money_factor = grid["money_factor"] if "money_factor" in grid else convert_interest_rate_to_money_factor(grid["interest_rate"])
+    terms = calculate_lease_terms(
+        data.vehicle_price,
+        grid["down_payment"],
+        data.trade_in_value,
+        grid["lease_term_months"],
+        grid["residual_value_percentage"],
+        money_factor,
+        data.sales_tax_rate
+    )
+    due_at_signing = calculate_due_at_signing(
+        terms["monthly_payment"],
+        grid["down_payment"],
+        data.security_deposit,
+        data.acquisition_fee,
+        data.first_month_payment
+    )
+    total_costs = calculate_total_costs(
+        terms["monthly_payment"],
+        grid["lease_term_months"],
+        due_at_signing,
+        data.disposition_fee,
+        0,
+        0,
+        0
+    )
+
+    results = {
+        "monthly_payment": terms["monthly_payment"],
+        "due_at_signing": due_at_signing,
+        "total_cost": total_costs["total_lease_cost"]
+    }
+    return sweep_response(axes, grid, results, data.sort_by, data.top_k)
+
+@router.post("/sweep/murabaha")
+def sweep_murabaha(data: MurabahaSweepRequest) -> Dict[str, Any]:
+    """Evaluate every combination of term, payment frequency and profit margin in one pass"""
+
+    frequencies = list(dict.fromkeys(data.payment_frequency))
+    check_grid_size({
+        "payment_term_months": data.payment_term_months,
+        "payment_frequency": frequencies,
+        "profit_margin_percentage": data.profit_margin_percentage
+    })
+    axes = {
+        "payment_term_months": axis_values(
+            "payment_term_months", data.payment_term_months, **MURABAHA_AXIS_BOUNDS["payment_term_months"]
+        ),
+        "payment_frequency": np.arange(len(frequencies)),
+        "profit_margin_percentage": axis_values(
+            "profit_margin_percentage", data.profit_margin_percentage, **MURABAHA_AXIS_BOUNDS["profit_margin_percentage"]
+        )
+    }
+    grid = build_grid(axes)
+
+    payments_per_year = np.array([PAYMENTS_PER_YEAR[f] for f in frequencies])[grid["payment_frequency"]]
+    terms = calculate_murabaha_terms(
+        data.asset_cost,
+        grid["profit_margin_percentage"],
+        grid["payment_term_months"],
+        payments_per_year,
+        down_payment=data.down_payment,
+        additional_fees=data.additional_fees,
+        grace_period_months=data.grace_period_months
+    )
+
+    results = {
+        "installment_amount": terms["installment_amount"],
+        # Installments spread over months, so every frequency is compared on the same basis
+        "monthly_payment": terms["installment_amount"] * payments_per_year / 12,
+        "number_of_payments": terms["number_of_payments"],
+        "total_cost": terms["total_cost"]
+    }
+    axes["payment_frequency"] = frequencies
+    grid["payment_frequency"] = np.array(frequencies)[grid["payment_frequency"]]
+    return sweep_response(axes, grid, results, data.sort_by, data.top_k)
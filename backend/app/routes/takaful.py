@@ -1,48 +1,364 @@
-from fastapi import APIRouter, HTTPException
-from pydantic import BaseModel
+from fastapi import APIRouter, HTTPException, Request
+from fastapi.responses import StreamingResponse
+from pydantic import BaseModel, Field
+from typing import Dict, Any, Iterator, Literal, Optional
+from functools import lru_cache
+import io
+import json
+import os
+import tempfile
+import numpy as np
+
+from app.services.columnar import iter_csv_chunks, parse_csv_column, parse_numeric_csv
+from app.services.mortality import (
+    DEFAULT_MORTALITY_TABLE,
+    MortalityTableError,
+    get_commutation_table,
+    list_mortality_tables
+)
 
 router = APIRouter()
 
+# Rate used to discount contributions and claims
+TAKAFUL_INTEREST_RATE = float(os.getenv("TAKAFUL_INTEREST_RATE", "0.04"))
+
+# Operator's wakalah fee, as a share of the gross contribution
+TAKAFUL_WAKALAH_FEE = float(os.getenv("TAKAFUL_WAKALAH_FEE", "0.25"))
+
+# Mortality loadings (multipliers on qx) by health status
+HEALTH_LOADINGS = {
+    "excellent": 0.9,
+    "good": 1.0,
+    "average": 1.2,
+    "poor": 1.5
+}
+
 class TakafulInput(BaseModel):
     age: int
     coverage_amount: float
     term_years: int
     health_status: str  # "excellent", "good", "average", "poor"
+    mortality_table: Optional[str] = Field(default=None, description="Mortality table name (defaults to DEFAULT_MORTALITY_TABLE)")
+    interest_rate: Optional[float] = Field(default=None, ge=0, le=0.5, description="Discount rate, e.g. 0.04")
+    wakalah_fee: Optional[float] = Field(default=None, ge=0, lt=1, description="Operator fee as a share of the contribution")
+
+def takaful_commutation_table(table: Optional[str], interest_rate: Optional[float], health_status: str):
+    """Cached commutation columns for a table, rate and health loading"""
+    return get_commutation_table(
+        table or DEFAULT_MORTALITY_TABLE,
+        TAKAFUL_INTEREST_RATE if interest_rate is None else interest_rate,
+        HEALTH_LOADINGS.get(health_status.lower(), 1.0)
+    )
+
+def gross_up(net_contribution, wakalah_fee: float):
+    """Contribution including the operator's wakalah fee"""
+    return net_contribution / (1 - wakalah_fee)
 
-@router.post("/api/takaful")
+@router.post("/takaful")
+@router.post("/api/takaful", include_in_schema=False)
 def estimate_takaful(input: TakafulInput):
+    """
+    Level annual contribution for term cover from the mortality table's
+    commutation columns: S (Mx - Mx+n) / (Nx - Nx+n), grossed up for the wakalah fee.
+    """
     if input.age <= 0 or input.coverage_amount <= 0 or input.term_years <= 0:
         raise HTTPException(status_code=400, detail="Invalid input values")
 
-    # Base rate per 1000 PKR coverage (simplified)
-    base_rate = 0.8
+    try:
+        table = takaful_commutation_table(input.mortality_table, input.interest_rate, input.health_status)
+        net_annual = float(table.net_annual_contribution(input.age, input.term_years, input.coverage_amount))
+        net_single = float(table.net_single_contribution(input.age, input.term_years, input.coverage_amount))
+    except MortalityTableError as e:
+        raise HTTPException(status_code=400, detail=str(e))
 
-    # Adjust rate by age
-    if input.age < 30:
-        age_factor = 1.0
-    elif input.age < 45:
-        age_factor = 1.2
-    elif input.age < 60:
-        age_factor = 1.5
-    else:
-        age_factor = 2.0
-
-    # Adjust rate by health status
-    health_factors = {
-        "excellent": 0.9,
-        "good": 1.0,
-        "average": 1.2,
-        "poor": 1.5
+    wakalah_fee = TAKAFUL_WAKALAH_FEE if input.wakalah_fee is None else input.wakalah_fee
+    annual_contribution = gross_up(net_annual, wakalah_fee)
+
+    return {
+        "annual_contribution": round(annual_contribution, 2),
+        "monthly_contribution": round(annual_contribution / 12, 2),
+        "net_annual_contribution": round(net_annual, 2),
+        "wakalah_fee": round(annual_contribution - net_annual, 2),
+        "single_contribution": round(gross_up(net_single, wakalah_fee), 2),
+        # Cover stops at the end of the table
+        "covered_years": min(input.term_years, table.max_age + 1 - input.age),
+        "mortality_table": input.mortality_table or DEFAULT_MORTALITY_TABLE,
+        "mortality_table_version": table.version,
+        "interest_rate": table.interest_rate
+    }
+
+@router.get("/takaful/mortality-tables")
+def get_mortality_tables():
+    """Mortality tables available for pricing"""
+    return {
+        "default": DEFAULT_MORTALITY_TABLE,
+        "tables": list_mortality_tables()
+    }
+
+
+# Group quotes from employee census files
+
+# Census rows priced per chunk
+GROUP_CHUNK_MEMBERS = int(os.getenv("TAKAFUL_GROUP_CHUNK_MEMBERS", "10000"))
+
+# Priced member lines kept in memory before spilling to a temporary file
+GROUP_SPOOL_BYTES = int(os.getenv("TAKAFUL_GROUP_SPOOL_BYTES", str(8 * 1024 * 1024)))
+GROUP_STREAM_BLOCK = 64 * 1024
+
+# Largest census returned with per-member columns in one JSON body; bigger ones use ndjson or csv
+GROUP_JSON_MAX_MEMBERS = int(os.getenv("TAKAFUL_GROUP_JSON_MAX_MEMBERS", "50000"))
+
+HEALTH_CLASSES = list(HEALTH_LOADINGS)
+
+GROUP_MEMBER_COLUMNS = ["row", "age", "health_status", "coverage_amount", "term_years", "status", "net_annual_contribution", "annual_contribution"]
+
+GROUP_ROW_FORMATS = {
+    "csv": "%d,%d,%s,%.2f,%d,%s,%.2f,%.2f",
+    "ndjson": (
+        '{"row": %d, "age": %d, "health_status": "%s", "coverage_amount": %.2f, "term_years": %d, '
+        '"status": "%s", "net_annual_contribution": %.2f, "annual_contribution": %.2f}'
+    )
+}
+
+GROUP_MEDIA_TYPES = {
+    "csv": "text/csv",
+    "ndjson": "application/x-ndjson"
+}
+
+@lru_cache(maxsize=32)
+def health_commutation_grid(table: str, interest_rate: float) -> Dict[str, Any]:
+    """
+    Commutation columns of every health class stacked into (health class x age)
+    arrays, so a whole census is priced with one fancy-indexing lookup.
+    """
+    tables = [get_commutation_table(table, interest_rate, HEALTH_LOADINGS[h]) for h in HEALTH_CLASSES]
+    return {
+        "Mx": np.stack([t.Mx for t in tables]),
+        "Nx": np.stack([t.Nx for t in tables]),
+        "qx": np.stack([t.qx for t in tables]),
+        "min_age": tables[0].min_age,
+        "max_age": tables[0].max_age,
+        "version": tables[0].version
     }
 
-    health_factor = health_factors.get(input.health_status.lower(), 1.0)
+def health_class_index(health_status: np.ndarray) -> np.ndarray:
+    """Row index into the grid for each health status; unknown statuses price as good"""
+    default = HEALTH_CLASSES.index("good")
+    labels, inverse = np.unique(np.char.lower(np.char.strip(health_status.astype(str))), return_inverse=True)
+    lookup = np.array([HEALTH_CLASSES.index(l) if l in HEALTH_LOADINGS else default for l in labels], dtype=np.int64)
+    return lookup[inverse].reshape(-1)
 
-    # Final premium rate per 1000 PKR
-    premium_rate = base_rate * age_factor * health_factor
+def price_census(
+    grid: Dict[str, Any],
+    age: np.ndarray,
+    health: np.ndarray,
+    coverage: np.ndarray,
+    term: np.ndarray,
+    wakalah_fee: float
+) -> Dict[str, np.ndarray]:
+    """
+    Net and gross annual contributions of every member, S (Mx - Mx+n) / (Nx - Nx+n)
+    read from the health class's columns. Members outside the table's ages or
+    without positive cover and term are marked invalid and priced at zero.
+    """
+    valid = (age >= grid["min_age"]) & (age <= grid["max_age"]) & (coverage > 0) & (term > 0)
+    x = np.where(valid, age - grid["min_age"], 0).astype(np.int64)
+    end = np.minimum(x + np.maximum(term, 0).astype(np.int64), grid["Mx"].shape[1] - 1)
 
-    # Calculate annual contribution
-    annual_contribution = (input.coverage_amount / 1000) * premium_rate
+    Mx, Nx = grid["Mx"], grid["Nx"]
+    with np.errstate(divide="ignore", invalid="ignore"):
+        net = coverage * (Mx[health, x] - Mx[health, end]) / (Nx[health, x] - Nx[health, end])
+    net = np.where(valid, net, 0.0)
 
     return {
-        "annual_contribution": round(annual_contribution, 2)
+        "valid": valid,
+        "net_annual_contribution": net,
+        "annual_contribution": gross_up(net, wakalah_fee),
+        # Deaths expected in the first year, for the pool's claims statistics
+        "first_year_qx": np.where(valid, grid["qx"][health, x], 0.0)
     }
+
+class CensusSummary:
+    """Running pool statistics over the priced chunks of a census"""
+
+    def __init__(self):
+        self.members = 0
+        self.rejected = 0
+        self.coverage = 0.0
+        self.age_sum = 0.0
+        self.net = 0.0
+        self.gross = 0.0
+        self.expected_claims = 0.0
+        self.claims_variance = 0.0
+        self.by_health = np.zeros((3, len(HEALTH_CLASSES)))
+
+    def add(self, age: np.ndarray, health: np.ndarray, coverage: np.ndarray, priced: Dict[str, np.ndarray]):
+        valid = priced["valid"]
+        cover = np.where(valid, coverage, 0.0)
+        q = priced["first_year_qx"]
+
+        self.members += int(valid.sum())
+        self.rejected += int((~valid).sum())
+        self.coverage += float(cover.sum())
+        self.age_sum += float(age[valid].sum())
+        self.net += float(priced["net_annual_contribution"].sum())
+        self.gross += float(priced["annual_contribution"].sum())
+        # Each member's claim is a Bernoulli(q) draw of their cover
+        self.expected_claims += float((q * cover).sum())
+        self.claims_variance += float((q * (1 - q) * cover ** 2).sum())
+
+        classes = len(HEALTH_CLASSES)
+        self.by_health[0] += np.bincount(health[valid], minlength=classes)
+        self.by_health[1] += np.bincount(health, weights=cover, minlength=classes)
+        self.by_health[2] += np.bincount(health, weights=priced["annual_contribution"], minlength=classes)
+
+    def result(self) -> Dict[str, Any]:
+        return {
+            "members": self.members,
+            "rejected_members": self.rejected,
+            "total_coverage": round(self.coverage, 2),
+            "average_age": round(self.age_sum / self.members, 2) if self.members else 0,
+            "total_net_annual_contribution": round(self.net, 2),
+            "total_wakalah_fee": round(self.gross - self.net, 2),
+            "total_annual_contribution": round(self.gross, 2),
+            "average_annual_contribution": round(self.gross / self.members, 2) if self.members else 0,
+            "expected_claims_first_year": round(self.expected_claims, 2),
+            "claims_std_dev_first_year": round(float(np.sqrt(self.claims_variance)), 2),
+            "by_health_status": {
+                h: {
+                    "members": int(self.by_health[0, i]),
+                    "coverage": round(float(self.by_health[1, i]), 2),
+                    "annual_contribution": round(float(self.by_health[2, i]), 2)
+                }
+                for i, h in enumerate(HEALTH_CLASSES)
+            }
+        }
+
+def parse_census_chunk(text: str, default_term: int) -> Dict[str, np.ndarray]:
+    """Columns of one census chunk: age, coverage_amount, optional term_years and health_status"""
+    columns = parse_numeric_csv(
+        text,
+        ["age", "coverage_amount", "term_years"],
+        required=("age", "coverage_amount"),
+        defaults={"term_years": default_term}
+    )
+    header = text.partition("\n")[0]
+    if "health_status" in [h.strip().strip('"').lower() for h in header.split(",")]:
+        health_status = parse_csv_column(text, "health_status")
+    else:
+        health_status = np.full(len(columns["age"]), "good")
+    return {
+        "age": columns["age"].astype(np.int64),
+        "coverage_amount": columns["coverage_amount"],
+        "term_years": columns["term_years"].astype(np.int64),
+        "health": health_class_index(health_status)
+    }
+
+def census_rows(first_row: int, census: Dict[str, np.ndarray], priced: Dict[str, np.ndarray], fmt: str) -> str:
+    """Per-member output lines for one priced chunk"""
+    count = len(census["age"])
+    rows = np.empty((count, len(GROUP_MEMBER_COLUMNS)), dtype=object)
+    rows[:, 0] = np.arange(first_row, first_row + count)
+    rows[:, 1] = census["age"]
+    rows[:, 2] = np.array(HEALTH_CLASSES, dtype=object)[census["health"]]
+    rows[:, 3] = census["coverage_amount"]
+    rows[:, 4] = census["term_years"]
+    rows[:, 5] = np.where(priced["valid"], "ok", "rejected")
+    rows[:, 6] = priced["net_annual_contribution"]
+    rows[:, 7] = priced["annual_contribution"]
+
+    buffer = io.StringIO()
+    np.savetxt(buffer, rows, fmt=GROUP_ROW_FORMATS[fmt])
+    return buffer.getvalue()
+
+@router.post("/takaful/group")
+async def quote_group_takaful(
+    request: Request,
+    term_years: int = 1,
+    mortality_table: Optional[str] = None,
+    interest_rate: Optional[float] = None,
+    wakalah_fee: Optional[float] = None,
+    format: Literal["json", "ndjson", "csv"] = "json"
+):
+    """
+    Group quote for an employee census uploaded as a CSV request body with columns
+    age and coverage_amount, and optionally term_years (default `term_years`) and
+    health_status. The census is read and priced a chunk at a time.
+
+    json returns the pool statistics and per-member columns, for censuses of up to
+    GROUP_JSON_MAX_MEMBERS rows; ndjson streams one line per member followed by a
+    {"summary": ...} line; csv streams the members. The streamed formats hold one
+    chunk in memory and spool the priced lines, so memory stays bounded for any
+    census size.
+    """
+    if term_years <= 0:
+        raise HTTPException(status_code=400, detail="term_years must be positive")
+    if interest_rate is not None and not 0 <= interest_rate <= 0.5:
+        raise HTTPException(status_code=400, detail="interest_rate must be between 0 and 0.5")
+    if wakalah_fee is not None and not 0 <= wakalah_fee < 1:
+        raise HTTPException(status_code=400, detail="wakalah_fee must be at least 0 and below 1")
+
+    table_name = mortality_table or DEFAULT_MORTALITY_TABLE
+    fee = TAKAFUL_WAKALAH_FEE if wakalah_fee is None else wakalah_fee
+    try:
+        grid = health_commutation_grid(table_name, TAKAFUL_INTEREST_RATE if interest_rate is None else interest_rate)
+    except MortalityTableError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    quote = {
+        "mortality_table": table_name,
+        "mortality_table_version": grid["version"],
+        "interest_rate": TAKAFUL_INTEREST_RATE if interest_rate is None else interest_rate,
+        "wakalah_fee": fee
+    }
+    summary = CensusSummary()
+    members = {c: [] for c in ("age", "health_status", "coverage_amount", "term_years", "status", "annual_contribution")}
+    # Member lines are spooled (to disk past GROUP_SPOOL_BYTES) while the census is
+    # still being read, and sent once it is fully priced
+    spool = tempfile.SpooledTemporaryFile(max_size=GROUP_SPOOL_BYTES, mode="w+")
+    if format == "csv":
+        spool.write(",".join(GROUP_MEMBER_COLUMNS) + "\n")
+
+    try:
+        row = 1
+        async for text in iter_csv_chunks(request.stream(), GROUP_CHUNK_MEMBERS):
+            census = parse_census_chunk(text, term_years)
+            priced = price_census(grid, census["age"], census["health"], census["coverage_amount"], census["term_years"], fee)
+            summary.add(census["age"], census["health"], census["coverage_amount"], priced)
+
+            if format in GROUP_ROW_FORMATS:
+                spool.write(census_rows(row, census, priced, format))
+            else:
+                if row - 1 + len(census["age"]) > GROUP_JSON_MAX_MEMBERS:
+                    raise HTTPException(
+                        status_code=400,
+                        detail=f"Census has more than {GROUP_JSON_MAX_MEMBERS} members; use format=ndjson or format=csv"
+                    )
+                members["age"] += census["age"].tolist()
+                members["health_status"] += np.array(HEALTH_CLASSES)[census["health"]].tolist()
+                members["coverage_amount"] += census["coverage_amount"].tolist()
+                members["term_years"] += census["term_years"].tolist()
+                members["status"] += np.where(priced["valid"], "ok", "rejected").tolist()
+                members["annual_contribution"] += np.round(priced["annual_contribution"], 2).tolist()
+            row += len(census["age"])
+    except ValueError as e:
+        spool.close()
+        raise HTTPException(status_code=400, detail=f"Invalid census CSV: {str(e)}")
+    except HTTPException:
+        spool.close()
+        raise
+
+    if format not in GROUP_ROW_FORMATS:
+        spool.close()
+        return {**quote, "summary": summary.result(), "members": members}
+
+    if format == "ndjson":
+        spool.write(json.dumps({"summary": {**quote, **summary.result()}}) + "\n")
+    spool.seek(0)
+
+    def spooled() -> Iterator[str]:
+        with spool:
+            while block := spool.read(GROUP_STREAM_BLOCK):
+                yield block
+
+    return StreamingResponse(spooled(), media_type=GROUP_MEDIA_TYPES[format])
@@ -1,9 +1,15 @@
-from fastapi import APIRouter, HTTPException
+from fastapi import APIRouter, HTTPException, Query, Request
 from pydantic import BaseModel, Field
-from typing import Dict, Any
+from typing import Dict, Any, List, Optional
+import numpy as np
+
+from app.routes.prices import get_fx_table, get_live_metal_prices, currency_rate
+from app.services.columnar import parse_numeric_csv
 
 router = APIRouter()
 
+# The helpers below work element-wise on NumPy arrays as well as on floats
+
 def calculate_total_assets(cash: float, gold: float, gold_rate: float, silver: float, silver_rate: float, business_assets: float) -> float:
     """Calculate total assets value"""
     total = (
@@ -16,7 +22,7 @@ def calculate_total_assets(cash: float, gold: float, gold_rate: float, silver: f
 
 def calculate_zakatable_amount(total_assets: float, liabilities: float) -> float:
     """Calculate zakatable amount after deducting liabilities"""
-    return max(total_assets - liabilities, 0)
+    return np.maximum(total_assets - liabilities, 0)
 
 def calculate_nisab(gold_rate: float) -> float:
     """Calculate nisab threshold (85 grams of gold)"""
@@ -24,18 +30,96 @@ def calculate_nisab(gold_rate: float) -> float:
 
 def calculate_zakat_due(zakatable_amount: float, nisab: float) -> float:
     """Calculate zakat due (2.5% if above nisab)"""
-    if zakatable_amount >= nisab:
-        return zakatable_amount * 0.025
-    return 0
+    return zakatable_amount * 0.025 * (zakatable_amount >= nisab)
+
+def calculate_zakat_batch(
+    cash: np.ndarray,
+    gold: np.ndarray,
+    silver: np.ndarray,
+    business_assets: np.ndarray,
+    liabilities: np.ndarray,
+    gold_rate: float,
+    silver_rate: float
+) -> Dict[str, np.ndarray]:
+    """Calculate zakat for many households at once (one array element per household)"""
+    total_assets = calculate_total_assets(cash, gold, gold_rate, silver, silver_rate, business_assets)
+    zakatable_amount = calculate_zakatable_amount(total_assets, liabilities)
+    nisab = calculate_nisab(gold_rate)
+    zakat_due = calculate_zakat_due(zakatable_amount, nisab)
+    
+    return {
+        "total_assets": total_assets,
+        "zakatable_amount": zakatable_amount,
+        "nisab": nisab,
+        "zakat_due": zakat_due,
+        "is_zakat_applicable": zakatable_amount >= nisab
+    }
+
+async def resolve_metal_rates(gold_rate: Optional[float], silver_rate: Optional[float], currency: str) -> Dict[str, Any]:
+    """Fill omitted gold/silver rates in-process from the live price cache"""
+    rates = {
+        "gold_rate_per_gram": gold_rate,
+        "silver_rate_per_gram": silver_rate,
+        "rates_source": "request",
+        "rates_timestamp": None
+    }
+    if gold_rate is None or silver_rate is None:
+        live = await get_live_metal_prices(currency)
+        if gold_rate is None:
+            rates["gold_rate_per_gram"] = live.gold_price_per_gram
+        if silver_rate is None:
+            rates["silver_rate_per_gram"] = live.silver_price_per_gram
+        rates["rates_source"] = live.source
+        rates["rates_timestamp"] = live.last_updated
+    return rates
+
+async def resolve_conversion(currency: str, target_currency: Optional[str]) -> tuple:
+    """Return the reporting currency and the factor converting results into it"""
+    currency = currency.upper()
+    target_currency = (target_currency or currency).upper()
+    if target_currency == currency:
+        return target_currency, 1.0
+    return target_currency, currency_rate(await get_fx_table(), currency, target_currency)
 
 class ZakatRequest(BaseModel):
-    cash: float = Field(ge=0, description="Cash amount in PKR")
+    cash: float = Field(ge=0, description="Cash amount")
     gold: float = Field(ge=0, description="Gold amount in grams")
     silver: float = Field(ge=0, description="Silver amount in grams")
-    business_assets: float = Field(ge=0, description="Business assets value in PKR")
-    liabilities: float = Field(ge=0, description="Total liabilities in PKR")
-    gold_rate_per_gram: float = Field(gt=0, description="Gold price per gram in PKR")
-    silver_rate_per_gram: float = Field(ge=0, description="Silver price per gram in PKR")
+    business_assets: float = Field(ge=0, description="Business assets value")
+    liabilities: float = Field(ge=0, description="Total liabilities")
+    gold_rate_per_gram: Optional[float] = Field(default=None, gt=0, description="Gold price per gram (live price if omitted)")
+    silver_rate_per_gram: Optional[float] = Field(default=None, ge=0, description="Silver price per gram (live price if omitted)")
+    currency: str = Field(default="PKR", description="Currency of the amounts and rates above")
+    target_currency: Optional[str] = Field(default=None, description="Currency to report results in (defaults to currency)")
+
+ZAKAT_BATCH_COLUMNS = ["cash", "gold", "silver", "business_assets", "liabilities"]
+
+class ZakatBatchRequest(BaseModel):
+    # Columnar payload: one list per field, one element per household (omitted columns are 0)
+    cash: Optional[List[float]] = Field(default=None, description="Cash amounts")
+    gold: Optional[List[float]] = Field(default=None, description="Gold amounts in grams")
+    silver: Optional[List[float]] = Field(default=None, description="Silver amounts in grams")
+    business_assets: Optional[List[float]] = Field(default=None, description="Business asset values")
+    liabilities: Optional[List[float]] = Field(default=None, description="Total liabilities")
+    gold_rate_per_gram: Optional[float] = Field(default=None, gt=0, description="Gold price per gram (live price if omitted)")
+    silver_rate_per_gram: Optional[float] = Field(default=None, ge=0, description="Silver price per gram (live price if omitted)")
+    currency: str = Field(default="PKR", description="Currency of the amounts and rates above")
+    target_currency: Optional[str] = Field(default=None, description="Currency to report results in (defaults to currency)")
+
+class ZakatBatchResponse(BaseModel):
+    count: int
+    currency: str
+    nisab: float
+    total_assets: List[float]
+    zakatable_amount: List[float]
+    zakat_due: List[float]
+    is_zakat_applicable: List[bool]
+    total_zakat_due: float
+    applicable_count: int
+    gold_rate_per_gram: float
+    silver_rate_per_gram: float
+    rates_source: str = "request"
+    rates_timestamp: Optional[str] = None
 
 class ZakatResponse(BaseModel):
     total_assets: float
@@ -43,19 +127,34 @@ class ZakatResponse(BaseModel):
     nisab: float
     zakat_due: float
     is_zakat_applicable: bool
+    currency: str = "PKR"
+    
+    # Rates used (in the input currency) and where they came from
+    gold_rate_per_gram: float
+    silver_rate_per_gram: float
+    rates_source: str = "request"
+    rates_timestamp: Optional[str] = None
 
 @router.post("/zakat", response_model=ZakatResponse)
-def calculate_zakat(data: ZakatRequest) -> Dict[str, Any]:
+async def calculate_zakat(data: ZakatRequest) -> Dict[str, Any]:
     """Calculate zakat based on provided financial data"""
     
+    # Results are reported in the target currency, converted from the cached rate table
+    target_currency, conversion = await resolve_conversion(data.currency, data.target_currency)
+    
+    # Fill omitted rates in-process from the live price cache
+    rates = await resolve_metal_rates(data.gold_rate_per_gram, data.silver_rate_per_gram, data.currency.upper())
+    gold_rate = rates["gold_rate_per_gram"]
+    silver_rate = rates["silver_rate_per_gram"]
+    
     try:
         # Calculate total assets
         total_assets = calculate_total_assets(
             data.cash,
             data.gold,
-            data.gold_rate_per_gram,
+            gold_rate,
             data.silver,
-            data.silver_rate_per_gram,
+            silver_rate,
             data.business_assets
         )
 
@@ -63,21 +162,119 @@ def calculate_zakat(data: ZakatRequest) -> Dict[str, Any]:
         zakatable_amount = calculate_zakatable_amount(total_assets, data.liabilities)
         
         # Calculate nisab threshold
-        nisab = calculate_nisab(data.gold_rate_per_gram)
+        nisab = calculate_nisab(gold_rate)
         
         # Calculate zakat due
         zakat_due = calculate_zakat_due(zakatable_amount, nisab)
         
         # Determine if zakat is applicable
-        is_zakat_applicable = zakatable_amount >= nisab
+        is_zakat_applicable = bool(zakatable_amount >= nisab)
 
         return {
-            "total_assets": round(total_assets, 2),
-            "zakatable_amount": round(zakatable_amount, 2),
-            "nisab": round(nisab, 2),
-            "zakat_due": round(zakat_due, 2),
-            "is_zakat_applicable": is_zakat_applicable
+            "total_assets": round(total_assets * conversion, 2),
+            "zakatable_amount": round(zakatable_amount * conversion, 2),
+            "nisab": round(nisab * conversion, 2),
+            "zakat_due": round(zakat_due * conversion, 2),
+            "is_zakat_applicable": is_zakat_applicable,
+            "currency": target_currency,
+            "gold_rate_per_gram": round(gold_rate, 2),
+            "silver_rate_per_gram": round(silver_rate, 2),
+            "rates_source": rates["rates_source"],
+            "rates_timestamp": rates["rates_timestamp"]
         }
         
     except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Error calculating zakat: {str(e)}")
\ No newline at end of file
+        raise HTTPException(status_code=500, detail=f"Error calculating zakat: {str(e)}")
+
+async def run_zakat_batch(
+    columns: Dict[str, np.ndarray],
+    gold_rate_per_gram: Optional[float],
+    silver_rate_per_gram: Optional[float],
+    currency: str,
+    target_currency: Optional[str]
+) -> Dict[str, Any]:
+    """Validate batch columns, evaluate them in one vectorized pass and build the columnar response"""
+    lengths = {len(v) for v in columns.values()}
+    if len(lengths) > 1:
+        raise HTTPException(status_code=400, detail="All columns must have the same length")
+    if any((v < 0).any() for v in columns.values()):
+        raise HTTPException(status_code=400, detail="Amounts must not be negative")
+    
+    target_currency, conversion = await resolve_conversion(currency, target_currency)
+    rates = await resolve_metal_rates(gold_rate_per_gram, silver_rate_per_gram, currency.upper())
+    
+    result = calculate_zakat_batch(
+        columns["cash"],
+        columns["gold"],
+        columns["silver"],
+        columns["business_assets"],
+        columns["liabilities"],
+        rates["gold_rate_per_gram"],
+        rates["silver_rate_per_gram"]
+    )
+    zakat_due = result["zakat_due"] * conversion
+    
+    return {
+        "count": len(zakat_due),
+        "currency": target_currency,
+        "nisab": round(float(result["nisab"]) * conversion, 2),
+        "total_assets": np.round(result["total_assets"] * conversion, 2).tolist(),
+        "zakatable_amount": np.round(result["zakatable_amount"] * conversion, 2).tolist(),
+        "zakat_due": np.round(zakat_due, 2).tolist(),
+        "is_zakat_applicable": result["is_zakat_applicable"].tolist(),
+        "total_zakat_due": round(float(zakat_due.sum()), 2),
+        "applicable_count": int(result["is_zakat_applicable"].sum()),
+        "gold_rate_per_gram": round(rates["gold_rate_per_gram"], 2),
+        "silver_rate_per_gram": round(rates["silver_rate_per_gram"], 2),
+        "rates_source": rates["rates_source"],
+        "rates_timestamp": rates["rates_timestamp"]
+    }
+
+@router.post("/zakat/batch", response_model=ZakatBatchResponse)
+async def calculate_zakat_batch_columns(data: ZakatBatchRequest) -> Dict[str, Any]:
+    """Calculate zakat for a whole roster sent as columns (one list per field)"""
+    
+    provided = {c: getattr(data, c) for c in ZAKAT_BATCH_COLUMNS if getattr(data, c) is not None}
+    if not provided:
+        raise HTTPException(status_code=400, detail="At least one column must be provided")
+    rows = len(next(iter(provided.values())))
+    
+    columns = {
+        c: np.asarray(provided[c], dtype=np.float64) if c in provided else np.zeros(rows)
+        for c in ZAKAT_BATCH_COLUMNS
+    }
+    return await run_zakat_batch(
+        columns,
+        data.gold_rate_per_gram,
+        data.silver_rate_per_gram,
+        data.currency,
+        data.target_currency
+    )
+
+@router.post("/zakat/batch/csv", response_model=ZakatBatchResponse)
+async def calculate_zakat_batch_csv(
+    request: Request,
+    gold_rate_per_gram: Optional[float] = Query(default=None, gt=0),
+    silver_rate_per_gram: Optional[float] = Query(default=None, ge=0),
+    currency: str = "PKR",
+    target_currency: Optional[str] = None
+) -> Dict[str, Any]:
+    """
+    Calculate zakat for a roster uploaded as a CSV request body.
+    The header row names the columns (cash, gold, silver, business_assets, liabilities);
+    missing columns are treated as 0 and any other columns are ignored.
+    """
+    
+    try:
+        text = (await request.body()).decode("utf-8")
+        columns = parse_numeric_csv(text, ZAKAT_BATCH_COLUMNS)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=f"Invalid CSV: {str(e)}")
+    
+    return await run_zakat_batch(
+        columns,
+        gold_rate_per_gram,
+        silver_rate_per_gram,
+        currency,
+        target_currency
+    )
\ No newline at end of file
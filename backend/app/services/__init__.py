@@ -0,0 +1 @@
+# Shared infrastructure used by the API routes (upstream clients, caches, engines)
@@ -0,0 +1,291 @@
+import asyncio
+import ipaddress
+import logging
+import math
+import os
+import time
+from collections import OrderedDict, deque
+from contextlib import asynccontextmanager
+from typing import Any, Deque, Dict, List, Optional, Tuple
+
+from fastapi import HTTPException, Request
+from fastapi.responses import StreamingResponse
+
+logger = logging.getLogger(__name__)
+
+
+class OverloadedError(Exception):
+    """Raised when a call is shed instead of queued; `retry_after` is a hint in seconds"""
+
+    def __init__(self, name: str, retry_after: float):
+        super().__init__(f"{name} is overloaded, retry in {retry_after:.1f}s")
+        self.name = name
+        self.retry_after = retry_after
+
+
+def retry_after_header(seconds: float) -> Dict[str, str]:
+    return {"Retry-After": str(max(1, math.ceil(seconds)))}
+
+
+class ConcurrencyLimiter:
+    """
+    Caps concurrent calls to one upstream, with a bounded FIFO wait queue.
+
+    Admission is deadline-aware: the expected queue wait is estimated from the
+    running average time a slot is held, and a caller is rejected straight away
+    (OverloadedError) when the queue is full or the estimate exceeds
+    `queue_budget`. Callers that are admitted to the queue but still wait longer
+    than the budget are rejected too, so nobody waits past it.
+    """
+
+    def __init__(self, name: str, max_concurrency: int = 8, max_queue: int = 32, queue_budget: float = 10.0):
+        self.name = name
+        self.max_concurrency = max(1, max_concurrency)
+        self.max_queue = max(0, max_queue)
+        self.queue_budget = queue_budget
+        self._active = 0
+        self._waiters: Deque[asyncio.Future] = deque()
+        # Running average of how long a slot is held (None until the first release)
+        self._service_time: Optional[float] = None
+        self.admitted = 0
+        self.rejected = 0
+
+    def estimated_wait(self) -> float:
+        """Expected wait for a caller joining the back of the queue now"""
+        if self._active < self.max_concurrency and not self._waiters:
+            return 0.0
+        rounds = (len(self._waiters) + 1) / self.max_concurrency
+        return rounds * (self._service_time or 0.0)
+
+    def _reject(self, retry_after: float):
+        self.rejected += 1
+        raise OverloadedError(self.name, retry_after)
+
+    async def acquire(self):
+        """Take a slot, waiting in the queue if admitted; raises OverloadedError when shed"""
+        if self._active < self.max_concurrency and not self._waiters:
+            self._active += 1
+            self.admitted += 1
+            return
+
+        estimate = self.estimated_wait()
+        if len(self._waiters) >= self.max_queue or estimate > self.queue_budget:
+            self._reject(estimate or self.queue_budget)
+
+        waiter = asyncio.get_running_loop().create_future()
+        self._waiters.append(waiter)
+        try:
+            await asyncio.wait_for(waiter, self.queue_budget)
+        except (asyncio.TimeoutError, asyncio.CancelledError) as e:
+            if waiter.done() and not waiter.cancelled():
+                # The slot was handed over just as we gave up - pass it on
+                self.release()
+            elif waiter in self._waiters:
+                self._waiters.remove(waiter)
+            if isinstance(e, asyncio.CancelledError):
+                raise
+            self._reject(self.estimated_wait() or self.queue_budget)
+        self.admitted += 1
+
+    def release(self, held: Optional[float] = None):
+        """Give a slot back (handing it to the next waiter); `held` feeds the wait estimate"""
+        if held is not None:
+            self._service_time = held if self._service_time is None else 0.8 * self._service_time + 0.2 * held
+
+        while self._waiters:
+            waiter = self._waiters.popleft()
+            if not waiter.done():
+                # The slot passes straight to the waiter, so _active is unchanged
+                waiter.set_result(None)
+                return
+        self._active -= 1
+
+    async def lease(self) -> "SlotLease":
+        """Take a slot to be given back later through the returned lease"""
+        await self.acquire()
+        return SlotLease(self)
+
+    @asynccontextmanager
+    async def slot(self):
+        await self.acquire()
+        started = time.monotonic()
+        try:
+            yield
+        finally:
+            self.release(time.monotonic() - started)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "name": self.name,
+            "active": self._active,
+            "queued": len(self._waiters),
+            "max_concurrency": self.max_concurrency,
+            "max_queue": self.max_queue,
+            "queue_budget_seconds": self.queue_budget,
+            "avg_service_seconds": None if self._service_time is None else round(self._service_time, 3),
+            "admitted": self.admitted,
+            "rejected": self.rejected
+        }
+
+
+class SlotLease:
+    """A held ConcurrencyLimiter slot; release() gives it back exactly once"""
+
+    def __init__(self, limiter: ConcurrencyLimiter):
+        self.limiter = limiter
+        self.started = time.monotonic()
+        self.released = False
+
+    def release(self):
+        if not self.released:
+            self.released = True
+            self.limiter.release(time.monotonic() - self.started)
+
+
+class LeasedStreamingResponse(StreamingResponse):
+    """
+    A StreamingResponse holding a limiter slot. The slot is released when the
+    response ends in any way: finished, failed, client gone, or the body never
+    iterated at all (where a finally in the body generator would never run).
+    """
+
+    def __init__(self, content, lease: SlotLease, **kwargs):
+        super().__init__(content, **kwargs)
+        self.lease = lease
+
+    async def __call__(self, scope, receive, send):
+        try:
+            await super().__call__(scope, receive, send)
+        finally:
+            self.lease.release()
+
+
+class RateLimiter:
+    """
+    Per-client token buckets: `rate` requests per second with bursts of up to `burst`.
+
+    Buckets are kept for the `max_clients` most recently seen clients.
+    A rate of 0 disables limiting.
+    """
+
+    def __init__(self, name: str, rate: float = 1.0, burst: float = 10.0, max_clients: int = 10000):
+        self.name = name
+        self.rate = rate
+        self.burst = max(1.0, burst)
+        self.max_clients = max_clients
+        self._buckets: "OrderedDict[str, Tuple[float, float]]" = OrderedDict()
+        self.limited = 0
+
+    def take(self, client: str) -> float:
+        """Spend one token for `client`; returns 0 if allowed, else seconds until a token is free"""
+        if self.rate <= 0:
+            return 0.0
+
+        now = time.monotonic()
+        tokens, last = self._buckets.pop(client, (self.burst, now))
+        tokens = min(self.burst, tokens + (now - last) * self.rate)
+
+        if tokens >= 1:
+            tokens -= 1
+            wait = 0.0
+        else:
+            wait = (1 - tokens) / self.rate
+            self.limited += 1
+
+        self._buckets[client] = (tokens, now)
+        if len(self._buckets) > self.max_clients:
+            self._buckets.popitem(last=False)
+        return wait
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "name": self.name,
+            "rate_per_second": self.rate,
+            "burst": self.burst,
+            "clients": len(self._buckets),
+            "limited": self.limited
+        }
+
+
+def parse_trusted_proxies(value: str) -> List[Any]:
+    """Networks from a comma-separated list of addresses or CIDR ranges"""
+    return [ipaddress.ip_network(item.strip(), strict=False) for item in value.split(",") if item.strip()]
+
+
+# Reverse proxies whose X-Forwarded-For is believed (TRUSTED_PROXIES, e.g. "10.0.0.0/8,127.0.0.1").
+# With none configured the header is ignored, so callers cannot pick their own identity.
+TRUSTED_PROXIES = parse_trusted_proxies(os.getenv("TRUSTED_PROXIES", ""))
+
+
+def is_trusted_proxy(host: Optional[str], trusted: List[Any]) -> bool:
+    try:
+        address = ipaddress.ip_address(host)
+    except (TypeError, ValueError):
+        return False
+    return any(address in network for network in trusted)
+
+
+def client_key(request: Request, trusted: Optional[List[Any]] = None) -> str:
+    """
+    Identify the caller. X-Forwarded-For is only honoured when the peer is a
+    trusted proxy, and then the right-most hop that is not itself a trusted
+    proxy is used: hops to its left were written by the client and can be forged.
+    """
+    trusted = TRUSTED_PROXIES if trusted is None else trusted
+    peer = request.client.host if request.client else "unknown"
+    forwarded = request.headers.get("x-forwarded-for")
+    if not forwarded or not is_trusted_proxy(peer, trusted):
+        return peer
+
+    hops = [hop.strip() for hop in forwarded.split(",") if hop.strip()]
+    for hop in reversed(hops):
+        if not is_trusted_proxy(hop, trusted):
+            return hop
+    return hops[0] if hops else peer
+
+
+def rate_limit(limiter: RateLimiter):
+    """FastAPI dependency rejecting callers over their rate with 429 and Retry-After"""
+
+    async def check(request: Request):
+        wait = limiter.take(client_key(request))
+        if wait > 0:
+            raise HTTPException(
+                status_code=429,
+                detail=f"Too many {limiter.name} requests, please slow down",
+                headers=retry_after_header(wait)
+            )
+
+    return check
+
+
+def create_concurrency_limiter(
+    name: str,
+    max_concurrency: int = 8,
+    max_queue: int = 32,
+    queue_budget: float = 10.0
+) -> ConcurrencyLimiter:
+    """
+    Build an upstream limiter, overridable through <NAME>_MAX_CONCURRENCY,
+    <NAME>_MAX_QUEUE and <NAME>_QUEUE_BUDGET_SECONDS.
+    """
+    prefix = name.upper()
+    return ConcurrencyLimiter(
+        name,
+        max_concurrency=int(os.getenv(f"{prefix}_MAX_CONCURRENCY", str(max_concurrency))),
+        max_queue=int(os.getenv(f"{prefix}_MAX_QUEUE", str(max_queue))),
+        queue_budget=float(os.getenv(f"{prefix}_QUEUE_BUDGET_SECONDS", str(queue_budget)))
+    )
+
+
+def create_rate_limiter(name: str, rate: float = 1.0, burst: float = 10.0) -> RateLimiter:
+    """
+    Build a per-route client rate limiter, overridable through
+    <NAME>_RATE_LIMIT_PER_SECOND (0 disables) and <NAME>_RATE_LIMIT_BURST.
+    """
+    prefix = name.upper()
+    return RateLimiter(
+        name,
+        rate=float(os.getenv(f"{prefix}_RATE_LIMIT_PER_SECOND", str(rate))),
+        burst=float(os.getenv(f"{prefix}_RATE_LIMIT_BURST", str(burst)))
+    )
@@ -0,0 +1,305 @@
+"""
+Local intent and slot parser for calculator questions asked in chat.
+
+Questions such as "how much zakat on 200 g gold and 500k cash" or "monthly
+payment on a 3M murabaha over 36 months at 12%" are recognised with regular
+expressions, and answered by calling the calculator code directly instead of
+asking the LLM to guess at the numbers.
+"""
+import logging
+import re
+from dataclasses import dataclass
+from typing import Dict, List, Optional
+
+from fastapi import HTTPException
+from pydantic import ValidationError
+
+logger = logging.getLogger(__name__)
+
+GRAMS_PER_TOLA = 11.6638
+
+_MULTIPLIERS = {
+    "k": 1e3, "thousand": 1e3,
+    "lakh": 1e5, "lakhs": 1e5, "lac": 1e5, "lacs": 1e5,
+    "m": 1e6, "mn": 1e6, "million": 1e6,
+    "crore": 1e7, "crores": 1e7, "cr": 1e7,
+    "b": 1e9, "bn": 1e9, "billion": 1e9,
+}
+
+NUMBER = r"(\d[\d,]*(?:\.\d+)?)"
+# A number followed by a period or a percentage is a term or rate, never an amount
+NOT_TERM_OR_RATE = r"(?![\d.,]*\s*(?:months?|mos?|years?|yrs?|%))"
+AMOUNT = (
+    r"(?:rs\.?\s*|pkr\s*)?" + NUMBER + NOT_TERM_OR_RATE +
+    r"\s*(k|thousand|lakhs?|lacs?|mn|m|million|crores?|cr|bn|b|billion)?\b\s*(?:pkr|rs|rupees)?"
+)
+WEIGHT_UNIT = r"(g|gm|gms|grams?|tolas?)\b"
+CONNECT = r"\s*(?:of|in|on|:|=|worth|is|are)?\s*"
+
+
+def _amount(match: re.Match, group: int = 1) -> float:
+    value = float(match.group(group).replace(",", ""))
+    suffix = match.group(group + 1)
+    return value * _MULTIPLIERS.get((suffix or "").lower(), 1.0)
+
+
+def _find_amount(text: str, patterns: List[str]) -> Optional[float]:
+    for pattern in patterns:
+        match = re.search(pattern, text)
+        if match:
+            return _amount(match)
+    return None
+
+
+def _find_weight(text: str, metal: str) -> Optional[float]:
+    for pattern in (
+        NUMBER + r"\s*" + WEIGHT_UNIT + r"\s*(?:of\s+)?" + metal,
+        metal + CONNECT + NUMBER + r"\s*" + WEIGHT_UNIT,
+    ):
+        match = re.search(pattern, text)
+        if match:
+            value = float(match.group(1).replace(",", ""))
+            return value * GRAMS_PER_TOLA if match.group(2).startswith("tola") else value
+    return None
+
+
+def _find_term_months(text: str) -> Optional[int]:
+    match = re.search(r"(\d+(?:\.\d+)?)\s*(months?|mos?|years?|yrs?)\b", text)
+    if not match:
+        return None
+    value = float(match.group(1))
+    return int(round(value * 12)) if match.group(2).startswith(("y", "yr")) else int(round(value))
+
+
+def _find_percent(text: str, skip: Optional[int] = None) -> Optional[re.Match]:
+    for match in re.finditer(r"(\d+(?:\.\d+)?)\s*%", text):
+        if match.start() != skip:
+            return match
+    return None
+
+
+def _money(value: float) -> str:
+    return f"{value:,.2f}"
+
+
+@dataclass
+class CalculatorIntent:
+    name: str
+    slots: Dict[str, float]
+    missing: List[str]
+
+
+def parse_zakat(text: str) -> CalculatorIntent:
+    slots = {
+        "gold": _find_weight(text, "gold"),
+        "silver": _find_weight(text, "silver"),
+        "cash": _find_amount(text, [
+            AMOUNT + r"\s*(?:in\s+|of\s+)?(?:cash|savings|bank balance|in the bank)",
+            r"(?:cash|savings|bank balance)" + CONNECT + AMOUNT,
+        ]),
+        "business_assets": _find_amount(text, [
+            AMOUNT + r"\s*(?:in\s+|of\s+)?(?:business assets|business|stock|inventory|merchandise)",
+            r"(?:business assets|stock|inventory|merchandise)" + CONNECT + AMOUNT,
+        ]),
+        "liabilities": _find_amount(text, [
+            AMOUNT + r"\s*(?:in\s+|of\s+)?(?:debts?|liabilit(?:y|ies)|loans?)",
+            r"(?:debts?|liabilit(?:y|ies)|owe)" + CONNECT + AMOUNT,
+        ]),
+    }
+    found = {k: v for k, v in slots.items() if v is not None}
+    missing = [] if any(k != "liabilities" for k in found) else ["cash, gold, silver or business assets"]
+    return CalculatorIntent("zakat", found, missing)
+
+
+def parse_murabaha(text: str) -> CalculatorIntent:
+    slots = {
+        "asset_cost": _find_amount(text, [
+            AMOUNT + r"\s*murabaha",
+            r"murabaha\s*(?:of|for|on)?\s*(?:an?\s+)?(?:asset\s+)?(?:worth\s+|costing\s+)?" + AMOUNT,
+            r"(?:asset|car|house|property|cost(?:ing)?|price)" + CONNECT + AMOUNT,
+        ]),
+        "payment_term_months": _find_term_months(text),
+        "down_payment": _find_amount(text, [
+            AMOUNT + r"\s*(?:as\s+)?down",
+            r"down(?:\s*payment)?" + CONNECT + AMOUNT,
+        ]),
+    }
+    margin = _find_percent(text)
+    if margin is not None:
+        rate = float(margin.group(1))
+        # "12% per year" is a yearly margin; the calculator takes the total margin
+        per_year = re.match(r"\s*(?:per\s+(?:year|annum)|a\s+year|annual(?:ly)?|yearly|p\.?\s?a\.?)", text[margin.end():])
+        if per_year and slots["payment_term_months"]:
+            rate = rate * slots["payment_term_months"] / 12
+        slots["profit_margin_percentage"] = rate
+
+    found = {k: v for k, v in slots.items() if v is not None}
+    missing = [
+        label for key, label in (
+            ("asset_cost", "asset cost"),
+            ("payment_term_months", "term in months"),
+            ("profit_margin_percentage", "profit margin %"),
+        ) if key not in found
+    ]
+    return CalculatorIntent("murabaha", found, missing)
+
+
+def parse_leasing(text: str) -> CalculatorIntent:
+    slots = {
+        "vehicle_price": _find_amount(text, [
+            AMOUNT + r"\s*(?:car|vehicle|asset)",
+            r"(?:car|vehicle|asset)\s*(?:worth|costing|priced at|of|for|price)?\s*" + AMOUNT,
+            r"(?:lease|leasing|ijarah)\s*(?:on|for|of)?\s*(?:an?\s+)?" + AMOUNT,
+        ]),
+        "lease_term_months": _find_term_months(text),
+        "down_payment": _find_amount(text, [
+            AMOUNT + r"\s*(?:as\s+)?down",
+            r"down(?:\s*payment)?" + CONNECT + AMOUNT,
+        ]),
+    }
+    residual = re.search(r"(\d+(?:\.\d+)?)\s*%\s*residual", text) or re.search(r"residual\D{0,20}?(\d+(?:\.\d+)?)\s*%", text)
+    if residual:
+        slots["residual_value_percentage"] = float(residual.group(1))
+
+    money_factor = re.search(r"money factor" + CONNECT + r"(0?\.\d+)", text)
+    if money_factor:
+        slots["money_factor"] = float(money_factor.group(1))
+    else:
+        rate = _find_percent(text, skip=residual.start(1) if residual else None)
+        if rate is not None:
+            slots["interest_rate"] = float(rate.group(1))
+
+    found = {k: v for k, v in slots.items() if v is not None}
+    missing = [
+        label for key, label in (
+            ("vehicle_price", "vehicle price"),
+            ("lease_term_months", "term in months"),
+        ) if key not in found
+    ]
+    if "money_factor" not in found and "interest_rate" not in found:
+        missing.append("rate % or money factor")
+    return CalculatorIntent("leasing", found, missing)
+
+
+def parse_calculator_intent(message: str) -> Optional[CalculatorIntent]:
+    """Recognise a calculator question with numbers in it, or return None for open questions"""
+    text = message.lower()
+    if not re.search(r"\d", text):
+        return None
+    if "zakat" in text:
+        return parse_zakat(text)
+    if "murabaha" in text:
+        return parse_murabaha(text)
+    if re.search(r"\b(?:lease|leasing|ijarah)\b", text):
+        return parse_leasing(text)
+    return None
+
+
+async def answer_zakat(slots: Dict[str, float]) -> str:
+    from app.routes.zakat import (
+        calculate_nisab,
+        calculate_total_assets,
+        calculate_zakat_due,
+        calculate_zakatable_amount,
+        resolve_metal_rates,
+    )
+
+    rates = await resolve_metal_rates(None, None, "PKR")
+    gold_rate = rates["gold_rate_per_gram"]
+    silver_rate = rates["silver_rate_per_gram"]
+
+    total_assets = calculate_total_assets(
+        slots.get("cash", 0.0),
+        slots.get("gold", 0.0),
+        gold_rate,
+        slots.get("silver", 0.0),
+        silver_rate,
+        slots.get("business_assets", 0.0)
+    )
+    zakatable_amount = calculate_zakatable_amount(total_assets, slots.get("liabilities", 0.0))
+    nisab = calculate_nisab(gold_rate)
+    zakat_due = calculate_zakat_due(zakatable_amount, nisab)
+
+    lines = [
+        f"Zakatable wealth: PKR {_money(zakatable_amount)} "
+        f"(gold at PKR {_money(gold_rate)}/g, silver at PKR {_money(silver_rate)}/g, source: {rates['rates_source']}).",
+        f"Nisab (85 g of gold): PKR {_money(nisab)}.",
+    ]
+    if zakat_due > 0:
+        lines.append(f"Zakat due at 2.5%: PKR {_money(zakat_due)}.")
+    else:
+        lines.append("Your zakatable wealth is below the nisab, so no zakat is due.")
+    return " ".join(lines)
+
+
+async def answer_murabaha(slots: Dict[str, float]) -> str:
+    from app.routes.murabaha import MurabahaInput, calculate_murabaha
+
+    result = await calculate_murabaha(MurabahaInput(
+        asset_cost=slots["asset_cost"],
+        profit_margin_percentage=slots["profit_margin_percentage"],
+        payment_term_months=int(slots["payment_term_months"]),
+        down_payment=slots.get("down_payment", 0.0)
+    ))
+    return (
+        f"Murabaha on an asset of PKR {_money(result['asset_cost'])} with a "
+        f"{slots['profit_margin_percentage']:g}% profit margin over {int(slots['payment_term_months'])} months: "
+        f"{result['number_of_payments']} monthly installments of PKR {_money(result['installment_amount'])}. "
+        f"Total profit PKR {_money(result['total_profit'])}, total sale price PKR {_money(result['total_sale_price'])}, "
+        f"financed amount PKR {_money(result['financed_amount'])}."
+    )
+
+
+async def answer_leasing(slots: Dict[str, float]) -> str:
+    from app.routes.leasing import LeasingRequest, calculate_leasing
+
+    params = {k: v for k, v in slots.items() if k != "lease_term_months"}
+    result = calculate_leasing(LeasingRequest(lease_term_months=int(slots["lease_term_months"]), **params))
+    return (
+        f"Lease on PKR {_money(result['vehicle_price'])} over {int(slots['lease_term_months'])} months "
+        f"(residual {slots.get('residual_value_percentage', 60):g}%, money factor {result['money_factor']}): "
+        f"monthly payment PKR {_money(result['monthly_payment'])} "
+        f"(depreciation PKR {_money(result['depreciation_payment'])} + rent charge PKR {_money(result['finance_payment'])}). "
+        f"Total of payments PKR {_money(result['total_of_payments'])}, due at signing PKR {_money(result['due_at_signing'])}."
+    )
+
+
+_ANSWERS = {
+    "zakat": answer_zakat,
+    "murabaha": answer_murabaha,
+    "leasing": answer_leasing,
+}
+
+# The amount a calculation is about; without one, any numbers in the message are
+# incidental ("how does leasing work for 3 years?") and the LLM answers it
+PRIMARY_SLOTS = {
+    "zakat": {"cash", "gold", "silver", "business_assets"},
+    "murabaha": {"asset_cost"},
+    "leasing": {"vehicle_price"},
+}
+
+_EXAMPLES = {
+    "zakat": "how much zakat on 200 g gold and 500k cash",
+    "murabaha": "monthly payment on a 3M murabaha over 36 months at 12% margin",
+    "leasing": "lease on a 5M car for 36 months at 10% with 55% residual",
+}
+
+
+async def answer_calculator_question(message: str) -> Optional[str]:
+    """Answer a calculator question with exact figures, or return None to fall through"""
+    intent = parse_calculator_intent(message)
+    if intent is None:
+        return None
+    if intent.missing:
+        if not PRIMARY_SLOTS[intent.name] & intent.slots.keys():
+            return None
+        return (
+            f"To run the {intent.name} calculator I also need the {', '.join(intent.missing)}. "
+            f"For example: \"{_EXAMPLES[intent.name]}\"."
+        )
+    try:
+        return await _ANSWERS[intent.name](intent.slots)
+    except (HTTPException, ValidationError, ValueError, ZeroDivisionError) as e:
+        # Out-of-range slots (e.g. a 0 month term): let the LLM handle the question
+        logger.info("Calculator intent %s not answered: %s", intent.name, e)
+        return None
@@ -0,0 +1,151 @@
+import hashlib
+import logging
+import os
+import re
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Iterable, Optional
+
+logger = logging.getLogger(__name__)
+
+_NON_WORD = re.compile(r"[^\w\s]")
+_SPACES = re.compile(r"\s+")
+
+
+def normalize_message(message: str) -> str:
+    """Lowercase, drop punctuation and collapse whitespace ("What is Nisab?" -> "what is nisab")"""
+    return _SPACES.sub(" ", _NON_WORD.sub(" ", message.lower())).strip()
+
+
+class ChatResponseCache:
+    """
+    Cache of chatbot replies keyed on the normalized message plus a hash of the
+    most recent history turns.
+
+    The memory tier is an LRU capped at `max_entries`; entries expire after
+    `ttl` seconds. With a `path`, replies are also written to a SQLite file so
+    they survive restarts, and memory misses fall through to it.
+    """
+
+    def __init__(
+        self,
+        max_entries: int = 1000,
+        ttl: float = 86400.0,
+        history_turns: int = 2,
+        path: Optional[str] = None
+    ):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.history_turns = history_turns
+        self._entries: "OrderedDict[str, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._conn = None
+        if path:
+            try:
+                self._conn = sqlite3.connect(path, timeout=2.0, isolation_level=None, check_same_thread=False)
+                self._conn.execute("PRAGMA journal_mode=WAL")
+                self._conn.execute(
+                    "CREATE TABLE IF NOT EXISTS chat_replies ("
+                    "key TEXT PRIMARY KEY, reply TEXT NOT NULL, created_at REAL NOT NULL)"
+                )
+            except sqlite3.Error as e:
+                logger.warning(f"Chat cache disk tier unavailable at {path}: {e}")
+                self._conn = None
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def make_key(self, message: str, history: Iterable[Any] = ()) -> str:
+        """Build the cache key from the message and the last `history_turns` turns"""
+        recent = list(history)[-self.history_turns:] if self.history_turns else []
+        digest = hashlib.sha256()
+        for turn in recent:
+            digest.update(f"{turn.role}\x1f{normalize_message(turn.text)}\x1e".encode("utf-8"))
+        return f"{normalize_message(message)}|{digest.hexdigest()[:16]}"
+
+    def get(self, key: str) -> Optional[str]:
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                reply, created_at = entry
+                if now - created_at < self.ttl:
+                    self._entries.move_to_end(key)
+                    self.memory_hits += 1
+                    return reply
+                del self._entries[key]
+
+        if self._conn is not None:
+            try:
+                with self._lock:
+                    row = self._conn.execute(
+                        "SELECT reply, created_at FROM chat_replies WHERE key = ?", (key,)
+                    ).fetchone()
+            except sqlite3.Error as e:
+                logger.warning(f"Chat cache disk read failed: {e}")
+                row = None
+            if row is not None and now - row[1] < self.ttl:
+                self._remember(key, row[0], row[1])
+                self.disk_hits += 1
+                return row[0]
+
+        self.misses += 1
+        return None
+
+    def put(self, key: str, reply: str):
+        created_at = time.time()
+        self._remember(key, reply, created_at)
+        if self._conn is not None:
+            try:
+                with self._lock:
+                    self._conn.execute(
+                        "INSERT OR REPLACE INTO chat_replies (key, reply, created_at) VALUES (?, ?, ?)",
+                        (key, reply, created_at)
+                    )
+            except sqlite3.Error as e:
+                logger.warning(f"Chat cache disk write failed: {e}")
+
+    def _remember(self, key: str, reply: str, created_at: float):
+        with self._lock:
+            self._entries[key] = (reply, created_at)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            if self._conn is not None:
+                self._conn.execute("DELETE FROM chat_replies")
+
+    def stats(self) -> Dict[str, Any]:
+        hits = self.memory_hits + self.disk_hits
+        lookups = hits + self.misses
+        return {
+            "size": len(self._entries),
+            "max_entries": self.max_entries,
+            "ttl_seconds": self.ttl,
+            "disk_tier": self._conn is not None,
+            "memory_hits": self.memory_hits,
+            "disk_hits": self.disk_hits,
+            "misses": self.misses,
+            "hit_rate": round(hits / lookups, 4) if lookups else 0.0,
+            "evictions": self.evictions
+        }
+
+
+def create_chat_cache() -> ChatResponseCache:
+    """
+    Build the reply cache from CHAT_CACHE_MAX_ENTRIES, CHAT_CACHE_TTL_SECONDS and
+    CHAT_CACHE_HISTORY_TURNS. Set CHAT_CACHE_PATH to a file to enable the disk tier.
+    """
+    return ChatResponseCache(
+        max_entries=int(os.getenv("CHAT_CACHE_MAX_ENTRIES", "1000")),
+        ttl=float(os.getenv("CHAT_CACHE_TTL_SECONDS", "86400")),
+        history_turns=int(os.getenv("CHAT_CACHE_HISTORY_TURNS", "2")),
+        path=os.getenv("CHAT_CACHE_PATH") or None
+    )
@@ -0,0 +1,148 @@
+import hashlib
+import os
+import re
+import threading
+from collections import OrderedDict, deque
+from typing import Any, List, Optional, Sequence
+
+_SENTENCE_END = re.compile(r"(?<=[.!?])\s")
+
+# Rough English average; good enough to keep prompts inside a budget
+CHARS_PER_TOKEN = 4
+
+
+def estimate_tokens(text: str) -> int:
+    return len(text) // CHARS_PER_TOKEN + 1
+
+
+def speaker(role: str) -> str:
+    return "User" if role == "user" else "Assistant"
+
+
+def summarize_turn(role: str, text: str, max_chars: int = 160) -> str:
+    """Compact one turn to its first sentence (truncated) for the rolling summary"""
+    first = _SENTENCE_END.split(text.strip(), maxsplit=1)[0]
+    if len(first) > max_chars:
+        first = first[:max_chars - 1].rstrip() + "…"
+    return f"- {speaker(role)}: {first}"
+
+
+def _fingerprint(turn: Any) -> str:
+    return hashlib.sha1(f"{turn.role}\x1f{turn.text}".encode("utf-8")).hexdigest()
+
+
+class _Summary:
+    __slots__ = ("covered", "fingerprint", "lines", "tokens")
+
+    def __init__(self):
+        self.covered = 0  # number of leading turns folded into the summary
+        self.fingerprint = ""  # fingerprint of the last folded turn
+        self.lines: deque = deque()
+        self.tokens = 0
+
+
+class ConversationContext:
+    """
+    Builds chat prompts within a fixed token budget.
+
+    The most recent turns are kept verbatim, newest first, until the budget is
+    used. Older turns are folded into a rolling summary (one compact line per
+    turn, oldest lines dropped past `summary_budget`). Summaries are cached per
+    conversation ID and extended incrementally, so each turn only pays for the
+    turns that are new since the last request.
+    """
+
+    def __init__(self, token_budget: int = 3000, summary_budget: int = 500, max_conversations: int = 10000):
+        self.token_budget = token_budget
+        self.summary_budget = summary_budget
+        self.max_conversations = max_conversations
+        self._summaries: "OrderedDict[str, _Summary]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _split(self, history: Sequence[Any], available: int) -> int:
+        """Index of the first turn kept verbatim"""
+        used = 0
+        split = len(history)
+        while split > 0:
+            cost = estimate_tokens(history[split - 1].text) + 3
+            if used + cost > available:
+                break
+            used += cost
+            split -= 1
+        return split
+
+    def _fold(self, summary: _Summary, turns: Sequence[Any]):
+        for turn in turns:
+            line = summarize_turn(turn.role, turn.text)
+            summary.lines.append(line)
+            summary.tokens += estimate_tokens(line)
+            while summary.tokens > self.summary_budget and len(summary.lines) > 1:
+                summary.tokens -= estimate_tokens(summary.lines.popleft())
+
+    def _summary_for(self, history: Sequence[Any], split: int, conversation_id: Optional[str]) -> List[str]:
+        if split == 0:
+            return []
+
+        if conversation_id is None:
+            summary = _Summary()
+            self._fold(summary, history[:split])
+            return list(summary.lines)
+
+        with self._lock:
+            summary = self._summaries.get(conversation_id)
+            reusable = (
+                summary is not None
+                and 0 < summary.covered <= split
+                and summary.covered <= len(history)
+                and summary.fingerprint == _fingerprint(history[summary.covered - 1])
+            )
+            if not reusable:
+                # New conversation, or the client rewrote its history
+                summary = _Summary()
+
+            self._fold(summary, history[summary.covered:split])
+            summary.covered = split
+            summary.fingerprint = _fingerprint(history[split - 1])
+
+            self._summaries[conversation_id] = summary
+            self._summaries.move_to_end(conversation_id)
+            while len(self._summaries) > self.max_conversations:
+                self._summaries.popitem(last=False)
+            return list(summary.lines)
+
+    def build_prompt(
+        self,
+        system_prompt: str,
+        history: Sequence[Any],
+        message: str,
+        conversation_id: Optional[str] = None,
+        references: Sequence[str] = ()
+    ) -> str:
+        fixed = estimate_tokens(system_prompt) + estimate_tokens(message) + 20
+        fixed += sum(estimate_tokens(r) + 2 for r in references)
+        available = max(self.token_budget - fixed - self.summary_budget, 0)
+
+        split = self._split(history, available)
+        summary_lines = self._summary_for(history, split, conversation_id)
+
+        parts = [system_prompt, ""]
+        if references:
+            parts.append("Reference material (use it if relevant):")
+            parts.extend(f"- {r}" for r in references)
+            parts.append("")
+        if summary_lines:
+            parts.append("Summary of earlier conversation:")
+            parts.extend(summary_lines)
+            parts.append("")
+        parts.append("Conversation history:")
+        parts.extend(f"{speaker(turn.role)}: {turn.text}" for turn in history[split:])
+        parts.extend(["", f"User: {message}", "", "Please respond helpfully:"])
+        return "\n".join(parts)
+
+
+def create_conversation_context() -> ConversationContext:
+    """Build the prompt context manager from CHAT_CONTEXT_TOKEN_BUDGET and CHAT_SUMMARY_TOKEN_BUDGET"""
+    return ConversationContext(
+        token_budget=int(os.getenv("CHAT_CONTEXT_TOKEN_BUDGET", "3000")),
+        summary_budget=int(os.getenv("CHAT_SUMMARY_TOKEN_BUDGET", "500"))
+    )
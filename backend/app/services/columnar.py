@@ -0,0 +1,103 @@
+import io
+from typing import AsyncIterable, AsyncIterator, Dict, Iterable, Optional
+
+import numpy as np
+
+
+def parse_numeric_csv(
+    text: str,
+    columns: Iterable[str],
+    required: Iterable[str] = (),
+    defaults: Optional[Dict[str, float]] = None
+) -> Dict[str, np.ndarray]:
+    """
+    Parse a CSV with a header row into float64 column arrays.
+
+    Only the requested `columns` are read (other columns, e.g. names or IDs, are
+    ignored). Header names are matched case-insensitively. Missing optional
+    columns are filled with their default (0 unless given in `defaults`).
+    """
+    defaults = defaults or {}
+    header, _, body = text.lstrip("﻿").partition("\n")
+    names = [h.strip().strip('"').lower() for h in header.split(",")]
+
+    missing = [c for c in required if c not in names]
+    if missing:
+        raise ValueError(f"CSV is missing required column(s): {', '.join(missing)}")
+
+    columns = list(columns)
+    present = [c for c in columns if c in names]
+    if not present:
+        raise ValueError(f"CSV has none of the expected columns: {', '.join(columns)}")
+    if body.strip() and present:
+        data = np.loadtxt(
+            io.StringIO(body),
+            delimiter=",",
+            dtype=np.float64,
+            usecols=[names.index(c) for c in present],
+            ndmin=2
+        )
+    else:
+        data = np.empty((0, len(present)))
+
+    rows = data.shape[0]
+    result = {c: data[:, i] for i, c in enumerate(present)}
+    for c in columns:
+        if c not in result:
+            result[c] = np.full(rows, defaults.get(c, 0.0))
+    return result
+
+
+def parse_csv_column(text: str, column: str, dtype: str = "str") -> np.ndarray:
+    """Parse one column of a CSV with a header row as `dtype` (e.g. str or datetime64[D])"""
+    header, _, body = text.lstrip("﻿").partition("\n")
+    names = [h.strip().strip('"').lower() for h in header.split(",")]
+    if column not in names:
+        raise ValueError(f"CSV is missing required column: {column}")
+    if not body.strip():
+        return np.empty(0, dtype=dtype)
+    return np.loadtxt(
+        io.StringIO(body),
+        delimiter=",",
+        dtype=dtype,
+        usecols=[names.index(column)],
+        ndmin=1
+    )
+
+
+def parse_date_column(text: str, column: str) -> np.ndarray:
+    """Parse one ISO date (YYYY-MM-DD) column of a CSV with a header row into datetime64[D]"""
+    return parse_csv_column(text, column, "datetime64[D]")
+
+
+async def iter_csv_chunks(stream: AsyncIterable[bytes], rows: int) -> AsyncIterator[str]:
+    """
+    Read a streamed CSV body and yield it as CSV texts of the header line plus up
+    to `rows` data lines, so each chunk parses on its own and only one chunk is
+    held in memory at a time.
+    """
+    header = None
+    pending = b""
+    lines = []
+    emitted = False
+
+    async for data in stream:
+        pending += data
+        *complete, pending = pending.split(b"\n")
+        for line in complete:
+            if header is None:
+                header = line.decode("utf-8").lstrip("\ufeff").rstrip("\r")
+            elif line.strip():
+                lines.append(line)
+        while len(lines) >= rows:
+            yield header + "\n" + b"\n".join(lines[:rows]).decode("utf-8") + "\n"
+            lines = lines[rows:]
+            emitted = True
+
+    if header is None:
+        header = pending.decode("utf-8").lstrip("\ufeff").rstrip("\r")
+    elif pending.strip():
+        lines.append(pending)
+    # A header-only body still yields one (empty) chunk so its columns get checked
+    if lines or not emitted:
+        yield header + "\n" + b"\n".join(lines).decode("utf-8") + ("\n" if lines else "")
@@ -0,0 +1,65 @@
+from array import array
+from typing import Any, Dict, Iterable, Optional
+
+
+class UnsupportedCurrencyError(ValueError):
+    pass
+
+
+class FxTable:
+    """
+    Full exchange-rate table quoted against one base currency.
+
+    Rates live in a flat array of doubles with a code -> slot index, so any
+    cross rate is two dict lookups and a division.
+    """
+
+    __slots__ = ("base", "codes", "rates", "index", "source")
+
+    def __init__(self, base: str, codes: Iterable[str], rates: Iterable[float], source: str = ""):
+        self.base = base.upper()
+        self.codes = [c.upper() for c in codes]
+        self.rates = array("d", rates)
+        self.index = {code: i for i, code in enumerate(self.codes)}
+        self.source = source
+        if self.base not in self.index:
+            self.index[self.base] = len(self.codes)
+            self.codes.append(self.base)
+            self.rates.append(1.0)
+
+    @classmethod
+    def from_rates(cls, base: str, rates: Dict[str, float], source: str = "") -> "FxTable":
+        valid = {code: float(rate) for code, rate in rates.items() if rate and float(rate) > 0}
+        return cls(base, valid.keys(), valid.values(), source=source)
+
+    def __contains__(self, code: str) -> bool:
+        return code.upper() in self.index
+
+    def __len__(self) -> int:
+        return len(self.codes)
+
+    def _slot(self, code: str) -> int:
+        try:
+            return self.index[code.upper()]
+        except KeyError:
+            raise UnsupportedCurrencyError(f"Unsupported currency: {code}")
+
+    def rate(self, from_currency: str, to_currency: str) -> float:
+        """Units of `to_currency` per one unit of `from_currency`"""
+        return self.rates[self._slot(to_currency)] / self.rates[self._slot(from_currency)]
+
+    def convert(self, amount: float, from_currency: str, to_currency: str) -> float:
+        return amount * self.rate(from_currency, to_currency)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "base": self.base,
+            "rates": dict(zip(self.codes, self.rates)),
+            "source": self.source
+        }
+
+    @classmethod
+    def from_dict(cls, data: Optional[Dict[str, Any]]) -> Optional["FxTable"]:
+        if not data:
+            return None
+        return cls.from_rates(data["base"], data["rates"], source=data.get("source", ""))
@@ -0,0 +1,124 @@
+import os
+from typing import Optional
+
+import numpy as np
+
+# Per-period rates searched by the bisection fallback
+BRACKET_LOW = -0.99
+BRACKET_HIGH = 10.0
+
+# Longest cash-flow grid (in periods, i.e. months for the calculators) accepted;
+# the flow matrix is contracts x periods, so this bounds its width
+IRR_MAX_PERIODS = int(os.getenv("IRR_MAX_PERIODS", "600"))
+
+
+def _npv_and_slope(flows: np.ndarray, v: np.ndarray):
+    """
+    NPV of each row as a polynomial in the discount factor v = 1 / (1 + r),
+    and its derivative in v, by Horner's rule (one pass over the periods).
+    """
+    npv = np.zeros(len(flows))
+    slope = np.zeros(len(flows))
+    for t in range(flows.shape[1] - 1, -1, -1):
+        slope = slope * v + npv
+        npv = npv * v + flows[:, t]
+    return npv, slope
+
+
+def _bisect(flows: np.ndarray, iterations: int = 100) -> np.ndarray:
+    """Bracketed search for the rate, row-wise; NaN where the bracket holds no sign change"""
+    lo = np.full(len(flows), BRACKET_LOW)
+    hi = np.full(len(flows), BRACKET_HIGH)
+    f_lo, _ = _npv_and_slope(flows, 1 / (1 + lo))
+    f_hi, _ = _npv_and_slope(flows, 1 / (1 + hi))
+    bracketed = np.sign(f_lo) != np.sign(f_hi)
+
+    for _ in range(iterations):
+        mid = (lo + hi) / 2
+        f_mid, _ = _npv_and_slope(flows, 1 / (1 + mid))
+        left = np.sign(f_mid) == np.sign(f_lo)
+        lo = np.where(left, mid, lo)
+        f_lo = np.where(left, f_mid, f_lo)
+        hi = np.where(left, hi, mid)
+
+    return np.where(bracketed, (lo + hi) / 2, np.nan)
+
+
+def solve_irr(flows: np.ndarray, guess: float = 0.01, tol: float = 1e-10, max_iter: int = 50) -> np.ndarray:
+    """
+    Per-period internal rate of return of each row of `flows` (contracts x periods,
+    cash flow t at column t, zero-padded).
+
+    Newton's method runs on all rows at once; rows it does not converge on
+    (a flat slope, a step out of range, or too many iterations) are re-solved
+    by bisection over [BRACKET_LOW, BRACKET_HIGH]. Rows without a sign change
+    in their cash flows have no rate and come back as NaN.
+    """
+    flows = np.atleast_2d(np.asarray(flows, dtype=np.float64))
+    v = np.full(len(flows), 1 / (1 + guess))
+    converged = np.zeros(len(flows), dtype=bool)
+
+    with np.errstate(divide="ignore", invalid="ignore", over="ignore"):
+        for _ in range(max_iter):
+            npv, slope = _npv_and_slope(flows, v)
+            step = np.where(converged, 0.0, npv / slope)
+            v = v - step
+            converged |= np.abs(step) < tol * np.abs(v)
+            if converged.all() or not np.isfinite(v[~converged]).any():
+                break
+
+        rate = 1 / v - 1
+        failed = ~converged | ~np.isfinite(rate) | (v <= 0)
+        if failed.any():
+            rate[failed] = _bisect(flows[failed])
+
+    return rate
+
+
+def annualize(periodic_rate: np.ndarray, periods_per_year: float = 12) -> np.ndarray:
+    """Effective annual rate from a per-period rate"""
+    return (1 + periodic_rate) ** periods_per_year - 1
+
+
+def rounded_rate(rate) -> Optional[float]:
+    """Round a rate for JSON, mapping a missing (NaN) rate to None"""
+    return None if np.isnan(rate) else round(float(rate), 2)
+
+
+def payment_flows(
+    principal: np.ndarray,
+    payment: np.ndarray,
+    count: np.ndarray,
+    first_period: np.ndarray,
+    interval: np.ndarray = 1,
+    balloon: np.ndarray = 0.0,
+    balloon_period: np.ndarray = 0
+) -> np.ndarray:
+    """
+    Financier-side cash flows of many contracts on one period grid (contracts x periods):
+    -principal at period 0, `count` level payments every `interval` periods starting
+    at `first_period`, and an optional `balloon` at `balloon_period`.
+    """
+    principal, payment, count, first_period, interval, balloon, balloon_period = np.broadcast_arrays(
+        *(np.atleast_1d(np.asarray(a)) for a in (principal, payment, count, first_period, interval, balloon, balloon_period))
+    )
+    count = count.astype(np.int64)
+    first_period = first_period.astype(np.int64)
+    interval = interval.astype(np.int64)
+    balloon_period = balloon_period.astype(np.int64)
+    if (count < 0).any() or (first_period < 0).any() or (interval < 0).any() or (balloon_period < 0).any():
+        raise ValueError("Payment counts and periods must not be negative")
+
+    last = np.maximum(first_period + interval * np.maximum(count - 1, 0), balloon_period)
+    if len(last) and last.max() > IRR_MAX_PERIODS:
+        raise ValueError(f"Cash flows may span at most {IRR_MAX_PERIODS} periods")
+    flows = np.zeros((len(principal), int(last.max()) + 1 if len(principal) else 1))
+    flows[:, 0] -= principal
+
+    # Row and period of every payment
+    rows = np.repeat(np.arange(len(count)), count)
+    k = np.arange(len(rows)) - np.repeat(np.cumsum(count) - count, count)
+    periods = np.repeat(first_period, count) + np.repeat(interval, count) * k
+    np.add.at(flows, (rows, periods), np.repeat(payment, count))
+    np.add.at(flows, (np.arange(len(balloon)), balloon_period), balloon)
+    return flows
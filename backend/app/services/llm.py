@@ -0,0 +1,86 @@
+import asyncio
+import logging
+import os
+from typing import AsyncIterator, Optional
+
+logger = logging.getLogger(__name__)
+
+GEMINI_MODEL = os.getenv("GEMINI_MODEL", "models/gemini-2.5-flash")
+
+
+class GeminiLLM:
+    """Async wrapper around one Gemini model handle"""
+
+    name = "gemini"
+
+    def __init__(self, model_name: str = GEMINI_MODEL):
+        import google.generativeai as genai
+
+        self.model = genai.GenerativeModel(model_name)
+
+    async def generate(self, prompt: str) -> str:
+        response = await self.model.generate_content_async(prompt)
+        return response.text.strip()
+
+    async def stream(self, prompt: str) -> AsyncIterator[str]:
+        response = await self.model.generate_content_async(prompt, stream=True)
+        async for chunk in response:
+            try:
+                text = chunk.text
+            except ValueError:
+                # Chunk carried no text part (e.g. a safety or finish marker)
+                continue
+            if text:
+                yield text
+
+
+class StubLLM:
+    """
+    Local stand-in for the LLM.
+
+    Streams a canned reply word by word after `first_token_latency` seconds,
+    then one word every `token_interval` seconds, so time-to-first-token and
+    concurrent stream capacity can be measured without calling Gemini.
+    """
+
+    name = "stub"
+
+    def __init__(
+        self,
+        reply: str = "This is a stub reply from the local Islamic finance assistant.",
+        first_token_latency: float = 0.2,
+        token_interval: float = 0.02
+    ):
+        self.reply = reply
+        self.first_token_latency = first_token_latency
+        self.token_interval = token_interval
+
+    async def generate(self, prompt: str) -> str:
+        parts = [part async for part in self.stream(prompt)]
+        return "".join(parts).strip()
+
+    async def stream(self, prompt: str) -> AsyncIterator[str]:
+        await asyncio.sleep(self.first_token_latency)
+        words = self.reply.split(" ")
+        for i, word in enumerate(words):
+            if i:
+                await asyncio.sleep(self.token_interval)
+            yield word if i == len(words) - 1 else word + " "
+
+
+def create_llm(api_key: Optional[str]):
+    """
+    Build the LLM handle used by the chat routes.
+
+    CHAT_LLM=stub selects the local StubLLM (latencies from CHAT_STUB_TTFT_SECONDS
+    and CHAT_STUB_TOKEN_INTERVAL_SECONDS); otherwise Gemini is used when an API
+    key is configured. Returns None when no LLM is available.
+    """
+    if os.getenv("CHAT_LLM", "gemini") == "stub":
+        return StubLLM(
+            first_token_latency=float(os.getenv("CHAT_STUB_TTFT_SECONDS", "0.2")),
+            token_interval=float(os.getenv("CHAT_STUB_TOKEN_INTERVAL_SECONDS", "0.02"))
+        )
+    if not api_key:
+        return None
+    return GeminiLLM()
@@ -0,0 +1,191 @@
+"""
+Mortality tables and commutation columns for takaful pricing.
+
+Tables live as JSON files in MORTALITY_TABLE_DIR (one table per file, named
+<table>.json) in a small versioned format:
+
+    {
+      "format": "safespend-mortality",
+      "format_version": 1,
+      "name": "gompertz_makeham",
+      "version": "2025.1",
+      "description": "...",
+      "min_age": 0,
+      "qx": [q_0, q_1, ..., q_omega]
+    }
+
+qx[i] is the probability that a life aged min_age + i dies within a year. The
+last age closes the table (everybody dies by omega + 1), so its qx is taken as 1.
+
+Commutation columns are built once per (table, interest rate, mortality
+loading) and cached, so pricing any age/term is a handful of array lookups.
+"""
+import json
+import math
+import os
+from functools import lru_cache
+from pathlib import Path
+from typing import Any, Dict, List
+
+import numpy as np
+
+MORTALITY_FORMAT = "safespend-mortality"
+MORTALITY_FORMAT_VERSION = 1
+
+DEFAULT_TABLE_DIR = Path(__file__).resolve().parent.parent / "data" / "mortality"
+MORTALITY_TABLE_DIR = Path(os.getenv("MORTALITY_TABLE_DIR", str(DEFAULT_TABLE_DIR)))
+DEFAULT_MORTALITY_TABLE = os.getenv("DEFAULT_MORTALITY_TABLE", "gompertz_makeham")
+
+# Radix of the life table (l at the youngest age)
+RADIX = 100000.0
+
+
+class MortalityTableError(ValueError):
+    pass
+
+
+def gompertz_makeham_qx(ages: np.ndarray, a: float, b: float, c: float) -> np.ndarray:
+    """
+    One-year death probabilities under the Gompertz-Makeham force of mortality
+    mu(x) = a + b * c**x, integrated exactly over each year of age.
+    """
+    ages = np.asarray(ages, dtype=np.float64)
+    cumulative_hazard = a + b * c ** ages * (c - 1) / math.log(c)
+    return -np.expm1(-cumulative_hazard)
+
+
+def gompertz_makeham_table(
+    a: float = 0.0005,
+    b: float = 0.00003,
+    c: float = 1.1,
+    min_age: int = 0,
+    max_age: int = 110,
+    version: str = "2025.1"
+) -> Dict[str, Any]:
+    """A table in the on-disk format, from Gompertz-Makeham parameters"""
+    qx = gompertz_makeham_qx(np.arange(min_age, max_age + 1), a, b, c)
+    qx[-1] = 1.0
+    return {
+        "format": MORTALITY_FORMAT,
+        "format_version": MORTALITY_FORMAT_VERSION,
+        "name": "gompertz_makeham",
+        "version": version,
+        "description": f"Gompertz-Makeham mu(x) = {a} + {b} * {c}^x, ages {min_age}-{max_age}",
+        "parameters": {"a": a, "b": b, "c": c},
+        "min_age": min_age,
+        "qx": np.round(qx, 10).tolist()
+    }
+
+
+def validate_table(table: Dict[str, Any]) -> Dict[str, Any]:
+    """Check a loaded table against the format and return it with qx as an array"""
+    if table.get("format") != MORTALITY_FORMAT:
+        raise MortalityTableError(f"Not a {MORTALITY_FORMAT} file")
+    if table.get("format_version") != MORTALITY_FORMAT_VERSION:
+        raise MortalityTableError(f"Unsupported mortality table format_version: {table.get('format_version')}")
+    for key in ("name", "version", "min_age", "qx"):
+        if key not in table:
+            raise MortalityTableError(f"Mortality table is missing '{key}'")
+
+    qx = np.asarray(table["qx"], dtype=np.float64)
+    if qx.ndim != 1 or len(qx) < 2:
+        raise MortalityTableError("qx must be a list of at least two rates")
+    if ((qx < 0) | (qx > 1)).any() or not np.isfinite(qx).all():
+        raise MortalityTableError("qx values must be between 0 and 1")
+
+    qx = qx.copy()
+    qx[-1] = 1.0
+    return {**table, "min_age": int(table["min_age"]), "qx": qx}
+
+
+def list_mortality_tables() -> List[Dict[str, Any]]:
+    """Name, version and age range of every table in MORTALITY_TABLE_DIR"""
+    tables = []
+    for path in sorted(MORTALITY_TABLE_DIR.glob("*.json")):
+        try:
+            table = load_mortality_table(path.stem)
+        except (MortalityTableError, OSError, json.JSONDecodeError):
+            continue
+        tables.append({
+            "name": path.stem,
+            "version": table["version"],
+            "description": table.get("description", ""),
+            "min_age": table["min_age"],
+            "max_age": table["min_age"] + len(table["qx"]) - 1
+        })
+    return tables
+
+
+@lru_cache(maxsize=32)
+def load_mortality_table(name: str) -> Dict[str, Any]:
+    """Load and validate MORTALITY_TABLE_DIR/<name>.json (cached)"""
+    if not name.replace("_", "").replace("-", "").replace(".", "").isalnum():
+        raise MortalityTableError(f"Invalid mortality table name: {name}")
+    path = MORTALITY_TABLE_DIR / f"{name}.json"
+    if not path.is_file():
+        raise MortalityTableError(f"Unknown mortality table: {name}")
+    with open(path, encoding="utf-8") as f:
+        return validate_table(json.load(f))
+
+
+class CommutationTable:
+    """
+    Commutation columns of a mortality table at an interest rate:
+    Dx = v^x lx, Nx = sum Dy (y >= x), Cx = v^(x+1) dx, Mx = sum Cy (y >= x).
+
+    Columns are indexed by age - min_age and padded with one zero past the
+    last age, so N and M can be read at x + n up to omega + 1.
+    """
+
+    def __init__(self, qx: np.ndarray, min_age: int, interest_rate: float, version: str = ""):
+        self.min_age = min_age
+        self.max_age = min_age + len(qx) - 1
+        self.interest_rate = interest_rate
+        self.version = version
+
+        lx = RADIX * np.concatenate(([1.0], np.cumprod(1 - qx)[:-1]))
+        dx = lx * qx
+        # Discount from the youngest age keeps v^x in range for any age range
+        v = (1 + interest_rate) ** -np.arange(len(qx), dtype=np.float64)
+
+        self.qx = qx
+        self.lx = lx
+        self.Dx = np.append(v * lx, 0.0)
+        self.Cx = np.append(v / (1 + interest_rate) * dx, 0.0)
+        self.Nx = np.cumsum(self.Dx[::-1])[::-1]
+        self.Mx = np.cumsum(self.Cx[::-1])[::-1]
+
+    def _index(self, age, term):
+        age = np.asarray(age, dtype=np.int64)
+        term = np.asarray(term, dtype=np.int64)
+        if ((age < self.min_age) | (age > self.max_age)).any():
+            raise MortalityTableError(f"Age must be between {self.min_age} and {self.max_age}")
+        x = age - self.min_age
+        # Cover ends at the end of the table at the latest
+        return x, np.minimum(x + term, len(self.Dx) - 1)
+
+    def net_single_contribution(self, age, term, coverage=1.0):
+        """One-off contribution for term cover: S (Mx - Mx+n) / Dx"""
+        x, end = self._index(age, term)
+        return coverage * (self.Mx[x] - self.Mx[end]) / self.Dx[x]
+
+    def net_annual_contribution(self, age, term, coverage=1.0):
+        """Level yearly contribution, paid in advance while alive: S (Mx - Mx+n) / (Nx - Nx+n)"""
+        x, end = self._index(age, term)
+        return coverage * (self.Mx[x] - self.Mx[end]) / (self.Nx[x] - self.Nx[end])
+
+
+@lru_cache(maxsize=64)
+def get_commutation_table(name: str, interest_rate: float, mortality_loading: float = 1.0) -> CommutationTable:
+    """Commutation columns for table `name`, with qx scaled by `mortality_loading` (cached)"""
+    table = load_mortality_table(name)
+    qx = np.minimum(table["qx"] * mortality_loading, 1.0)
+    return CommutationTable(qx, table["min_age"], interest_rate, table["version"])
+
+
+if __name__ == "__main__":
+    # Regenerate the default table: python -m app.services.mortality
+    MORTALITY_TABLE_DIR.mkdir(parents=True, exist_ok=True)
+    with open(MORTALITY_TABLE_DIR / "gompertz_makeham.json", "w", encoding="utf-8") as f:
+        json.dump(gompertz_makeham_table(), f, indent=1)
+        f.write("\n")
@@ -0,0 +1,154 @@
+"""
+Monte Carlo engine for the pension planner.
+
+Paths are simulated in fixed-size chunks, each with its own child seed spawned
+from the request seed, so a seeded run gives the same answer whether the chunks
+run inline or in the process pool. Big runs are spread across a process pool.
+"""
+import asyncio
+import os
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+
+# Paths per chunk (the unit of work handed to a pool worker)
+PENSION_MC_CHUNK_PATHS = int(os.getenv("PENSION_MC_CHUNK_PATHS", "50000"))
+
+# Runs with more paths than this go to the process pool
+PENSION_MC_PARALLEL_THRESHOLD = int(os.getenv("PENSION_MC_PARALLEL_THRESHOLD", "200000"))
+
+PENSION_MC_WORKERS = int(os.getenv("PENSION_MC_WORKERS", str(os.cpu_count() or 1)))
+
+# Largest paths x years grid simulated in one request (float32, 4 bytes per cell)
+PENSION_MC_MAX_CELLS = int(os.getenv("PENSION_MC_MAX_CELLS", "50000000"))
+
+_pool: Optional[ProcessPoolExecutor] = None
+
+
+def monthly_return_shocks(
+    rng: np.random.Generator,
+    shape: tuple,
+    mean: float,
+    volatility: float,
+    distribution: str,
+    degrees_of_freedom: float
+) -> np.ndarray:
+    """Monthly returns with the given mean and standard deviation"""
+    if distribution == "lognormal":
+        # log(1 + r) is normal, with parameters matching the mean and variance of r
+        sigma2 = np.log1p((volatility / (1 + mean)) ** 2)
+        mu = np.log1p(mean) - sigma2 / 2
+        return np.expm1(mu + np.sqrt(sigma2) * rng.standard_normal(shape, dtype=np.float32))
+    if distribution == "student_t":
+        # Fat tails: t draws scaled down to unit variance
+        scale = volatility * np.sqrt((degrees_of_freedom - 2) / degrees_of_freedom)
+        return mean + scale * rng.standard_t(degrees_of_freedom, shape).astype(np.float32)
+    return mean + volatility * rng.standard_normal(shape, dtype=np.float32)
+
+
+def simulate_chunk(
+    seed: np.random.SeedSequence,
+    paths: int,
+    years: int,
+    monthly_contribution: float,
+    annual_return: float,
+    annual_volatility: float,
+    annual_inflation: float,
+    inflation_volatility: float,
+    distribution: str = "normal",
+    degrees_of_freedom: float = 5.0
+) -> np.ndarray:
+    """
+    Simulate `paths` paths and return their inflation-adjusted value at the end
+    of each year, as a float32 array of shape (years, paths).
+
+    Contributions are made at the end of each month after that month's return,
+    as in the deterministic planner. Yearly inflation is lognormal, centred on
+    the deterministic rate.
+    """
+    rng = np.random.default_rng(seed)
+    monthly_mean = annual_return / 12
+    monthly_volatility = annual_volatility / np.sqrt(12)
+
+    wealth = np.zeros(paths)
+    log_price_level = np.zeros(paths)
+    real_values = np.empty((years, paths), dtype=np.float32)
+
+    for year in range(years):
+        growth = monthly_return_shocks(rng, (12, paths), monthly_mean, monthly_volatility, distribution, degrees_of_freedom)
+        growth += 1
+        for month in range(12):
+            wealth *= growth[month]
+            wealth += monthly_contribution
+
+        log_price_level += np.log1p(annual_inflation) + inflation_volatility * rng.standard_normal(paths) - inflation_volatility ** 2 / 2
+        real_values[year] = wealth / np.exp(log_price_level)
+
+    return real_values
+
+
+def _chunk_sizes(paths: int) -> List[int]:
+    full, rest = divmod(paths, PENSION_MC_CHUNK_PATHS)
+    return [PENSION_MC_CHUNK_PATHS] * full + ([rest] if rest else [])
+
+
+def get_simulation_pool() -> ProcessPoolExecutor:
+    global _pool
+    if _pool is None:
+        _pool = ProcessPoolExecutor(max_workers=PENSION_MC_WORKERS)
+    return _pool
+
+
+def shutdown_simulation_pool():
+    """Stop the worker processes (on app shutdown)"""
+    global _pool
+    if _pool is not None:
+        _pool.shutdown(cancel_futures=True)
+        _pool = None
+
+
+async def simulate_paths(paths: int, seed: Optional[int], **params) -> np.ndarray:
+    """Simulate all paths chunk by chunk, in the process pool for big runs; returns (years, paths)"""
+    sizes = _chunk_sizes(paths)
+    seeds = np.random.SeedSequence(seed).spawn(len(sizes))
+
+    if paths > PENSION_MC_PARALLEL_THRESHOLD and PENSION_MC_WORKERS > 1:
+        loop = asyncio.get_running_loop()
+        pool = get_simulation_pool()
+        chunks = await asyncio.gather(*(
+            loop.run_in_executor(pool, _simulate_chunk_kwargs, s, n, params)
+            for s, n in zip(seeds, sizes)
+        ))
+    else:
+        chunks = await asyncio.to_thread(lambda: [simulate_chunk(s, n, **params) for s, n in zip(seeds, sizes)])
+
+    return np.concatenate(chunks, axis=1)
+
+
+def _simulate_chunk_kwargs(seed, paths, params):
+    return simulate_chunk(seed, paths, **params)
+
+
+def summarize_paths(
+    real_values: np.ndarray,
+    percentiles: List[float],
+    target: Optional[float] = None
+) -> Dict[str, Any]:
+    """Percentile bands per year, final-value statistics and the chance of reaching `target`"""
+    # Year by year, so the partitioned copy np.percentile makes is one row, not the whole grid
+    bands = np.stack([np.percentile(year_values, percentiles) for year_values in real_values], axis=1)
+    final = real_values[-1]
+    summary = {
+        "percentiles": percentiles,
+        "bands": {f"p{p:g}": np.round(band, 2).tolist() for p, band in zip(percentiles, bands)},
+        "final": {
+            "mean": round(float(final.mean(dtype=np.float64)), 2),
+            **{f"p{p:g}": round(float(band[-1]), 2) for p, band in zip(percentiles, bands)}
+        }
+    }
+    if target is not None:
+        summary["probability_of_target"] = round(float((final >= target).mean()), 4)
+        # Share of paths at or above the target at the end of each year
+        summary["probability_of_target_by_year"] = [round(float((year_values >= target).mean()), 4) for year_values in real_values]
+    return summary
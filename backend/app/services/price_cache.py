@@ -0,0 +1,195 @@
+import asyncio
+import logging
+import time
+from dataclasses import dataclass
+from typing import Any, Awaitable, Callable, Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class CacheEntry:
+    value: Any
+    fetched_at: float  # unix timestamp of the upstream fetch
+
+    def age(self, now: Optional[float] = None) -> float:
+        return (now if now is not None else time.time()) - self.fetched_at
+
+
+class PriceCache:
+    """
+    Stale-while-revalidate cache for one upstream value.
+
+    - Younger than `ttl`: served as a hit.
+    - Older than `ttl` but younger than `max_staleness`: the last good value
+      is served immediately and a background refresh is started.
+    - Missing or older than `max_staleness`: callers wait for a refresh.
+
+    At most one refresh runs at a time; every caller that needs it awaits the
+    same task. A loader returning None (upstream down) keeps the last good value.
+
+    With a shared `snapshot` store, a newer snapshot published by another worker
+    is adopted before refreshing, and the upstream fetch only runs in the worker
+    holding the refresh lease.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        loader: Callable[[], Awaitable[Any]],
+        ttl: float,
+        max_staleness: float,
+        snapshot=None,
+        refresh_lease: float = 10.0,
+        encode: Callable[[Any], Any] = lambda value: value,
+        decode: Callable[[Any], Any] = lambda value: value,
+        on_refresh: Optional[Callable[[Any, float], None]] = None
+    ):
+        self.name = name
+        self.loader = loader
+        self.ttl = ttl
+        self.max_staleness = max(max_staleness, ttl)
+        self.snapshot = snapshot
+        self.refresh_lease = refresh_lease
+        # Convert values to/from the JSON form stored in the shared snapshot
+        self.encode = encode
+        self.decode = decode
+        # Called with (value, fetched_at) after every successful upstream refresh
+        self.on_refresh = on_refresh
+        self.entry: Optional[CacheEntry] = None
+        self._refresh_task: Optional[asyncio.Task] = None
+        self.hits = 0
+        self.stale_hits = 0
+        self.misses = 0
+        self.refreshes = 0
+        self.refresh_errors = 0
+        self.snapshot_loads = 0
+
+    async def get(self) -> Optional[CacheEntry]:
+        """Return a usable entry, or None if no value within max staleness exists"""
+        now = time.time()
+        entry = self.entry
+
+        if self.snapshot is not None and (entry is None or entry.age(now) >= self.ttl):
+            entry = self._adopt_snapshot()
+
+        if entry is not None:
+            age = entry.age(now)
+            if age < self.ttl:
+                self.hits += 1
+                return entry
+            if age < self.max_staleness:
+                self.stale_hits += 1
+                self._start_refresh()
+                return entry
+
+        self.misses += 1
+        # Shield so a cancelled caller doesn't cancel the refresh others wait on
+        await asyncio.shield(self._start_refresh())
+
+        entry = self.entry
+        if entry is not None and entry.age() < self.max_staleness:
+            return entry
+        return None
+
+    def put(self, value: Any, fetched_at: Optional[float] = None):
+        """Store a value fetched at `fetched_at` (defaults to now)"""
+        self.entry = CacheEntry(value=value, fetched_at=fetched_at if fetched_at is not None else time.time())
+
+    def invalidate(self):
+        self.entry = None
+
+    def _start_refresh(self) -> asyncio.Task:
+        """Start a refresh unless one is already in flight, returning the task"""
+        if self._refresh_task is None or self._refresh_task.done():
+            self._refresh_task = asyncio.create_task(self._refresh())
+        return self._refresh_task
+
+    def _adopt_snapshot(self) -> Optional[CacheEntry]:
+        """Take the shared snapshot if it is newer than the local entry"""
+        try:
+            shared = self.snapshot.read(self.name)
+        except Exception as e:
+            logger.warning(f"{self.name} snapshot read failed: {e}")
+            return self.entry
+        if shared is not None and (self.entry is None or shared.fetched_at > self.entry.fetched_at):
+            self.entry = CacheEntry(value=self.decode(shared.value), fetched_at=shared.fetched_at)
+            self.snapshot_loads += 1
+        return self.entry
+
+    async def _await_shared_refresh(self) -> bool:
+        """Wait for the worker holding the refresh lease to publish a new snapshot"""
+        previous = self.entry.fetched_at if self.entry else 0.0
+        deadline = self.snapshot.lease_expires_at(self.name) or time.time()
+        while time.time() < deadline:
+            await asyncio.sleep(0.1)
+            entry = self._adopt_snapshot()
+            if entry is not None and entry.fetched_at > previous:
+                return True
+        return False
+
+    async def _refresh(self):
+        leased = False
+        if self.snapshot is not None:
+            try:
+                leased = self.snapshot.try_acquire_refresh(self.name, self.refresh_lease)
+                contended = not leased
+            except Exception as e:
+                logger.warning(f"{self.name} refresh lease failed: {e}")
+                contended = False
+            # Another worker is already refreshing - wait for its snapshot instead
+            if contended and await self._await_shared_refresh():
+                return
+
+        self.refreshes += 1
+        try:
+            value = await self.loader()
+        except Exception as e:
+            self.refresh_errors += 1
+            logger.error(f"{self.name} cache refresh failed: {e}")
+            return
+        finally:
+            if leased:
+                self._release_lease()
+
+        if value is None:
+            self.refresh_errors += 1
+            return
+        self.put(value)
+
+        if self.snapshot is not None:
+            try:
+                self.snapshot.write(self.name, self.encode(value), self.entry.fetched_at)
+            except Exception as e:
+                logger.warning(f"{self.name} snapshot write failed: {e}")
+
+        if self.on_refresh is not None:
+            try:
+                self.on_refresh(value, self.entry.fetched_at)
+            except Exception as e:
+                logger.warning(f"{self.name} refresh hook failed: {e}")
+
+    def _release_lease(self):
+        try:
+            self.snapshot.release_refresh(self.name)
+        except Exception as e:
+            logger.warning(f"{self.name} refresh lease release failed: {e}")
+
+    def stats(self) -> Dict[str, Any]:
+        entry = self.entry
+        lookups = self.hits + self.stale_hits + self.misses
+        return {
+            "name": self.name,
+            "ttl_seconds": self.ttl,
+            "max_staleness_seconds": self.max_staleness,
+            "age_seconds": round(entry.age(), 3) if entry else None,
+            "hits": self.hits,
+            "stale_hits": self.stale_hits,
+            "misses": self.misses,
+            "hit_rate": round((self.hits + self.stale_hits) / lookups, 4) if lookups else 0.0,
+            "refreshes": self.refreshes,
+            "refresh_errors": self.refresh_errors,
+            "snapshot_loads": self.snapshot_loads,
+            "shared": self.snapshot is not None,
+            "refresh_in_flight": self._refresh_task is not None and not self._refresh_task.done()
+        }
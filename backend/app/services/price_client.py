@@ -0,0 +1,111 @@
+import asyncio
+import logging
+import os
+from typing import Dict, Optional
+
+import httpx
+
+from app.services.admission import ConcurrencyLimiter
+
+logger = logging.getLogger(__name__)
+
+# Upstream base URLs - overridable so a local stub server can stand in for them
+METALS_LIVE_URL = os.getenv("METALS_LIVE_URL", "https://api.metals.live")
+GOLD_API_URL = os.getenv("GOLD_API_URL", "https://www.goldapi.io")
+EXCHANGE_RATE_URL = os.getenv("EXCHANGE_RATE_URL", "https://api.exchangerate-api.com")
+
+# Fail fast on connect, but allow a slow provider a little longer to answer
+DEFAULT_TIMEOUT = httpx.Timeout(10.0, connect=3.0)
+
+# One keep-alive pool per provider
+DEFAULT_LIMITS = httpx.Limits(max_connections=10, max_keepalive_connections=5, keepalive_expiry=60)
+
+# Concurrent calls allowed per provider before callers queue, and how long they may queue
+PRICE_UPSTREAM_MAX_CONCURRENCY = int(os.getenv("PRICE_UPSTREAM_MAX_CONCURRENCY", "4"))
+PRICE_UPSTREAM_MAX_QUEUE = int(os.getenv("PRICE_UPSTREAM_MAX_QUEUE", "16"))
+PRICE_UPSTREAM_QUEUE_BUDGET_SECONDS = float(os.getenv("PRICE_UPSTREAM_QUEUE_BUDGET_SECONDS", "2"))
+
+
+class PriceClient:
+    """Async HTTP client holding one pooled connection per price provider"""
+
+    def __init__(
+        self,
+        timeout: httpx.Timeout = DEFAULT_TIMEOUT,
+        limits: httpx.Limits = DEFAULT_LIMITS,
+        transport: Optional[httpx.AsyncBaseTransport] = None
+    ):
+        self._timeout = timeout
+        self._limits = limits
+        self._transport = transport
+        self._clients: Dict[str, httpx.AsyncClient] = {}
+        self._limiters: Dict[str, ConcurrencyLimiter] = {}
+
+    def client(self, base_url: str) -> httpx.AsyncClient:
+        """Return the pooled client for a provider, creating it on first use"""
+        client = self._clients.get(base_url)
+        if client is None or client.is_closed:
+            client = httpx.AsyncClient(
+                base_url=base_url,
+                timeout=self._timeout,
+                limits=self._limits,
+                transport=self._transport
+            )
+            self._clients[base_url] = client
+        return client
+
+    def limiter(self, base_url: str) -> ConcurrencyLimiter:
+        """Return the concurrency limiter guarding a provider"""
+        limiter = self._limiters.get(base_url)
+        if limiter is None:
+            limiter = ConcurrencyLimiter(
+                base_url,
+                max_concurrency=PRICE_UPSTREAM_MAX_CONCURRENCY,
+                max_queue=PRICE_UPSTREAM_MAX_QUEUE,
+                queue_budget=PRICE_UPSTREAM_QUEUE_BUDGET_SECONDS
+            )
+            self._limiters[base_url] = limiter
+        return limiter
+
+    async def get_json(self, base_url: str, path: str, headers: Optional[Dict[str, str]] = None):
+        """GET a JSON document from a provider, returning None on a non-200 reply"""
+        async with self.limiter(base_url).slot():
+            response = await self.client(base_url).get(path, headers=headers)
+        if response.status_code != 200:
+            logger.warning(f"{base_url}{path} returned HTTP {response.status_code}")
+            return None
+        return response.json()
+
+    async def aclose(self):
+        """Close every provider pool"""
+        clients = list(self._clients.values())
+        self._clients.clear()
+        await asyncio.gather(*(c.aclose() for c in clients), return_exceptions=True)
+
+    def stats(self):
+        return [limiter.stats() for limiter in self._limiters.values()]
+
+
+_client: Optional[PriceClient] = None
+
+
+def get_price_client() -> PriceClient:
+    """Return the process-wide price client"""
+    global _client
+    if _client is None:
+        _client = PriceClient()
+    return _client
+
+
+def set_price_client(client: Optional[PriceClient]):
+    """Replace the process-wide price client (e.g. with one using a stub transport)"""
+    global _client
+    _client = client
+
+
+async def close_price_client():
+    """Close the process-wide price client on shutdown"""
+    global _client
+    if _client is not None:
+        await _client.aclose()
+        _client = None
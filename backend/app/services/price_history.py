@@ -0,0 +1,115 @@
+import logging
+import os
+import struct
+import tempfile
+from pathlib import Path
+from typing import Dict, Optional, Tuple
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# One sample = unix timestamp (seconds) + value, little-endian, 16 bytes
+SAMPLE_DTYPE = np.dtype([("ts", "<i8"), ("value", "<f8")])
+_SAMPLE = struct.Struct("<qd")
+
+DEFAULT_HISTORY_DIR = os.path.join(tempfile.gettempdir(), "safespend_price_history")
+
+
+class PriceSeries:
+    """
+    Append-only on-disk series of (timestamp, value) samples.
+
+    Each append is a single 16-byte O_APPEND write, so several worker processes
+    can record into the same file. Reads memory-map the file as a structured
+    array and binary-search the timestamp column; the mapping is only rebuilt
+    when the file has grown.
+    """
+
+    def __init__(self, path: Path):
+        self.path = Path(path)
+        self._size = -1
+        self._ts = np.empty(0, dtype="<i8")
+        self._values = np.empty(0, dtype="<f8")
+
+    def append(self, ts: int, value: float):
+        fd = os.open(self.path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+        try:
+            os.write(fd, _SAMPLE.pack(int(ts), float(value)))
+        finally:
+            os.close(fd)
+
+    def _refresh(self):
+        try:
+            size = os.stat(self.path).st_size
+        except FileNotFoundError:
+            size = 0
+        if size == self._size:
+            return
+        self._size = size
+
+        count = size // SAMPLE_DTYPE.itemsize
+        if count == 0:
+            self._ts = np.empty(0, dtype="<i8")
+            self._values = np.empty(0, dtype="<f8")
+            return
+
+        samples = np.memmap(self.path, dtype=SAMPLE_DTYPE, mode="r", shape=(count,))
+        ts = samples["ts"]
+        values = samples["value"]
+        # Appends from different workers can interleave slightly out of order
+        if count > 1 and not np.all(ts[1:] >= ts[:-1]):
+            order = np.argsort(ts, kind="stable")
+            ts = ts[order]
+            values = values[order]
+        self._ts = ts
+        self._values = values
+
+    def __len__(self) -> int:
+        self._refresh()
+        return len(self._ts)
+
+    def at(self, ts: float) -> Optional[Tuple[int, float]]:
+        """Return the latest sample taken at or before `ts`"""
+        self._refresh()
+        i = int(np.searchsorted(self._ts, ts, side="right")) - 1
+        if i < 0:
+            return None
+        return int(self._ts[i]), float(self._values[i])
+
+
+class PriceHistory:
+    """Directory of named price series (one file per series)"""
+
+    def __init__(self, directory: str):
+        self.directory = Path(directory)
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self._series: Dict[str, PriceSeries] = {}
+
+    def series(self, name: str) -> PriceSeries:
+        series = self._series.get(name)
+        if series is None:
+            series = PriceSeries(self.directory / f"{name}.bin")
+            self._series[name] = series
+        return series
+
+    def record(self, name: str, ts: float, value: float):
+        self.series(name).append(int(ts), value)
+
+    def at(self, name: str, ts: float) -> Optional[Tuple[int, float]]:
+        return self.series(name).at(ts)
+
+
+def open_price_history() -> Optional[PriceHistory]:
+    """
+    Open the price history directory at PRICE_HISTORY_DIR (default: a folder in
+    the system temp dir). Set PRICE_HISTORY_DIR=off to stop recording samples.
+    """
+    directory = os.getenv("PRICE_HISTORY_DIR", DEFAULT_HISTORY_DIR)
+    if not directory or directory.lower() == "off":
+        return None
+    try:
+        return PriceHistory(directory)
+    except OSError as e:
+        logger.warning(f"Price history unavailable at {directory}: {e}")
+        return None
@@ -0,0 +1,253 @@
+import asyncio
+import json
+import logging
+import random
+import time
+from pathlib import Path
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+from app.services.admission import OverloadedError
+
+logger = logging.getLogger(__name__)
+
+
+class PriceProvider:
+    """A named source for one kind of price ("metals" or "fx")"""
+
+    def __init__(self, name: str, kind: str):
+        self.name = name
+        self.kind = kind
+
+    async def fetch(self) -> Optional[Any]:
+        """Return a parsed price value, or None if the provider had no valid answer"""
+        raise NotImplementedError
+
+
+class CallableProvider(PriceProvider):
+    """Provider backed by an async fetch function (e.g. an upstream HTTP API)"""
+
+    def __init__(self, name: str, kind: str, fetch: Callable[[], Awaitable[Optional[Any]]]):
+        super().__init__(name, kind)
+        self._fetch = fetch
+
+    async def fetch(self) -> Optional[Any]:
+        return await self._fetch()
+
+
+class FileProvider(PriceProvider):
+    """
+    Local stand-in provider serving a JSON document from disk.
+
+    The document uses the same payload format as the upstream API it replaces and
+    is run through the same parser. `latency` and `failure_rate` inject delay and
+    random failures so the provider chain can be exercised offline.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        kind: str,
+        path: Path,
+        parse: Callable[[Any], Optional[Any]],
+        latency: float = 0.0,
+        failure_rate: float = 0.0,
+        rng: Optional[random.Random] = None
+    ):
+        super().__init__(name, kind)
+        self.path = Path(path)
+        self.parse = parse
+        self.latency = latency
+        self.failure_rate = failure_rate
+        self._rng = rng or random.Random()
+
+    async def fetch(self) -> Optional[Any]:
+        if self.latency > 0:
+            await asyncio.sleep(self.latency)
+        if self.failure_rate > 0 and self._rng.random() < self.failure_rate:
+            raise ConnectionError(f"{self.name}: injected failure")
+        return self.parse(json.loads(self.path.read_text()))
+
+
+class CircuitBreaker:
+    """
+    Per-provider circuit breaker.
+
+    After `failure_threshold` consecutive failures the circuit opens and the
+    provider is skipped for `cooldown` seconds. After the cooldown a single trial
+    call is let through (half-open); success closes the circuit, failure reopens it.
+    """
+
+    def __init__(self, failure_threshold: int = 3, cooldown: float = 60.0):
+        self.failure_threshold = failure_threshold
+        self.cooldown = cooldown
+        self.failures = 0
+        self.opened_at: Optional[float] = None
+        self._trial_in_flight = False
+
+    @property
+    def state(self) -> str:
+        if self.opened_at is None:
+            return "closed"
+        if time.monotonic() - self.opened_at >= self.cooldown:
+            return "half-open"
+        return "open"
+
+    def allow(self) -> bool:
+        state = self.state
+        if state == "closed":
+            return True
+        if state == "half-open" and not self._trial_in_flight:
+            self._trial_in_flight = True
+            return True
+        return False
+
+    def release_trial(self):
+        """Give back a half-open trial whose call was cancelled before it finished"""
+        self._trial_in_flight = False
+
+    def record_success(self):
+        self.failures = 0
+        self.opened_at = None
+        self._trial_in_flight = False
+
+    def record_failure(self):
+        self.failures += 1
+        if self._trial_in_flight or self.failures >= self.failure_threshold:
+            self.opened_at = time.monotonic()
+        self._trial_in_flight = False
+
+
+class ProviderRegistry:
+    """
+    Ordered registry of price providers with hedged racing.
+
+    `race(kind)` starts the first healthy provider, and launches the next one
+    whenever the current ones fail or `hedge_delay` passes without an answer.
+    The first valid answer wins and the remaining calls are cancelled. Nothing
+    runs past `budget` seconds.
+    """
+
+    def __init__(
+        self,
+        budget: float = 5.0,
+        hedge_delay: float = 1.0,
+        failure_threshold: int = 3,
+        cooldown: float = 60.0
+    ):
+        self.budget = budget
+        self.hedge_delay = hedge_delay
+        self.failure_threshold = failure_threshold
+        self.cooldown = cooldown
+        self._providers: List[PriceProvider] = []
+        self.breakers: Dict[str, CircuitBreaker] = {}
+
+    def register(self, provider: PriceProvider):
+        """Add a provider at the end of the chain for its kind"""
+        self._providers.append(provider)
+        self.breakers[provider.name] = CircuitBreaker(self.failure_threshold, self.cooldown)
+
+    def clear(self):
+        self._providers.clear()
+        self.breakers.clear()
+
+    def providers(self, kind: str) -> List[PriceProvider]:
+        return [p for p in self._providers if p.kind == kind]
+
+    async def _call(self, provider: PriceProvider) -> Optional[Any]:
+        breaker = self.breakers[provider.name]
+        try:
+            result = await provider.fetch()
+        except asyncio.CancelledError:
+            breaker.release_trial()
+            raise
+        except OverloadedError as e:
+            # Shed locally - says nothing about the provider's health
+            logger.info(f"Price provider {provider.name} skipped: {e}")
+            breaker.release_trial()
+            return None
+        except Exception as e:
+            logger.warning(f"Price provider {provider.name} failed: {e}")
+            breaker.record_failure()
+            return None
+
+        if result is None:
+            breaker.record_failure()
+            return None
+
+        breaker.record_success()
+        return result
+
+    async def race(
+        self,
+        kind: str,
+        budget: Optional[float] = None,
+        hedge_delay: Optional[float] = None
+    ) -> Optional[Any]:
+        """Return the first valid answer from the providers of `kind`, or None"""
+        budget = self.budget if budget is None else budget
+        hedge_delay = self.hedge_delay if hedge_delay is None else hedge_delay
+
+        waiting = self.providers(kind)
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + budget
+        pending: Dict[asyncio.Task, PriceProvider] = {}
+
+        def launch_next() -> bool:
+            # Breakers are asked only when a provider is actually started, so a
+            # half-open trial is never taken for a provider that does not run
+            while waiting:
+                provider = waiting.pop(0)
+                if self.breakers[provider.name].allow():
+                    pending[asyncio.create_task(self._call(provider))] = provider
+                    return True
+            return False
+
+        try:
+            while pending or waiting:
+                if not pending and not launch_next():
+                    break
+
+                remaining = deadline - loop.time()
+                if remaining <= 0:
+                    break
+
+                timeout = min(remaining, hedge_delay) if waiting else remaining
+                done, _ = await asyncio.wait(pending, timeout=timeout, return_when=asyncio.FIRST_COMPLETED)
+
+                if not done:
+                    # Nobody answered within the hedge delay - bring in the next provider
+                    if waiting:
+                        launch_next()
+                    continue
+
+                for task in done:
+                    pending.pop(task)
+                    result = task.result()
+                    if result is not None:
+                        return result
+
+                # A provider failed outright - don't wait out the hedge delay
+                if waiting:
+                    launch_next()
+        finally:
+            if pending and loop.time() >= deadline:
+                # Still running when the budget ran out - count that against them
+                for provider in pending.values():
+                    self.breakers[provider.name].record_failure()
+            for task, provider in pending.items():
+                task.cancel()
+                # A task cancelled before its first step never reaches _call's handler
+                self.breakers[provider.name].release_trial()
+
+        return None
+
+    def status(self) -> List[Dict[str, Any]]:
+        return [
+            {
+                "name": p.name,
+                "kind": p.kind,
+                "circuit": self.breakers[p.name].state,
+                "consecutive_failures": self.breakers[p.name].failures
+            }
+            for p in self._providers
+        ]
@@ -0,0 +1,106 @@
+import json
+import logging
+import os
+import sqlite3
+import tempfile
+import threading
+import time
+from typing import Any, Optional
+
+from app.services.price_cache import CacheEntry
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_SNAPSHOT_PATH = os.path.join(tempfile.gettempdir(), "safespend_prices.sqlite3")
+
+
+class PriceSnapshotStore:
+    """
+    Latest price snapshot shared by every worker process on the host.
+
+    Backed by a local SQLite file in WAL mode: each write is one atomic
+    transaction and never moves a snapshot backwards in time, and readers never
+    block on a writer. A refresh lease per key lets one worker refresh from
+    upstream while the others wait for its snapshot, so all workers share one
+    refresh schedule.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self.owner = f"{os.getpid()}-{id(self)}"
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, timeout=2.0, isolation_level=None, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS snapshots ("
+            "key TEXT PRIMARY KEY, value TEXT NOT NULL, fetched_at REAL NOT NULL)"
+        )
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS refresh_leases ("
+            "key TEXT PRIMARY KEY, owner TEXT NOT NULL, expires_at REAL NOT NULL)"
+        )
+
+    def read(self, key: str) -> Optional[CacheEntry]:
+        """Return the shared snapshot for `key`, if any"""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT value, fetched_at FROM snapshots WHERE key = ?", (key,)
+            ).fetchone()
+        if row is None:
+            return None
+        return CacheEntry(value=json.loads(row[0]), fetched_at=row[1])
+
+    def write(self, key: str, value: Any, fetched_at: float):
+        """Publish a snapshot unless a newer one is already stored"""
+        with self._lock:
+            self._conn.execute(
+                "INSERT INTO snapshots (key, value, fetched_at) VALUES (?, ?, ?) "
+                "ON CONFLICT(key) DO UPDATE SET value = excluded.value, fetched_at = excluded.fetched_at "
+                "WHERE excluded.fetched_at > snapshots.fetched_at",
+                (key, json.dumps(value), fetched_at)
+            )
+
+    def try_acquire_refresh(self, key: str, lease_seconds: float) -> bool:
+        """Take the refresh lease for `key` unless another worker holds an unexpired one"""
+        now = time.time()
+        with self._lock:
+            cursor = self._conn.execute(
+                "INSERT INTO refresh_leases (key, owner, expires_at) VALUES (?, ?, ?) "
+                "ON CONFLICT(key) DO UPDATE SET owner = excluded.owner, expires_at = excluded.expires_at "
+                "WHERE refresh_leases.expires_at < ? OR refresh_leases.owner = excluded.owner",
+                (key, self.owner, now + lease_seconds, now)
+            )
+            return cursor.rowcount == 1
+
+    def lease_expires_at(self, key: str) -> Optional[float]:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT expires_at FROM refresh_leases WHERE key = ?", (key,)
+            ).fetchone()
+        return row[0] if row else None
+
+    def release_refresh(self, key: str):
+        with self._lock:
+            self._conn.execute(
+                "DELETE FROM refresh_leases WHERE key = ? AND owner = ?", (key, self.owner)
+            )
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+def open_snapshot_store() -> Optional[PriceSnapshotStore]:
+    """
+    Open the shared snapshot store at PRICE_SNAPSHOT_PATH (default: a file in the
+    system temp dir). Set PRICE_SNAPSHOT_PATH=off to keep prices per process.
+    """
+    path = os.getenv("PRICE_SNAPSHOT_PATH", DEFAULT_SNAPSHOT_PATH)
+    if not path or path.lower() == "off":
+        return None
+    try:
+        return PriceSnapshotStore(path)
+    except sqlite3.Error as e:
+        logger.warning(f"Price snapshot store unavailable at {path}: {e}")
+        return None
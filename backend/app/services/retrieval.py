@@ -0,0 +1,227 @@
+import json
+import logging
+import math
+import os
+import re
+from collections import Counter, defaultdict
+from dataclasses import asdict, dataclass
+from pathlib import Path
+from typing import Dict, List, Optional, Sequence, Tuple
+
+logger = logging.getLogger(__name__)
+
+DATA_DIR = Path(__file__).resolve().parent.parent / "data" / "knowledge"
+KNOWLEDGE_BASE_PATH = DATA_DIR / "knowledge_base.json"
+FAQ_PATH = DATA_DIR / "faq.json"
+
+_WORD = re.compile(r"[a-z0-9]+(?:-[a-z0-9]+)*")
+
+STOPWORDS = frozenset("""
+a an and are as at be by can do does for from has have how i if in is it its me my of on or our so
+that the their there these this to was we what when where which who why will with you your about
+should would could many tell explain please
+""".split())
+
+
+def stem(word: str) -> str:
+    """Very light plural stripping ("liabilities" -> "liability", "debts" -> "debt")"""
+    if len(word) > 4 and word.endswith("ies"):
+        return word[:-3] + "y"
+    if len(word) > 3 and word.endswith("s") and not word.endswith("ss"):
+        return word[:-1]
+    return word
+
+
+def tokenize(text: str) -> List[str]:
+    words = _WORD.findall(text.lower().replace("’", "'"))
+    return [stem(w) for w in words if len(w) > 1 and w not in STOPWORDS]
+
+
+@dataclass
+class Passage:
+    id: str
+    title: str
+    text: str
+    source: str
+    question: Optional[str] = None
+    answer: Optional[str] = None
+
+
+@dataclass
+class RetrievalResult:
+    answer: Optional[str]
+    confidence: float
+    passages: List[Passage]
+
+
+class BM25Index:
+    """Okapi BM25 over a list of passages, with an in-memory inverted index"""
+
+    def __init__(self, passages: Sequence[Passage], k1: float = 1.5, b: float = 0.75):
+        self.passages = list(passages)
+        self.k1 = k1
+        self.b = b
+        self.postings: Dict[str, List[Tuple[int, int]]] = defaultdict(list)
+        self.lengths: List[int] = []
+
+        for doc_id, passage in enumerate(self.passages):
+            terms = tokenize(f"{passage.title} {passage.text}")
+            self.lengths.append(len(terms))
+            for term, tf in Counter(terms).items():
+                self.postings[term].append((doc_id, tf))
+
+        n = len(self.passages)
+        self.avg_length = (sum(self.lengths) / n) if n else 0.0
+        self.idf = {
+            term: math.log(1 + (n - len(docs) + 0.5) / (len(docs) + 0.5))
+            for term, docs in self.postings.items()
+        }
+
+    def search(self, query: str, k: int = 3) -> List[Tuple[float, Passage]]:
+        scores: Dict[int, float] = defaultdict(float)
+        # Sorted so the float sums, and therefore the ranking, do not depend on set order
+        for term in sorted(set(tokenize(query))):
+            idf = self.idf.get(term)
+            if idf is None:
+                continue
+            for doc_id, tf in self.postings[term]:
+                norm = self.k1 * (1 - self.b + self.b * self.lengths[doc_id] / self.avg_length)
+                scores[doc_id] += idf * tf * (self.k1 + 1) / (tf + norm)
+        # Equal scores rank in corpus order
+        best = sorted(scores.items(), key=lambda item: (-item[1], item[0]))[:k]
+        return [(score, self.passages[doc_id]) for doc_id, score in best]
+
+    def term_weight(self, term: str) -> float:
+        # Terms never seen in the corpus still count, at the highest weight
+        return self.idf.get(term, math.log(1 + len(self.passages) + 0.5))
+
+
+class KnowledgeBase:
+    """
+    Local FAQ and documentation retrieval for the chatbot.
+
+    A question that closely matches a curated FAQ entry (idf-weighted term
+    overlap in both directions at or above `answer_threshold`) is answered
+    directly. Otherwise the top passages are returned as reference material
+    for the LLM prompt.
+    """
+
+    def __init__(self, passages: Sequence[Passage], answer_threshold: float = 0.8, max_passages: int = 3):
+        self.index = BM25Index(passages)
+        self.answer_threshold = answer_threshold
+        self.max_passages = max_passages
+
+    def _match(self, query_terms: set, question: str) -> float:
+        question_terms = set(tokenize(question))
+        if not query_terms or not question_terms:
+            return 0.0
+        shared = sum(self.index.term_weight(t) for t in query_terms & question_terms)
+        precision = shared / sum(self.index.term_weight(t) for t in query_terms)
+        recall = shared / sum(self.index.term_weight(t) for t in question_terms)
+        if precision + recall == 0:
+            return 0.0
+        return 2 * precision * recall / (precision + recall)
+
+    def lookup(self, query: str) -> RetrievalResult:
+        hits = self.index.search(query, k=max(self.max_passages, 5))
+        query_terms = set(tokenize(query))
+
+        best_answer = None
+        best_confidence = 0.0
+        for _, passage in hits:
+            if passage.answer is None:
+                continue
+            confidence = self._match(query_terms, passage.question or passage.title)
+            if confidence > best_confidence:
+                best_answer, best_confidence = passage.answer, confidence
+
+        if best_confidence >= self.answer_threshold:
+            return RetrievalResult(answer=best_answer, confidence=best_confidence, passages=[])
+        return RetrievalResult(
+            answer=None,
+            confidence=best_confidence,
+            passages=[passage for _, passage in hits[:self.max_passages]]
+        )
+
+
+def load_knowledge_base(path: Path = KNOWLEDGE_BASE_PATH) -> Optional[KnowledgeBase]:
+    """Load the prebuilt passage file; CHAT_FAQ_CONFIDENCE sets the direct-answer threshold"""
+    try:
+        passages = [Passage(**p) for p in json.loads(Path(path).read_text(encoding="utf-8"))]
+    except (OSError, ValueError, TypeError) as e:
+        logger.warning(f"Chat knowledge base unavailable at {path}: {e}")
+        return None
+    return KnowledgeBase(passages, answer_threshold=float(os.getenv("CHAT_FAQ_CONFIDENCE", "0.8")))
+
+
+# --- Building the prebuilt passage file ---
+
+_DOC_SECTION = re.compile(r'(?:"([^"]+)"|(\w+)):\s*`([^`]*)`')
+
+
+def _clean(text: str) -> str:
+    return re.sub(r"\s+", " ", text.replace("**", "")).strip()
+
+
+def passages_from_docs(docs_jsx: str) -> List[Passage]:
+    """Split each calculator section of docs.jsx into definition, inputs and note passages"""
+    passages = []
+    for quoted, bare, body in _DOC_SECTION.findall(docs_jsx):
+        title = quoted or bare
+        blocks = [b for b in re.split(r"\n\s*\n", body.replace("**", "")) if b.strip()]
+        for i, block in enumerate(blocks):
+            passages.append(Passage(
+                id=f"docs:{title}:{i}",
+                title=title,
+                text=_clean(block),
+                source="docs"
+            ))
+    return passages
+
+
+def passages_from_readme(readme: str) -> List[Passage]:
+    """One passage per second-level README section"""
+    passages = []
+    for section in re.split(r"\n## ", readme)[1:]:
+        heading, _, body = section.partition("\n")
+        title = re.sub(r"[^\w\s()/&-]", "", heading).strip()
+        text = _clean(re.sub(r"^[*-]\s*", "", body.replace("---", ""), flags=re.M))
+        if text:
+            passages.append(Passage(id=f"readme:{title}", title=title, text=text, source="readme"))
+    return passages
+
+
+def passages_from_faq(entries: List[dict]) -> List[Passage]:
+    return [
+        Passage(
+            id=f"faq:{i}",
+            title=entry["question"],
+            text=entry["answer"],
+            source="faq",
+            question=entry["question"],
+            answer=entry["answer"]
+        )
+        for i, entry in enumerate(entries)
+    ]
+
+
+def build_knowledge_base(docs_path: Path, readme_path: Path, faq_path: Path = FAQ_PATH) -> List[Passage]:
+    passages = passages_from_faq(json.loads(Path(faq_path).read_text(encoding="utf-8")))
+    passages += passages_from_docs(Path(docs_path).read_text(encoding="utf-8"))
+    passages += passages_from_readme(Path(readme_path).read_text(encoding="utf-8"))
+    return passages
+
+
+if __name__ == "__main__":
+    # Rebuild app/data/knowledge/knowledge_base.json from the frontend docs, README and FAQ:
+    #   python -m app.services.retrieval
+    repo_root = Path(__file__).resolve().parents[3]
+    built = build_knowledge_base(
+        repo_root / "frontend" / "src" / "pages" / "docs.jsx",
+        repo_root / "README.md"
+    )
+    KNOWLEDGE_BASE_PATH.write_text(
+        json.dumps([asdict(p) for p in built], indent=2, ensure_ascii=False) + "\n",
+        encoding="utf-8"
+    )
+    print(f"Wrote {len(built)} passages to {KNOWLEDGE_BASE_PATH}")
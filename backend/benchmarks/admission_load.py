@@ -0,0 +1,39 @@
+"""
+Overload /chat/stream against the stub LLM and report latency percentiles
+for admitted and shed requests.
+
+    python -m benchmarks.admission_load [concurrent requests]
+"""
+import asyncio
+import sys
+import time
+
+from benchmarks.common import app_client, latency_summary
+
+
+async def main(requests: int):
+    from app.routes import chat
+    from app.services.admission import ConcurrencyLimiter
+    from app.services.llm import StubLLM
+
+    chat.llm_limiter = ConcurrencyLimiter("gemini", max_concurrency=8, max_queue=32, queue_budget=2.0)
+    chat._llm = StubLLM(first_token_latency=0.2, token_interval=0.01)
+
+    async with app_client() as client:
+        async def one(i):
+            started = time.perf_counter()
+            response = await client.post("/api/chat/stream", json={"message": f"benchmark question {i} zq{i}"})
+            return response.status_code, time.perf_counter() - started
+
+        started = time.perf_counter()
+        results = await asyncio.gather(*(one(i) for i in range(requests)))
+        elapsed = time.perf_counter() - started
+
+    print(f"{requests} concurrent streams in {elapsed:.2f} s; 8 slots, queue 32, budget 2 s")
+    print("admitted (200):", latency_summary([t for s, t in results if s == 200]))
+    print("shed (503):    ", latency_summary([t for s, t in results if s == 503]))
+    print("limiter after: ", chat.llm_limiter.stats())
+
+
+if __name__ == "__main__":
+    asyncio.run(main(int(sys.argv[1]) if len(sys.argv) > 1 else 500))
@@ -0,0 +1,64 @@
+"""
+Per-turn cost of a growing conversation, out to 200 turns: prompt building
+alone (with and without a cached conversation summary) and the whole /chat
+request against a zero-latency stub LLM.
+
+    python -m benchmarks.chat_context [turns]
+"""
+import asyncio
+import sys
+import time
+from types import SimpleNamespace
+
+import numpy as np
+
+from benchmarks.common import app_client
+
+CHECKPOINTS = (1, 10, 25, 50, 100, 150, 200)
+
+TURN_TEXT = "How is the profit on a murabaha computed when the term changes? " + "More detail on the question. " * 15
+
+
+def report(label: str, timings):
+    cells = "  ".join(f"{n:>3}: {timings[n - 1] * 1000:6.2f}" for n in CHECKPOINTS if n <= len(timings))
+    print(f"{label:<28}{cells}  (ms per turn)")
+
+
+async def main(turns: int):
+    from app.routes import chat
+    from app.services.chat_context import ConversationContext
+    from app.services.llm import StubLLM
+
+    history = [SimpleNamespace(role="user" if i % 2 == 0 else "model", text=f"{i} {TURN_TEXT}") for i in range(2 * turns)]
+
+    for label, conversation_id in (("build_prompt, cached", "bench"), ("build_prompt, no id", None)):
+        context = ConversationContext()
+        timings = []
+        for n in range(1, turns + 1):
+            # Median of a few builds at each length smooths out timer noise
+            samples = []
+            for repeat in range(5):
+                started = time.perf_counter()
+                context.build_prompt(chat.SYSTEM_PROMPT, history[:2 * n], "Next question", conversation_id)
+                samples.append(time.perf_counter() - started)
+            timings.append(float(np.median(samples)))
+        report(label, timings)
+
+    chat._llm = StubLLM(first_token_latency=0, token_interval=0)
+    payload_history = [{"role": t.role, "text": t.text} for t in history]
+    async with app_client() as client:
+        timings = []
+        for n in range(1, turns + 1):
+            started = time.perf_counter()
+            response = await client.post("/api/chat", json={
+                "message": f"Question {n} zq{n}",
+                "history": payload_history[:2 * n],
+                "conversation_id": "bench"
+            })
+            timings.append(time.perf_counter() - started)
+            assert response.status_code == 200
+        report("/chat request", timings)
+
+
+if __name__ == "__main__":
+    asyncio.run(main(int(sys.argv[1]) if len(sys.argv) > 1 else 200))
@@ -0,0 +1,81 @@
+"""
+Time-to-first-token and concurrent stream capacity of /chat/stream against the
+stub LLM. The app is driven as a raw ASGI callable, because httpx's
+ASGITransport only returns once the whole body is in.
+
+    python -m benchmarks.chat_stream [concurrent streams] [ttft seconds]
+"""
+import asyncio
+import json
+import sys
+import time
+
+from benchmarks.common import latency_summary
+
+
+async def stream_once(app, message: str):
+    """POST one chat message; returns (status, time to first event, total time)"""
+    payload = json.dumps({"message": message}).encode()
+    started = time.perf_counter()
+    status = None
+    first = None
+    request_sent = False
+
+    async def receive():
+        nonlocal request_sent
+        if not request_sent:
+            request_sent = True
+            return {"type": "http.request", "body": payload, "more_body": False}
+        # The client stays connected
+        await asyncio.Event().wait()
+
+    async def send(message):
+        nonlocal status, first
+        if message["type"] == "http.response.start":
+            status = message["status"]
+        elif message.get("body") and first is None:
+            first = time.perf_counter() - started
+
+    scope = {
+        "type": "http",
+        "asgi": {"version": "3.0", "spec_version": "2.4"},
+        "http_version": "1.1",
+        "method": "POST",
+        "scheme": "http",
+        "path": "/api/chat/stream",
+        "raw_path": b"/api/chat/stream",
+        "root_path": "",
+        "query_string": b"",
+        "headers": [(b"content-type", b"application/json"), (b"content-length", str(len(payload)).encode())],
+        "client": ("127.0.0.1", 50000),
+        "server": ("bench", 80)
+    }
+    await app(scope, receive, send)
+    return status, first, time.perf_counter() - started
+
+
+async def main(streams: int, ttft: float):
+    from app.main import app
+    from app.routes import chat
+    from app.services.admission import ConcurrencyLimiter
+    from app.services.llm import StubLLM
+
+    chat._llm = StubLLM(first_token_latency=ttft, token_interval=0.02)
+
+    for slots in (8, streams):
+        chat.llm_limiter = ConcurrencyLimiter("gemini", max_concurrency=slots, max_queue=streams, queue_budget=60)
+        started = time.perf_counter()
+        results = await asyncio.gather(*(stream_once(app, f"benchmark question {slots} {i} zq{i}") for i in range(streams)))
+        elapsed = time.perf_counter() - started
+
+        ok = [r for r in results if r[0] == 200]
+        print(f"{streams} concurrent streams, {slots} LLM slots: {len(ok)} ok in {elapsed:.2f} s ({len(ok) / elapsed:.0f} streams/s)")
+        print("  time to first token:", latency_summary([r[1] for r in ok]))
+        print("  full reply:         ", latency_summary([r[2] for r in ok]))
+
+
+if __name__ == "__main__":
+    asyncio.run(main(
+        int(sys.argv[1]) if len(sys.argv) > 1 else 200,
+        float(sys.argv[2]) if len(sys.argv) > 2 else 0.2
+    ))
@@ -0,0 +1,48 @@
+"""
+Helpers for the benchmark scripts (run from backend/, e.g. python -m benchmarks.zakat_batch).
+
+Importing this module points the app at local stand-ins for every upstream,
+the same way tests/conftest.py does, so it must be imported before app.
+"""
+import os
+import time
+from contextlib import asynccontextmanager, contextmanager
+
+import numpy as np
+
+os.environ.update({
+    "PRICE_PROVIDERS": "local",
+    "PRICE_SNAPSHOT_PATH": "off",
+    "PRICE_HISTORY_DIR": "off",
+    "CHAT_LLM": "stub",
+    "CHAT_RATE_LIMIT_PER_SECOND": "0",
+    "PRICES_RATE_LIMIT_PER_SECOND": "0"
+})
+
+
+@asynccontextmanager
+async def app_client(timeout: float = 600):
+    """An httpx client wired straight into the app"""
+    import httpx
+    from app.main import app
+
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://bench", timeout=timeout) as client:
+        yield client
+
+
+@contextmanager
+def timed(label: str, rows: int = 0):
+    """Print the wall time of the block (and rows per second when `rows` is given)"""
+    started = time.perf_counter()
+    yield
+    elapsed = time.perf_counter() - started
+    rate = f", {rows / elapsed:,.0f} rows/s" if rows else ""
+    print(f"{label}: {elapsed:.3f} s{rate}")
+
+
+def latency_summary(samples) -> str:
+    samples = np.asarray(samples) * 1000
+    if len(samples) == 0:
+        return "n=0"
+    p50, p99 = np.percentile(samples, [50, 99])
+    return f"n={len(samples)} p50={p50:.1f} ms p99={p99:.1f} ms max={samples.max():.1f} ms"
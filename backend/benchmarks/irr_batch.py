@@ -0,0 +1,45 @@
+"""
+Effective annual rates for a large murabaha portfolio: the vectorized solver
+on its own, then the same contracts through /murabaha/effective-rate.
+
+    python -m benchmarks.irr_batch [contracts]
+"""
+import asyncio
+import sys
+
+import numpy as np
+
+from benchmarks.common import app_client, timed
+
+
+async def main(contracts: int):
+    from app.routes.murabaha import calculate_murabaha_effective_rate, calculate_murabaha_terms
+
+    rng = np.random.default_rng(0)
+    asset_cost = rng.uniform(10000, 500000, contracts)
+    margin = rng.uniform(2, 30, contracts)
+    term = rng.integers(6, 121, contracts).astype(np.float64)
+    down_payment = asset_cost * rng.uniform(0, 0.3, contracts)
+    payments_per_year = np.full(contracts, 12)
+    grace = np.zeros(contracts)
+
+    terms = calculate_murabaha_terms(asset_cost, margin, term, payments_per_year, down_payment=down_payment)
+    with timed(f"solver, {contracts:,} contracts", contracts):
+        rates = calculate_murabaha_effective_rate(
+            asset_cost, down_payment, terms["installment_amount"], terms["number_of_payments"],
+            payments_per_year, term, grace
+        )
+    print(f"unsolved: {int(np.isnan(rates).sum())}")
+
+    body = {"contracts": [
+        {"asset_cost": a, "profit_margin_percentage": m, "payment_term_months": int(t), "down_payment": d}
+        for a, m, t, d in zip(asset_cost.tolist(), margin.tolist(), term.tolist(), down_payment.tolist())
+    ]}
+    async with app_client() as client:
+        with timed(f"/murabaha/effective-rate, {contracts:,} contracts", contracts):
+            response = await client.post("/api/murabaha/effective-rate", json=body)
+    print(response.status_code, response.json()["count"])
+
+
+if __name__ == "__main__":
+    asyncio.run(main(int(sys.argv[1]) if len(sys.argv) > 1 else 100000))
@@ -0,0 +1,90 @@
+"""
+Distribute a month's mudarabah pool profit across a large depositor base: the
+daily-product library functions, then the /mudarabah/pool/csv upload with
+summary (json) and per-account (csv) output.
+
+    python -m benchmarks.mudarabah_pool [accounts]
+"""
+import asyncio
+import io
+import sys
+
+import numpy as np
+
+from benchmarks.common import app_client, timed
+
+UPLOAD_BLOCK = 64 * 1024
+PERIOD = {
+    "period_start": "2025-01-01",
+    "period_end": "2025-01-31",
+    "total_revenue": 250000000,
+    "total_expenses": 40000000,
+    "rabbul_mal_profit_ratio": 65,
+    "mudarib_profit_ratio": 35,
+    "tier_weights": "1,1.25,1.5"
+}
+
+
+def ledger(accounts: int):
+    """An opening balance per account plus one deposit or withdrawal in the month"""
+    rng = np.random.default_rng(0)
+    account = np.concatenate([np.arange(accounts), np.arange(accounts)])
+    tier = np.tile(rng.integers(0, 3, accounts), 2)
+    day = np.concatenate([rng.integers(-365, 0, accounts), rng.integers(0, 31, accounts)])
+    opening = np.round(rng.uniform(1000, 5000000, accounts), 2)
+    movement = np.round(opening * rng.uniform(-0.5, 0.5, accounts), 2)
+    return {"account": account, "tier": tier, "day": day, "amount": np.concatenate([opening, movement])}
+
+
+def ledger_csv(columns) -> bytes:
+    dates = (np.datetime64("2025-01-01") + columns["day"]).astype(str)
+    rows = np.empty((len(dates), 4), dtype=object)
+    rows[:, 0] = columns["account"]
+    rows[:, 1] = columns["tier"]
+    rows[:, 2] = dates
+    rows[:, 3] = columns["amount"]
+    buffer = io.StringIO()
+    buffer.write("account,tier,date,amount\n")
+    np.savetxt(buffer, rows, fmt="%d,%d,%s,%.2f")
+    return buffer.getvalue().encode()
+
+
+async def main(accounts: int):
+    from app.routes.mudarabah import calculate_daily_products, distribute_pool
+
+    columns = ledger(accounts)
+    rows = len(columns["account"])
+    with timed(f"calculate_daily_products + distribute_pool, {accounts:,} accounts ({rows:,} postings)", accounts):
+        products = calculate_daily_products(
+            columns["account"],
+            np.maximum(columns["day"], 0),
+            np.round(columns["amount"] * 100).astype(np.int64),
+            31
+        )
+        distribute_pool(
+            products["daily_product"],
+            columns["tier"][products["last_row"]],
+            np.array([1, 1.25, 1.5]),
+            31,
+            PERIOD["total_revenue"],
+            PERIOD["total_expenses"],
+            PERIOD["rabbul_mal_profit_ratio"],
+            PERIOD["mudarib_profit_ratio"]
+        )
+
+    body = ledger_csv(columns)
+    print(f"upload: {len(body) / 1e6:.1f} MB")
+
+    async def upload():
+        for start in range(0, len(body), UPLOAD_BLOCK):
+            yield body[start:start + UPLOAD_BLOCK]
+
+    async with app_client() as client:
+        for fmt in ("json", "csv"):
+            with timed(f"/mudarabah/pool/csv, {accounts:,} accounts, {fmt} output", accounts):
+                response = await client.post("/api/mudarabah/pool/csv", params={**PERIOD, "format": fmt}, content=upload())
+            print(response.status_code, f"{len(response.content) / 1e6:.1f} MB out")
+
+
+if __name__ == "__main__":
+    asyncio.run(main(int(sys.argv[1]) if len(sys.argv) > 1 else 1000000))
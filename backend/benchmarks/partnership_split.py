@@ -0,0 +1,44 @@
+"""
+Split a profit across a streamed partner CSV upload and report throughput for
+CSV and JSON output.
+
+    python -m benchmarks.partnership_split [partners]
+"""
+import asyncio
+import sys
+
+import numpy as np
+
+from benchmarks.common import app_client, timed
+
+UPLOAD_BLOCK = 64 * 1024
+
+
+def partner_csv(partners: int) -> bytes:
+    rng = np.random.default_rng(0)
+    investment = np.round(rng.uniform(100, 1000000, partners), 2)
+    ratio = rng.integers(1, 10, partners)
+    lines = (f'"Partner, {i}",{v},{r}\n' for i, v, r in zip(range(partners), investment.tolist(), ratio.tolist()))
+    return ("name,investment,profit_ratio\n" + "".join(lines)).encode()
+
+
+async def main(partners: int):
+    body = partner_csv(partners)
+    print(f"upload: {len(body) / 1e6:.1f} MB")
+
+    async def upload():
+        for start in range(0, len(body), UPLOAD_BLOCK):
+            yield body[start:start + UPLOAD_BLOCK]
+
+    async with app_client() as client:
+        for fmt in ("csv", "json"):
+            with timed(f"{partners:,} partners, {fmt} output", partners):
+                response = await client.post(
+                    f"/api/business-partnership-split/csv?amount=1234567.89&format={fmt}",
+                    content=upload()
+                )
+            print(response.status_code, f"{len(response.content) / 1e6:.1f} MB out")
+
+
+if __name__ == "__main__":
+    asyncio.run(main(int(sys.argv[1]) if len(sys.argv) > 1 else 1000000))
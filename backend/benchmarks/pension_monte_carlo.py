@@ -0,0 +1,60 @@
+"""
+Monte Carlo pension simulation: the engine run inline and in the process pool,
+and the /pension-planner/simulate endpoint.
+
+    python -m benchmarks.pension_monte_carlo [paths] [years]
+"""
+import asyncio
+import sys
+
+from benchmarks.common import app_client, timed
+
+PLAN = {
+    "current_age": 30,
+    "monthly_contribution": 25000,
+    "expected_return_rate": 9,
+    "inflation_rate": 6,
+    "return_volatility": 15,
+    "inflation_volatility": 1.5,
+    "target_corpus": 20000000,
+    "seed": 1
+}
+
+
+async def main(paths: int, years: int):
+    from app.services import pension_simulation as simulation
+
+    params = dict(
+        years=years,
+        monthly_contribution=PLAN["monthly_contribution"],
+        annual_return=PLAN["expected_return_rate"] / 100,
+        annual_volatility=PLAN["return_volatility"] / 100,
+        annual_inflation=PLAN["inflation_rate"] / 100,
+        inflation_volatility=PLAN["inflation_volatility"] / 100
+    )
+    threshold = simulation.PENSION_MC_PARALLEL_THRESHOLD
+    simulation.PENSION_MC_PARALLEL_THRESHOLD = paths
+    with timed(f"simulate_paths inline, {paths:,} paths x {years} years", paths):
+        await simulation.simulate_paths(paths, 1, **params)
+    simulation.PENSION_MC_PARALLEL_THRESHOLD = threshold
+
+    async with app_client() as client:
+        print(f"pool: {simulation.PENSION_MC_WORKERS} workers, {simulation.PENSION_MC_CHUNK_PATHS:,} paths per chunk")
+        # The first pooled run also starts the worker processes
+        for run in ("cold", "warm"):
+            with timed(f"/pension-planner/simulate ({run}), {paths:,} paths", paths):
+                response = await client.post("/api/pension-planner/simulate", json={
+                    **PLAN,
+                    "retirement_age": PLAN["current_age"] + years,
+                    "paths": paths
+                })
+            body = response.json()
+            print(response.status_code, f"median {body['final']['p50']:,.0f}, P(target) {body['probability_of_target']}")
+    simulation.shutdown_simulation_pool()
+
+
+if __name__ == "__main__":
+    asyncio.run(main(
+        int(sys.argv[1]) if len(sys.argv) > 1 else 1000000,
+        int(sys.argv[2]) if len(sys.argv) > 2 else 30
+    ))
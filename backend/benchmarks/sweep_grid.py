@@ -0,0 +1,48 @@
+"""
+Sweep a leasing and a murabaha grid of about 100k cells, with full columnar output
+and with top_k, and report the wall time of each request.
+
+    python -m benchmarks.sweep_grid [cells]
+"""
+import asyncio
+import sys
+
+from benchmarks.common import app_client, timed
+
+
+def leasing_grid(cells: int) -> dict:
+    # 50 terms x 20 residuals x 10 rates x (cells / 10,000) down payments
+    down_payments = max(cells // 10000, 1)
+    return {
+        "vehicle_price": 5000000,
+        "lease_term_months": {"start": 12, "stop": 61, "step": 1},
+        "residual_value_percentage": {"start": 30, "stop": 68, "step": 2},
+        "interest_rate": {"start": 5, "stop": 14, "step": 1},
+        "down_payment": {"start": 0, "stop": 50000 * (down_payments - 1), "step": 50000}
+    }
+
+
+def murabaha_grid(cells: int) -> dict:
+    # 120 terms x 4 frequencies x (cells / 480) margins
+    margins = max(cells // 480, 1)
+    return {
+        "asset_cost": 3000000,
+        "payment_term_months": {"start": 1, "stop": 120, "step": 1},
+        "payment_frequency": ["monthly", "quarterly", "semi-annual", "annual"],
+        "profit_margin_percentage": {"start": 0, "stop": 0.1 * (margins - 1), "step": 0.1}
+    }
+
+
+async def main(cells: int):
+    async with app_client() as client:
+        for name, grid in (("leasing", leasing_grid(cells)), ("murabaha", murabaha_grid(cells))):
+            for top_k in (None, 10):
+                request = {**grid, "top_k": top_k} if top_k else grid
+                with timed(f"/sweep/{name}, top_k={top_k}"):
+                    response = await client.post(f"/api/sweep/{name}", json=request)
+                body = response.json()
+                print(response.status_code, f"{body['cells']:,} cells, {len(response.content) / 1e6:.1f} MB out")
+
+
+if __name__ == "__main__":
+    asyncio.run(main(int(sys.argv[1]) if len(sys.argv) > 1 else 100000))
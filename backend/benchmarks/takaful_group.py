@@ -0,0 +1,51 @@
+"""
+Price a streamed employee census with /takaful/group and report throughput for
+each output format. json is capped at GROUP_JSON_MAX_MEMBERS, so it runs on a
+census of at most that size.
+
+    python -m benchmarks.takaful_group [members]
+"""
+import asyncio
+import io
+import sys
+
+import numpy as np
+
+from benchmarks.common import app_client, timed
+
+UPLOAD_BLOCK = 64 * 1024
+HEALTH = np.array(["excellent", "good", "average", "poor"])
+
+
+def census_csv(members: int) -> bytes:
+    rng = np.random.default_rng(0)
+    buffer = io.StringIO()
+    buffer.write("age,coverage_amount,term_years,health_status\n")
+    rows = np.empty((members, 4), dtype=object)
+    rows[:, 0] = rng.integers(18, 66, members)
+    rows[:, 1] = np.round(rng.uniform(100000, 10000000, members), -3)
+    rows[:, 2] = rng.integers(1, 31, members)
+    rows[:, 3] = HEALTH[rng.integers(0, len(HEALTH), members)]
+    np.savetxt(buffer, rows, fmt="%d,%.0f,%d,%s")
+    return buffer.getvalue().encode()
+
+
+async def main(members: int):
+    from app.routes.takaful import GROUP_JSON_MAX_MEMBERS
+
+    async with app_client() as client:
+        for fmt in ("csv", "ndjson", "json"):
+            count = min(members, GROUP_JSON_MAX_MEMBERS) if fmt == "json" else members
+            body = census_csv(count)
+
+            async def upload():
+                for start in range(0, len(body), UPLOAD_BLOCK):
+                    yield body[start:start + UPLOAD_BLOCK]
+
+            with timed(f"{count:,} members, {fmt} output", count):
+                response = await client.post(f"/api/takaful/group?format={fmt}", content=upload())
+            print(response.status_code, f"{len(body) / 1e6:.1f} MB in, {len(response.content) / 1e6:.1f} MB out")
+
+
+if __name__ == "__main__":
+    asyncio.run(main(int(sys.argv[1]) if len(sys.argv) > 1 else 100000))
@@ -0,0 +1,53 @@
+"""
+Zakat for a large roster: the vectorized library function, the columnar
+/zakat/batch endpoint and the /zakat/batch/csv upload.
+
+    python -m benchmarks.zakat_batch [rows]
+"""
+import asyncio
+import io
+import sys
+
+import numpy as np
+
+from benchmarks.common import app_client, timed
+
+RATES = {"gold_rate_per_gram": 20000, "silver_rate_per_gram": 250}
+
+
+def roster(rows: int):
+    rng = np.random.default_rng(0)
+    return {
+        "cash": np.round(rng.uniform(0, 5000000, rows), 2),
+        "gold": np.round(rng.uniform(0, 200, rows), 2),
+        "silver": np.round(rng.uniform(0, 1000, rows), 2),
+        "business_assets": np.round(rng.uniform(0, 2000000, rows), 2),
+        "liabilities": np.round(rng.uniform(0, 1000000, rows), 2)
+    }
+
+
+async def main(rows: int):
+    from app.routes.zakat import calculate_zakat_batch
+
+    columns = roster(rows)
+    with timed(f"calculate_zakat_batch, {rows:,} rows", rows):
+        calculate_zakat_batch(**columns, gold_rate=RATES["gold_rate_per_gram"], silver_rate=RATES["silver_rate_per_gram"])
+
+    buffer = io.StringIO()
+    buffer.write(",".join(columns) + "\n")
+    np.savetxt(buffer, np.column_stack(list(columns.values())), fmt="%.2f", delimiter=",")
+    csv_body = buffer.getvalue().encode()
+    json_body = {**{c: v.tolist() for c, v in columns.items()}, **RATES}
+
+    async with app_client() as client:
+        with timed(f"/zakat/batch, {rows:,} rows", rows):
+            response = await client.post("/api/zakat/batch", json=json_body)
+        print(response.status_code, f"applicable: {response.json()['applicable_count']:,}")
+
+        with timed(f"/zakat/batch/csv, {rows:,} rows ({len(csv_body) / 1e6:.0f} MB)", rows):
+            response = await client.post("/api/zakat/batch/csv", params=RATES, content=csv_body)
+        print(response.status_code, f"applicable: {response.json()['applicable_count']:,}")
+
+
+if __name__ == "__main__":
+    asyncio.run(main(int(sys.argv[1]) if len(sys.argv) > 1 else 1000000))
@@ -0,0 +1,37 @@
+"""
+Shared fixtures. The app is driven in-process through httpx.ASGITransport,
+with every upstream replaced by a local stand-in: price stubs instead of the
+price APIs, no snapshot or history files, and the stub LLM instead of Gemini.
+"""
+import os
+import sys
+from pathlib import Path
+
+# Set before the app is imported: most settings are read at import time
+os.environ.update({
+    "PRICE_PROVIDERS": "local",
+    "PRICE_SNAPSHOT_PATH": "off",
+    "PRICE_HISTORY_DIR": "off",
+    "CHAT_LLM": "stub",
+    "CHAT_STUB_TTFT_SECONDS": "0.05",
+    "CHAT_STUB_TOKEN_INTERVAL_SECONDS": "0",
+    "CHAT_RATE_LIMIT_PER_SECOND": "0",
+    "PRICES_RATE_LIMIT_PER_SECOND": "0"
+})
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import httpx
+import pytest
+
+from app.main import app
+
+
+@pytest.fixture
+def anyio_backend():
+    return "asyncio"
+
+
+@pytest.fixture
+async def client():
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://test", timeout=60) as c:
+        yield c
@@ -0,0 +1,126 @@
+import asyncio
+import time
+
+import numpy as np
+import pytest
+from starlette.requests import ClientDisconnect, Request
+
+from app.routes import chat
+from app.services.admission import (
+    ConcurrencyLimiter,
+    LeasedStreamingResponse,
+    OverloadedError,
+    RateLimiter,
+    client_key,
+    parse_trusted_proxies
+)
+from app.services.llm import StubLLM
+
+pytestmark = pytest.mark.anyio
+
+
+def make_request(peer: str, forwarded: str = None) -> Request:
+    headers = [(b"x-forwarded-for", forwarded.encode())] if forwarded else []
+    return Request({"type": "http", "headers": headers, "client": (peer, 1234)})
+
+
+async def test_limiter_sheds_when_queue_is_full():
+    limiter = ConcurrencyLimiter("test", max_concurrency=1, max_queue=1, queue_budget=1.0)
+    await limiter.acquire()
+    queued = asyncio.ensure_future(limiter.acquire())
+    await asyncio.sleep(0)
+
+    with pytest.raises(OverloadedError):
+        await limiter.acquire()
+
+    limiter.release()
+    await queued
+    limiter.release()
+    assert limiter.stats()["active"] == 0
+
+
+async def test_leased_response_releases_slot_when_body_never_starts():
+    limiter = ConcurrencyLimiter("test", max_concurrency=1, max_queue=0)
+    lease = await limiter.lease()
+    started = False
+
+    async def body():
+        nonlocal started
+        started = True
+        yield "never sent"
+
+    async def receive():
+        return {"type": "http.disconnect"}
+
+    async def send(message):
+        # The client is gone before the response headers go out
+        raise OSError("connection reset")
+
+    response = LeasedStreamingResponse(body(), lease)
+    with pytest.raises((OSError, ClientDisconnect)):
+        await response({"type": "http", "asgi": {"spec_version": "2.4"}}, receive, send)
+
+    assert not started
+    assert limiter.stats()["active"] == 0
+    # The slot is usable again
+    await asyncio.wait_for(limiter.acquire(), 1)
+
+
+async def test_lease_release_is_idempotent():
+    limiter = ConcurrencyLimiter("test", max_concurrency=2)
+    lease = await limiter.lease()
+    lease.release()
+    lease.release()
+    assert limiter.stats()["active"] == 0
+
+
+def test_forwarded_for_ignored_without_trusted_proxy():
+    request = make_request("203.0.113.7", "1.2.3.4")
+    assert client_key(request, trusted=[]) == "203.0.113.7"
+
+
+def test_forwarded_for_uses_rightmost_untrusted_hop():
+    trusted = parse_trusted_proxies("10.0.0.0/8, 127.0.0.1")
+    # The client forged the first hop; the proxy appended the real address
+    request = make_request("10.0.0.5", "6.6.6.6, 198.51.100.9, 10.0.0.2")
+    assert client_key(request, trusted=trusted) == "198.51.100.9"
+    # An untrusted peer cannot choose its identity
+    assert client_key(make_request("198.51.100.9", "6.6.6.6"), trusted=trusted) == "198.51.100.9"
+
+
+def test_rotating_forwarded_for_does_not_escape_rate_limit():
+    limiter = RateLimiter("test", rate=0.001, burst=2)
+    waits = [limiter.take(client_key(make_request("203.0.113.7", f"10.9.{i}.1"), trusted=[])) for i in range(5)]
+    assert waits[:2] == [0, 0]
+    assert all(w > 0 for w in waits[2:])
+    assert limiter.stats()["clients"] == 1
+
+
+async def test_chat_stream_overload_keeps_p99_bounded(client, monkeypatch):
+    """
+    Load test against the stub LLM: 60 concurrent streams for 2 LLM slots and a
+    queue of 4. Admitted requests must finish within the queue budget plus their
+    own service time, shed ones must fail fast with 503 and Retry-After, and no
+    slot may be left held afterwards.
+    """
+    service_time = 0.1
+    queue_budget = 0.5
+    limiter = ConcurrencyLimiter("gemini", max_concurrency=2, max_queue=4, queue_budget=queue_budget)
+    monkeypatch.setattr(chat, "llm_limiter", limiter)
+    monkeypatch.setattr(chat, "_llm", StubLLM(first_token_latency=service_time, token_interval=0))
+
+    async def one(i):
+        started = time.perf_counter()
+        response = await client.post("/api/chat/stream", json={"message": f"load test question {i} about qzx{i}"})
+        return response, time.perf_counter() - started
+
+    results = await asyncio.gather(*(one(i) for i in range(60)))
+    admitted = [t for r, t in results if r.status_code == 200]
+    shed = [(r, t) for r, t in results if r.status_code == 503]
+
+    assert len(admitted) + len(shed) == 60
+    assert admitted and shed
+    assert all("Retry-After" in r.headers for r, _ in shed)
+    assert max(t for _, t in shed) < queue_budget
+    assert np.percentile(admitted, 99) < queue_budget + 2 * service_time + 0.5
+    assert limiter.stats()["active"] == 0
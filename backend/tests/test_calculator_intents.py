@@ -0,0 +1,51 @@
+import pytest
+
+from app.services.calculator_intents import answer_calculator_question, parse_calculator_intent
+
+pytestmark = pytest.mark.anyio
+
+
+@pytest.mark.parametrize("message, name, slots", [
+    ("how much zakat on 200 g gold and 500k cash", "zakat", {"gold": 200, "cash": 500_000}),
+    ("monthly payment on a 3M murabaha over 36 months at 12% margin", "murabaha",
+     {"asset_cost": 3_000_000, "payment_term_months": 36, "profit_margin_percentage": 12}),
+    ("lease on a 5M car for 36 months at 10% with 55% residual", "leasing",
+     {"vehicle_price": 5_000_000, "lease_term_months": 36, "interest_rate": 10,
+      "residual_value_percentage": 55}),
+    ("murabaha for a car costing 2,500,000 over 2.5 years at 8% margin", "murabaha",
+     {"asset_cost": 2_500_000, "payment_term_months": 30, "profit_margin_percentage": 8}),
+])
+def test_calculable_prompts_fill_every_slot(message, name, slots):
+    intent = parse_calculator_intent(message)
+    assert intent.name == name
+    assert intent.missing == []
+    assert {key: intent.slots[key] for key in slots} == slots
+
+
+@pytest.mark.parametrize("message", [
+    "how does leasing work for 3 years?",
+    "is leasing for 3 years halal?",
+    "is ijarah better than murabaha over 5 years at 10%?",
+    "what murabaha margin is normal for 12 months?",
+    "is a 2.5 year murabaha allowed?",
+    "is zakat due after 1 year?",
+    "do I pay zakat on 50k of debts?",
+    "what is nisab in 2024?",
+])
+async def test_open_questions_fall_through(message):
+    assert await answer_calculator_question(message) is None
+
+
+@pytest.mark.parametrize("message", [
+    "murabaha on a 3M car",
+    "lease on a 5M car for 36 months",
+])
+async def test_main_amount_without_other_slots_prompts(message):
+    reply = await answer_calculator_question(message)
+    assert reply.startswith("To run the")
+    assert "For example" in reply
+
+
+async def test_calculable_prompt_is_answered():
+    reply = await answer_calculator_question("lease on a 5M car for 36 months at 10% with 55% residual")
+    assert reply is not None and not reply.startswith("To run the")
@@ -0,0 +1,77 @@
+from types import SimpleNamespace
+
+import pytest
+
+from app.services import chat_cache
+from app.services.chat_cache import ChatResponseCache
+
+pytestmark = pytest.mark.anyio
+
+
+def turn(role: str, text: str):
+    return SimpleNamespace(role=role, text=text)
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = {"t": 1000.0}
+    monkeypatch.setattr(chat_cache.time, "time", lambda: now["t"])
+    return now
+
+
+def test_entries_expire_after_ttl(clock):
+    cache = ChatResponseCache(ttl=60)
+    cache.put("k", "reply")
+    clock["t"] += 59
+    assert cache.get("k") == "reply"
+    clock["t"] += 2
+    assert cache.get("k") is None
+    assert cache.stats()["misses"] == 1
+
+
+def test_least_recently_used_entry_is_evicted():
+    cache = ChatResponseCache(max_entries=2)
+    cache.put("a", "A")
+    cache.put("b", "B")
+    assert cache.get("a") == "A"  # "b" is now the least recently used
+    cache.put("c", "C")
+    assert cache.get("b") is None
+    assert cache.get("a") == "A" and cache.get("c") == "C"
+    assert cache.stats()["evictions"] == 1
+
+
+def test_disk_tier_serves_replies_after_a_restart(tmp_path, clock):
+    path = str(tmp_path / "chat_cache.sqlite")
+    ChatResponseCache(ttl=60, path=path).put("k", "reply")
+
+    restarted = ChatResponseCache(ttl=60, path=path)
+    assert restarted.get("k") == "reply"
+    assert restarted.get("k") == "reply"
+    stats = restarted.stats()
+    assert (stats["disk_hits"], stats["memory_hits"]) == (1, 1)
+
+    # The disk copy expires like the memory one
+    clock["t"] += 61
+    assert ChatResponseCache(ttl=60, path=path).get("k") is None
+
+
+def test_key_depends_on_the_last_two_turns_only():
+    cache = ChatResponseCache(history_turns=2)
+    history = [turn("user", "Hi"), turn("model", "Hello!"), turn("user", "What is zakat?"), turn("model", "A yearly 2.5% levy.")]
+
+    key = cache.make_key("And nisab?", history)
+    assert cache.make_key("and   NISAB", history) == key
+    # An older turn does not matter...
+    assert cache.make_key("And nisab?", [turn("user", "Salam")] + history[1:]) == key
+    # ...but either of the last two does
+    assert cache.make_key("And nisab?", history[:-1] + [turn("model", "Something else.")]) != key
+    assert cache.make_key("And nisab?", history[:2] + [turn("user", "What is riba?"), history[3]]) != key
+    assert cache.make_key("And nisab?") != key
+
+
+async def test_repeated_question_is_served_from_cache(client):
+    body = {"message": "cache test question qzx-cache", "history": [{"role": "user", "text": "earlier qzx"}]}
+    first = (await client.post("/api/chat", json=body)).json()
+    second = (await client.post("/api/chat", json=body)).json()
+    assert (first["source"], second["source"]) == ("llm", "cache")
+    assert second["reply"] == first["reply"]
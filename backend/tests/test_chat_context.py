@@ -0,0 +1,90 @@
+import time
+from types import SimpleNamespace
+
+import numpy as np
+import pytest
+
+from app.routes import chat
+from app.services import chat_context
+from app.services.chat_context import ConversationContext, estimate_tokens
+from app.services.llm import StubLLM
+
+pytestmark = pytest.mark.anyio
+
+SYSTEM = "You are an Islamic finance assistant."
+
+
+def turn(i: int):
+    role = "user" if i % 2 == 0 else "model"
+    return SimpleNamespace(role=role, text=f"Turn {i} asks how murabaha profit is computed. " + "Details follow here. " * 20)
+
+
+def conversation(turns: int):
+    return [turn(i) for i in range(turns)]
+
+
+def test_prompt_stays_within_budget_at_any_length():
+    context = ConversationContext(token_budget=1000, summary_budget=200)
+    history = conversation(200)
+    for n in (0, 1, 10, 50, 200):
+        prompt = context.build_prompt(SYSTEM, history[:n], "And ijarah?", conversation_id="c1")
+        assert estimate_tokens(prompt) <= 1000 + 50
+    assert "Summary of earlier conversation:" in prompt
+    # The newest turn is always kept verbatim
+    assert history[199].text in prompt
+
+
+def test_summary_is_extended_incrementally(monkeypatch):
+    context = ConversationContext(token_budget=1000, summary_budget=200)
+    history = conversation(200)
+    calls = []
+    summarize = chat_context.summarize_turn
+    monkeypatch.setattr(chat_context, "summarize_turn", lambda role, text: calls.append(1) or summarize(role, text))
+
+    for n in range(1, 201):
+        context.build_prompt(SYSTEM, history[:n], "Next question", conversation_id="c1")
+    # Each turn is summarized once over the whole conversation, not once per request
+    assert len(calls) < 200
+
+
+def test_rewritten_history_rebuilds_the_summary():
+    context = ConversationContext(token_budget=600, summary_budget=200)
+    history = conversation(40)
+    context.build_prompt(SYSTEM, history, "q", conversation_id="c1")
+
+    edited = [SimpleNamespace(role="user", text="A different opening question about sukuk.")] + history[1:]
+    prompt = context.build_prompt(SYSTEM, edited, "q", conversation_id="c1")
+    assert prompt == ConversationContext(token_budget=600, summary_budget=200).build_prompt(SYSTEM, edited, "q")
+
+
+def test_per_turn_build_time_is_flat_to_200_turns():
+    context = ConversationContext()
+    history = conversation(200)
+    timings = []
+    for n in range(1, 201):
+        started = time.perf_counter()
+        context.build_prompt(SYSTEM, history[:n], "Next question", conversation_id="c1")
+        timings.append(time.perf_counter() - started)
+
+    early = np.median(timings[20:40])
+    late = np.median(timings[180:200])
+    assert late < 3 * early + 0.0005
+
+
+async def test_chat_latency_is_flat_to_200_turns(client, monkeypatch):
+    monkeypatch.setattr(chat, "_llm", StubLLM(first_token_latency=0, token_interval=0))
+    history = []
+    latencies = []
+    for i in range(200):
+        started = time.perf_counter()
+        response = await client.post("/api/chat", json={
+            "message": f"Question {i} about qzx{i}",
+            "history": history,
+            "conversation_id": "flat-latency"
+        })
+        latencies.append(time.perf_counter() - started)
+        assert response.status_code == 200
+        history += [{"role": "user", "text": turn(2 * i).text}, {"role": "model", "text": turn(2 * i + 1).text}]
+
+    # The history grows tenfold; the request time must not grow with it
+    assert np.median(latencies[180:]) < 3 * np.median(latencies[20:40]) + 0.005
@@ -0,0 +1,69 @@
+import asyncio
+import json
+import time
+
+import pytest
+
+from app.routes import chat
+from app.services.admission import ConcurrencyLimiter
+from app.services.llm import StubLLM
+
+pytestmark = pytest.mark.anyio
+
+TTFT = 0.1
+TOKEN_INTERVAL = 0.01
+
+
+@pytest.fixture
+def stub_llm(monkeypatch):
+    llm = StubLLM(first_token_latency=TTFT, token_interval=TOKEN_INTERVAL)
+    monkeypatch.setattr(chat, "_llm", llm)
+    monkeypatch.setattr(chat, "llm_limiter", ConcurrencyLimiter("gemini", max_concurrency=64))
+    return llm
+
+
+async def timed_stream(message: str):
+    """Drive /chat/stream in-process: (time to first text event, total time, events)"""
+    started = time.perf_counter()
+    response = await chat.chat_stream(chat.ChatRequest(message=message))
+    first = None
+    events = []
+    async for chunk in response.body_iterator:
+        if first is None:
+            first = time.perf_counter() - started
+        events.append(chunk)
+    return first, time.perf_counter() - started, events
+
+
+async def test_stream_sends_tokens_as_they_are_generated(stub_llm):
+    ttft, total, events = await timed_stream("stream test question qzx1")
+
+    texts = [json.loads(e.split("data: ", 1)[1])["text"] for e in events[:-1]]
+    assert "".join(texts) == stub_llm.reply
+    assert events[-1].startswith("event: done")
+    # The first token arrives long before the reply is complete
+    assert TTFT <= ttft < TTFT + 0.1
+    assert total - ttft >= (len(texts) - 1) * TOKEN_INTERVAL
+
+
+async def test_concurrent_streams_do_not_queue_behind_each_other(stub_llm):
+    results = await asyncio.gather(*(timed_stream(f"concurrent question qzx{i}") for i in range(32)))
+    ttfts = [r[0] for r in results]
+    # 32 streams in flight at once: each still sees roughly the stub's own latency
+    assert max(ttfts) < TTFT + 0.2
+    assert chat.llm_limiter.stats()["active"] == 0
+
+
+async def test_model_handle_is_built_once(client, stub_llm, monkeypatch):
+    built = []
+
+    def create_llm(api_key):
+        built.append(api_key)
+        return stub_llm
+
+    monkeypatch.setattr(chat, "_llm", None)
+    monkeypatch.setattr(chat, "create_llm", create_llm)
+    for i in range(3):
+        response = await client.post("/api/chat/stream", json={"message": f"handle question qzx{i}"})
+        assert response.status_code == 200
+    assert len(built) == 1
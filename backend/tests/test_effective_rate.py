@@ -0,0 +1,103 @@
+import numpy as np
+import pytest
+
+from app.services.irr import IRR_MAX_PERIODS, payment_flows, solve_irr
+
+pytestmark = pytest.mark.anyio
+
+MURABAHA = {"asset_cost": 100000, "profit_margin_percentage": 10, "payment_term_months": 36}
+ISTISNA = {
+    "manufacturing_cost": 100000,
+    "profit_margin_percentage": 10,
+    "delivery_period_months": 12,
+    "payment_schedule": "monthly",
+    "advance_payment": 10000,
+    "additional_costs": 0
+}
+
+
+def test_solve_irr_recovers_known_rate():
+    # 1000 lent against 12 payments at 1% a month
+    payment = 1000 * 0.01 / (1 - 1.01 ** -12)
+    flows = payment_flows(1000.0, payment, 12, 1)
+    assert solve_irr(flows)[0] == pytest.approx(0.01, abs=1e-9)
+
+
+def test_payment_flows_rejects_negative_and_oversized_terms():
+    with pytest.raises(ValueError):
+        payment_flows(1000.0, 100.0, -12, 1)
+    with pytest.raises(ValueError):
+        payment_flows(1000.0, 100.0, IRR_MAX_PERIODS + 1, 1)
+
+
+async def test_batch_matches_single_contract_rates(client):
+    contracts = [dict(MURABAHA, payment_term_months=term) for term in (12, 36, 60)]
+    single = [(await client.post("/api/murabaha", json=c)).json()["effective_annual_rate"] for c in contracts]
+    batch = (await client.post("/api/murabaha/effective-rate", json={"contracts": contracts})).json()
+    assert batch["effective_annual_rate"] == single
+
+    single = (await client.post("/api/istisna", json=ISTISNA)).json()["effective_annual_rate"]
+    batch = (await client.post("/api/istisna/effective-rate", json={"contracts": [ISTISNA]})).json()
+    assert batch["effective_annual_rate"] == [single]
+
+
+@pytest.mark.parametrize("term", [-12, 0])
+async def test_murabaha_rejects_bad_terms(client, term):
+    for path, body in (
+        ("/api/murabaha", dict(MURABAHA, payment_term_months=term)),
+        ("/api/murabaha/effective-rate", {"contracts": [MURABAHA, dict(MURABAHA, payment_term_months=term)]}),
+        ("/api/murabaha/schedule", dict(MURABAHA, payment_term_months=term))
+    ):
+        response = await client.post(path, json=body)
+        assert response.status_code == 400, path
+        assert "payment_term_months" in response.json()["detail"]
+
+
+@pytest.mark.parametrize("months", [-6, 0])
+async def test_istisna_rejects_bad_delivery_periods(client, months):
+    for path, body in (
+        ("/api/istisna", dict(ISTISNA, delivery_period_months=months)),
+        ("/api/istisna/effective-rate", {"contracts": [dict(ISTISNA, delivery_period_months=months)]})
+    ):
+        response = await client.post(path, json=body)
+        assert response.status_code == 400, path
+        assert "delivery_period_months" in response.json()["detail"]
+
+
+async def test_single_quotes_past_the_solver_grid_have_no_effective_rate(client):
+    long_term = IRR_MAX_PERIODS + 12
+    for path, body in (
+        ("/api/murabaha", dict(MURABAHA, payment_term_months=long_term)),
+        ("/api/istisna", dict(ISTISNA, delivery_period_months=long_term)),
+        ("/api/leasing", {"vehicle_price": 5000000, "lease_term_months": long_term, "interest_rate": 8})
+    ):
+        response = await client.post(path, json=body)
+        assert response.status_code == 200, path
+        assert response.json()["effective_annual_rate"] is None, path
+
+    response = await client.post("/api/murabaha/schedule", json=dict(MURABAHA, payment_term_months=long_term))
+    assert response.status_code == 200
+    assert response.json()["number_of_payments"] == long_term
+
+
+async def test_batches_reject_terms_past_the_solver_grid(client):
+    long_term = IRR_MAX_PERIODS + 1
+    for path, body, field in (
+        ("/api/murabaha/effective-rate", {"contracts": [MURABAHA, dict(MURABAHA, payment_term_months=long_term)]}, "payment_term_months"),
+        ("/api/istisna/effective-rate", {"contracts": [dict(ISTISNA, delivery_period_months=long_term)]}, "delivery_period_months"),
+        ("/api/leasing/effective-rate", {"vehicles": [{"vehicle_price": 5000000, "lease_term_months": long_term, "interest_rate": 8}]}, "lease_term_months")
+    ):
+        response = await client.post(path, json=body)
+        assert response.status_code == 400, path
+        assert field in response.json()["detail"]
+
+
+async def test_vectorized_rates_stay_finite_across_many_contracts(client):
+    rng = np.random.default_rng(7)
+    contracts = [
+        dict(MURABAHA, payment_term_months=int(t), profit_margin_percentage=float(m))
+        for t, m in zip(rng.integers(1, 121, 500), rng.uniform(0, 40, 500))
+    ]
+    result = (await client.post("/api/murabaha/effective-rate", json={"contracts": contracts})).json()
+    assert result["count"] == 500
+    assert all(r is not None and r >= 0 for r in result["effective_annual_rate"])
@@ -0,0 +1,90 @@
+import json
+
+import numpy as np
+import pytest
+
+from app.routes import leasing
+
+pytestmark = pytest.mark.anyio
+
+VEHICLES = [
+    {"vehicle_price": 5000000, "lease_term_months": 36, "residual_value_percentage": 55, "interest_rate": 10},
+    {"vehicle_price": 3200000, "down_payment": 400000, "lease_term_months": 24, "money_factor": 0.0035},
+    {"vehicle_price": 8000000, "trade_in_value": 1000000, "lease_term_months": 48, "interest_rate": 12, "sales_tax_rate": 5},
+    {"vehicle_price": 2500000, "lease_term_months": 12, "residual_value_percentage": 70, "interest_rate": 0},
+    {"vehicle_price": 6100000, "lease_term_months": 60, "residual_value_percentage": 40, "money_factor": 0.002},
+]
+
+
+@pytest.fixture
+def small_chunks(monkeypatch):
+    monkeypatch.setattr(leasing, "SCHEDULE_CHUNK_VEHICLES", 2)
+
+
+def parse_csv(text):
+    lines = text.splitlines()
+    assert lines[0] == ",".join(leasing.LEASE_SCHEDULE_COLUMNS)
+    return [dict(zip(leasing.LEASE_SCHEDULE_COLUMNS, map(float, line.split(",")))) for line in lines[1:]]
+
+
+async def check_rows_match_single_leases(client, rows):
+    assert len(rows) == sum(v["lease_term_months"] for v in VEHICLES)
+    for index, vehicle in enumerate(VEHICLES):
+        single = (await client.post("/api/leasing", json=vehicle)).json()
+        own = [r for r in rows if r["vehicle"] == index]
+        assert [r["month"] for r in own] == list(range(1, vehicle["lease_term_months"] + 1))
+        for row in own:
+            assert row["payment"] == pytest.approx(single["monthly_payment"], abs=0.01)
+            assert row["depreciation"] == pytest.approx(single["depreciation_payment"], abs=0.01)
+            assert row["rent_charge"] == pytest.approx(single["finance_payment"], abs=0.01)
+            assert row["tax"] == pytest.approx(single["monthly_tax"], abs=0.01)
+        # The capitalized balance runs down to the residual value
+        assert own[-1]["remaining_balance"] == pytest.approx(single["residual_value"], abs=0.01)
+        assert own[-1]["cumulative_paid"] == pytest.approx(single["total_of_payments"], abs=0.05)
+
+
+@pytest.mark.parametrize("fmt", ["csv", "ndjson"])
+async def test_streamed_schedule_matches_single_leases(client, small_chunks, fmt):
+    response = await client.post(f"/api/leasing/schedule?format={fmt}", json={"vehicles": VEHICLES})
+    assert response.status_code == 200
+    if fmt == "csv":
+        rows = parse_csv(response.text)
+    else:
+        rows = [json.loads(line) for line in response.text.splitlines()]
+    await check_rows_match_single_leases(client, rows)
+
+
+async def test_csv_upload_streams_the_same_schedule(client, small_chunks):
+    columns = ["vehicle_price", "down_payment", "trade_in_value", "lease_term_months",
+               "residual_value_percentage", "money_factor", "interest_rate", "sales_tax_rate"]
+    # A missing rate is NaN, the same as leaving the column out
+    defaults = {"down_payment": 0, "trade_in_value": 0, "residual_value_percentage": 60, "sales_tax_rate": 0}
+    body = ",".join(columns) + "\n" + "".join(
+        ",".join(str(v.get(c, defaults.get(c, "nan"))) for c in columns) + "\n" for v in VEHICLES
+    )
+    streamed = await client.post("/api/leasing/schedule/csv", content=body)
+    from_json = await client.post("/api/leasing/schedule?format=csv", json={"vehicles": VEHICLES})
+    assert streamed.text == from_json.text
+
+
+def test_chunks_split_on_vehicle_boundaries(small_chunks):
+    fleet = {
+        "vehicle_price": np.array([v["vehicle_price"] for v in VEHICLES], dtype=np.float64),
+        "down_payment": np.zeros(5),
+        "trade_in_value": np.zeros(5),
+        "lease_term_months": np.array([v["lease_term_months"] for v in VEHICLES]),
+        "residual_value_percentage": np.full(5, 60.0),
+        "money_factor": np.full(5, 0.003),
+        "sales_tax_rate": np.zeros(5)
+    }
+    chunks = list(leasing.iter_schedule_chunks(fleet))
+    assert [sorted(set(c["vehicle"].tolist())) for c in chunks] == [[0, 1], [2, 3], [4]]
+    for chunk in chunks:
+        # Every chunk holds whole leases: each vehicle runs from month 1 to its term
+        for vehicle in set(chunk["vehicle"].tolist()):
+            months = chunk["month"][chunk["vehicle"] == vehicle]
+            assert months.tolist() == list(range(1, VEHICLES[vehicle]["lease_term_months"] + 1))
+
+    pieces = list(leasing.stream_schedule(fleet, "csv"))
+    assert len(pieces) == 1 + len(chunks)
+    assert all(piece.endswith("\n") for piece in pieces)
@@ -0,0 +1,42 @@
+import pytest
+
+pytestmark = pytest.mark.anyio
+
+POOL = {
+    "period_start": "2025-01-01",
+    "period_end": "2025-01-31",
+    "total_revenue": 1000,
+    "total_expenses": 0,
+    "rabbul_mal_profit_ratio": 60,
+    "mudarib_profit_ratio": 40,
+    "tier_weights": [1.0, 2.0],
+    "account": [1, 2, 2],
+    "tier": [0, 1, 1],
+    "date": ["2024-12-15", "2025-01-01", "2025-01-16"],
+    "amount": [1000, 500, -500]
+}
+
+
+async def test_pool_profit_is_fully_distributed(client):
+    response = await client.post("/api/mudarabah/pool", json=POOL)
+    assert response.status_code == 200
+    result = response.json()
+    assert result["depositors_profit_share"] == 600
+    assert sum(result["account_results"]["profit_share"]) == pytest.approx(600)
+
+
+@pytest.mark.parametrize("changes", [
+    {"date": ["2025-02-01", "2025-02-02", "2025-03-01"]},
+    {"tier_weights": [0.0, 0.0]}
+])
+async def test_pool_without_weighted_capital_is_rejected(client, changes):
+    response = await client.post("/api/mudarabah/pool", json={**POOL, **changes})
+    assert response.status_code == 400
+    assert "No weighted depositor capital" in response.json()["detail"]
+
+
+async def test_pool_loss_without_depositor_capital_falls_on_the_mudarib(client):
+    body = {**POOL, "date": ["2025-02-01"] * 3, "total_revenue": 0, "total_expenses": 300, "mudarib_investment": 1000}
+    result = (await client.post("/api/mudarabah/pool", json=body)).json()
+    assert result["depositors_loss_share"] == 0
+    assert result["mudarib_loss_share"] == 300
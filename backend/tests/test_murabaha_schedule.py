@@ -0,0 +1,32 @@
+import pytest
+
+pytestmark = pytest.mark.anyio
+
+CONTRACT = {
+    "asset_cost": 100000,
+    "profit_margin_percentage": 10,
+    "payment_term_months": 12,
+    "start_date": "2025-01-31"
+}
+
+
+async def test_settlement_quotes_match_the_schedule(client):
+    response = await client.post("/api/murabaha/schedule", json=dict(CONTRACT, settle_after=[0, 6, 12]))
+    assert response.status_code == 200
+    result = response.json()
+    quotes = result["settlement_quotes"]
+    assert quotes["paid_installments"] == [0, 6, 12]
+    amounts = result["early_settlement"]["amount"]
+    assert quotes["settlement_amount"] == [amounts[0], amounts[6], amounts[12]]
+    assert quotes["settlement_amount"][-1] == 0
+
+
+async def test_empty_settle_after_returns_no_quotes(client):
+    response = await client.post("/api/murabaha/schedule", json=dict(CONTRACT, settle_after=[]))
+    assert response.status_code == 200
+    assert all(v == [] for v in response.json()["settlement_quotes"].values())
+
+
+async def test_settle_after_out_of_range_is_rejected(client):
+    response = await client.post("/api/murabaha/schedule", json=dict(CONTRACT, settle_after=[13]))
+    assert response.status_code == 400
@@ -0,0 +1,136 @@
+import csv
+import io
+
+import pytest
+
+from app.routes import partnership
+
+pytestmark = pytest.mark.anyio
+
+DIMINISHING = {
+    "property_value": 500000,
+    "customer_contribution": 100000,
+    "term_months": 120,
+    "annual_rental_rate": 5
+}
+
+
+async def test_diminishing_musharakah_quotes_match_the_schedule(client):
+    response = await client.post("/api/diminishing-musharakah/schedule", json=dict(DIMINISHING, quote_after=[0, 120]))
+    assert response.status_code == 200
+    result = response.json()
+    quotes = result["quotes"]
+    assert quotes["elapsed_periods"] == [0, 120]
+    assert quotes["early_buyout_amount"] == [result["bank_share"], 0]
+    assert quotes["customer_percentage"][-1] == 100
+
+
+@pytest.mark.parametrize("current_property_value", [None, 550000])
+async def test_empty_quote_after_returns_no_quotes(client, current_property_value):
+    body = dict(DIMINISHING, quote_after=[], current_property_value=current_property_value)
+    response = await client.post("/api/diminishing-musharakah/schedule", json=body)
+    assert response.status_code == 200
+    assert all(v == [] for v in response.json()["quotes"].values())
+
+
+# Bank share 120,000 bought back in three annual payments, rent 10% a year
+SMALL_CONTRACT = {
+    "property_value": 130000,
+    "customer_contribution": 10000,
+    "term_months": 36,
+    "annual_rental_rate": 10,
+    "payment_frequency": "annual"
+}
+
+
+async def test_level_schedule_matches_hand_computed_values(client):
+    # Payment = 120,000 x 0.1 / (1 - 1.1^-3) = 15,972 / 0.331 = 48,253.78
+    # Rent is 10% of the bank's share before each payment; the rest buys units
+    response = await client.post("/api/diminishing-musharakah/schedule", json=SMALL_CONTRACT)
+    result = response.json()
+    schedule = result["schedule"]
+    assert schedule["payment"] == [48253.78] * 3
+    assert schedule["rent"] == [12000.0, 8374.62, 4386.71]
+    assert schedule["buyout"] == [36253.78, 39879.15, 43867.07]
+    assert schedule["bank_share"] == [83746.22, 43867.07, 0]
+    assert schedule["bank_percentage"] == [64.42, 33.74, 0]
+    assert result["total_rent"] == 24761.33
+
+
+async def test_equal_units_schedule_matches_hand_computed_values(client):
+    # 40,000 bought each year; rent 10% of 120,000, 80,000 and 40,000
+    response = await client.post(
+        "/api/diminishing-musharakah/schedule",
+        json=dict(SMALL_CONTRACT, payment_structure="equal_units")
+    )
+    result = response.json()
+    schedule = result["schedule"]
+    assert schedule["buyout"] == [40000.0] * 3
+    assert schedule["rent"] == [12000.0, 8000.0, 4000.0]
+    assert schedule["payment"] == [52000.0, 48000.0, 44000.0]
+    assert schedule["bank_share"] == [80000.0, 40000.0, 0]
+    assert result["total_rent"] == 24000
+
+
+@pytest.mark.parametrize("structure", ["level", "equal_units"])
+async def test_portfolio_positions_match_schedule_rows(client, structure):
+    contract = dict(DIMINISHING, payment_structure=structure)
+    elapsed = [0, 1, 37, 119, 120]
+    schedule = (await client.post("/api/diminishing-musharakah/schedule", json=contract)).json()
+    portfolio = (await client.post("/api/diminishing-musharakah/portfolio", json={
+        "contracts": [dict(contract, elapsed_periods=k) for k in elapsed]
+    })).json()
+
+    rows = schedule["schedule"]
+    bank_share = [schedule["bank_share"]] + rows["bank_share"]
+    rent_paid = [0.0]
+    for rent in rows["rent"]:
+        rent_paid.append(rent_paid[-1] + rent)
+
+    positions = portfolio["contracts"]
+    assert positions["early_buyout_amount"] == pytest.approx([bank_share[k] for k in elapsed], abs=0.01)
+    assert positions["rent_paid"] == pytest.approx([rent_paid[k] for k in elapsed], abs=0.05)
+    assert positions["first_payment"] == pytest.approx([rows["payment"][0]] * len(elapsed), abs=0.01)
+    assert positions["total_rent"] == pytest.approx([schedule["total_rent"]] * len(elapsed), abs=0.01)
+
+
+PARTNERS_CSV = 'name,investment,profit_ratio\n"Smith, John",600,1\nAmina,400,1\n"Said ""Sam"" Ali",0,0\n'
+
+
+async def test_split_csv_keeps_quoted_names(client):
+    response = await client.post("/api/business-partnership-split/csv?format=json&amount=100", content=PARTNERS_CSV)
+    assert response.status_code == 200
+    split = response.json()["split"]
+    assert [p["name"] for p in split] == ["Smith, John", "Amina", 'Said "Sam" Ali']
+    assert [p["percentage"] for p in split] == [60, 40, 0]
+    assert [p["amount"] for p in split] == [50, 50, 0]
+
+
+async def test_split_csv_output_round_trips_quoted_names(client):
+    response = await client.post("/api/business-partnership-split/csv", content=PARTNERS_CSV)
+    assert response.status_code == 200
+    rows = list(csv.DictReader(io.StringIO(response.text)))
+    assert [r["name"] for r in rows] == ["Smith, John", "Amina", 'Said "Sam" Ali']
+
+
+async def test_split_csv_is_read_in_chunks(client, monkeypatch):
+    monkeypatch.setattr(partnership, "SPLIT_CHUNK_PARTNERS", 7)
+    body = "name,investment\n" + "".join(f'"Partner, {i}",{i + 1}\n' for i in range(100))
+
+    async def upload():
+        # Several body messages, split mid-row
+        data = body.encode()
+        for start in range(0, len(data), 50):
+            yield data[start:start + 50]
+
+    response = await client.post("/api/business-partnership-split/csv?format=json&precision=4", content=upload())
+    assert response.status_code == 200
+    split = response.json()["split"]
+    assert [p["name"] for p in split] == [f"Partner, {i}" for i in range(100)]
+    assert sum(round(p["percentage"] * 10000) for p in split) == 100 * 10000
+
+
+@pytest.mark.parametrize("body", ["name\nAmina\n", "name,investment\nAmina,abc\n", "name,investment,profit_ratio\nA,1,1\nB,1,\n"])
+async def test_split_csv_rejects_bad_uploads(client, body):
+    response = await client.post("/api/business-partnership-split/csv", content=body)
+    assert response.status_code == 400
@@ -0,0 +1,86 @@
+import pytest
+
+pytestmark = pytest.mark.anyio
+
+
+@pytest.mark.parametrize("contribution, rate, inflation, years", [
+    (1000, 10, 0, 30),
+    (2500, 8, 3, 25),
+    (750, 6.5, 2.5, 40),
+    (100, 0.5, 0, 1)
+])
+async def test_retirement_age_round_trips_planner_future_value(client, contribution, rate, inflation, years):
+    planned = (await client.post("/api/pension-planner", json={
+        "current_age": 30,
+        "retirement_age": 30 + years,
+        "monthly_contribution": contribution,
+        "expected_return_rate": rate,
+        "inflation_rate": inflation
+    })).json()
+
+    # The planner's future_value is rounded to the cent, possibly up
+    response = await client.post("/api/pension-planner/retirement-age", json={
+        "current_age": 30,
+        "target_corpus": planned["future_value"],
+        "monthly_contribution": contribution,
+        "expected_return_rate": rate,
+        "inflation_rate": inflation
+    })
+    assert response.status_code == 200
+    result = response.json()
+    assert result["retirement_age"] == 30 + years
+    assert result["years_needed"] == years
+
+
+async def test_planner_handles_a_zero_return(client):
+    response = await client.post("/api/pension-planner", json={
+        "current_age": 40,
+        "retirement_age": 50,
+        "monthly_contribution": 1000,
+        "expected_return_rate": 0,
+        "inflation_rate": 0
+    })
+    assert response.status_code == 200
+    assert response.json()["future_value"] == 120000
+
+
+async def test_simulation_rejects_grids_over_max_cells(client, monkeypatch):
+    from app.routes import pension
+
+    monkeypatch.setattr(pension, "PENSION_MC_MAX_CELLS", 1000)
+    request = {"current_age": 30, "retirement_age": 40, "monthly_contribution": 1000, "expected_return_rate": 8}
+    response = await client.post("/api/pension-planner/simulate", json={**request, "paths": 101})
+    assert response.status_code == 400
+    assert "1000" in response.json()["detail"]
+
+    response = await client.post("/api/pension-planner/simulate", json={**request, "paths": 100, "seed": 1})
+    assert response.status_code == 200
+
+
+async def test_seeded_simulation_is_the_same_inline_and_in_the_pool(monkeypatch):
+    from app.services import pension_simulation as simulation
+
+    monkeypatch.setattr(simulation, "PENSION_MC_CHUNK_PATHS", 400)
+    assert simulation._chunk_sizes(1000) == [400, 400, 200]
+
+    params = dict(
+        years=5,
+        monthly_contribution=1000,
+        annual_return=0.08,
+        annual_volatility=0.15,
+        annual_inflation=0.03,
+        inflation_volatility=0.01
+    )
+    monkeypatch.setattr(simulation, "PENSION_MC_PARALLEL_THRESHOLD", 10 ** 9)
+    inline = await simulation.simulate_paths(1000, 7, **params)
+
+    monkeypatch.setattr(simulation, "PENSION_MC_PARALLEL_THRESHOLD", 0)
+    monkeypatch.setattr(simulation, "PENSION_MC_WORKERS", 2)
+    try:
+        pooled = await simulation.simulate_paths(1000, 7, **params)
+        assert simulation._pool is not None
+    finally:
+        simulation.shutdown_simulation_pool()
+
+    assert inline.shape == pooled.shape == (5, 1000)
+    assert (inline == pooled).all()
@@ -0,0 +1,60 @@
+import asyncio
+
+import pytest
+
+from app.services.price_providers import CallableProvider, ProviderRegistry
+
+pytestmark = pytest.mark.anyio
+
+COOLDOWN = 0.05
+
+
+def answering(value, delay: float = 0):
+    async def fetch():
+        await asyncio.sleep(delay)
+        return value
+    return fetch
+
+
+def make_registry(primary, fallback) -> ProviderRegistry:
+    registry = ProviderRegistry(budget=1.0, hedge_delay=0.2, failure_threshold=1, cooldown=COOLDOWN)
+    registry.register(CallableProvider("primary", "metals", primary))
+    registry.register(CallableProvider("fallback", "metals", fallback))
+    return registry
+
+
+async def test_half_open_fallback_is_not_held_when_primary_wins():
+    primary = {"value": "primary"}
+    registry = make_registry(lambda: answering(primary["value"])(), answering("fallback"))
+    registry.breakers["fallback"].record_failure()
+    assert registry.breakers["fallback"].state == "open"
+    await asyncio.sleep(COOLDOWN * 1.5)
+
+    # Primary wins; the fallback is never started, so it must not use up its trial
+    assert await registry.race("metals") == "primary"
+    assert registry.breakers["fallback"].state == "half-open"
+
+    # The primary now fails, and the half-open fallback gets its trial call
+    primary["value"] = None
+    assert await registry.race("metals") == "fallback"
+    assert registry.breakers["fallback"].state == "closed"
+
+
+async def test_trial_is_given_back_when_race_is_cancelled():
+    registry = make_registry(answering(None), answering("fallback", delay=10))
+    registry.breakers["fallback"].record_failure()
+    await asyncio.sleep(COOLDOWN * 1.5)
+
+    race = asyncio.ensure_future(registry.race("metals"))
+    await asyncio.sleep(0.05)
+    race.cancel()
+    with pytest.raises(asyncio.CancelledError):
+        await race
+
+    assert registry.breakers["fallback"].allow()
+
+
+async def test_open_providers_are_skipped():
+    registry = make_registry(answering("primary"), answering("fallback"))
+    registry.breakers["primary"].record_failure()
+    assert await registry.race("metals") == "fallback"
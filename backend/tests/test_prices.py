@@ -0,0 +1,103 @@
+import asyncio
+import time
+
+import httpx
+import numpy as np
+import pytest
+
+from app.routes import prices
+from app.services.fx import FxTable
+from app.services.price_client import PriceClient, set_price_client
+
+pytestmark = pytest.mark.anyio
+
+ZAKAT = {
+    "cash": 500000,
+    "gold": 100,
+    "silver": 0,
+    "business_assets": 0,
+    "liabilities": 0,
+    "gold_rate_per_gram": 20000,
+    "silver_rate_per_gram": 250
+}
+
+
+@pytest.fixture
+def upstream(monkeypatch):
+    """
+    Point the live provider chain at a stub transport; yields a setter for the
+    request handler. The local file providers are restored afterwards.
+    """
+    handler = {"fn": None}
+
+    async def dispatch(request: httpx.Request) -> httpx.Response:
+        return await handler["fn"](request)
+
+    monkeypatch.setenv("PRICE_PROVIDERS", "upstream")
+    monkeypatch.setenv("GOLD_API_KEY", "test")
+    monkeypatch.setattr(prices.price_providers, "budget", 1.0)
+    monkeypatch.setattr(prices.price_providers, "hedge_delay", 0.2)
+    prices.configure_price_providers(prices.price_providers)
+    set_price_client(PriceClient(transport=httpx.MockTransport(dispatch)))
+    prices.metal_price_cache.invalidate()
+    prices.fx_rate_cache.invalidate()
+
+    yield lambda fn: handler.update(fn=fn)
+
+    monkeypatch.undo()
+    prices.configure_price_providers(prices.price_providers)
+    set_price_client(None)
+    prices.metal_price_cache.invalidate()
+    prices.fx_rate_cache.invalidate()
+
+
+async def test_calculator_latency_stays_flat_while_a_provider_hangs(client, upstream):
+    async def hang(request):
+        await asyncio.Event().wait()
+
+    upstream(hang)
+    price_request = asyncio.ensure_future(client.get("/api/prices/metals"))
+    await asyncio.sleep(0.05)
+
+    latencies = []
+    for _ in range(20):
+        started = time.perf_counter()
+        response = await client.post("/api/zakat", json=ZAKAT)
+        latencies.append(time.perf_counter() - started)
+        assert response.status_code == 200
+    # Every calculator call finished while the price lookup was still stuck upstream
+    assert not price_request.done()
+    assert np.percentile(latencies, 99) < 0.25
+
+    # The price lookup gives up at the fetch budget and falls back
+    response = await price_request
+    assert response.status_code == 200
+    assert response.json()["source"].startswith("fallback")
+
+
+async def test_gold_and_silver_are_fetched_concurrently(upstream):
+    async def slow_quotes(request):
+        await asyncio.sleep(0.2)
+        price = 2650.0 if "XAU" in request.url.path else 31.0
+        return httpx.Response(200, json={"price": price})
+
+    upstream(slow_quotes)
+    started = time.perf_counter()
+    result = await prices.fetch_goldapi()
+    elapsed = time.perf_counter() - started
+
+    assert result == {"gold_usd": 2650.0, "silver_usd": 31.0, "source": "goldapi.io"}
+    assert elapsed < 0.35
+
+
+async def test_exchange_rate_without_pkr_in_the_table(client, monkeypatch):
+    table = FxTable.from_rates("USD", {"USD": 1.0, "EUR": 0.9}, source="test")
+
+    async def fx_table():
+        return table
+
+    monkeypatch.setattr(prices, "get_fx_table", fx_table)
+    response = await client.get("/api/prices/exchange-rate", params={"base": "USD", "target": "EUR"})
+    assert response.status_code == 200
+    assert response.json()["usd_to_pkr"] is None
+    assert response.json()["rate"] == 0.9
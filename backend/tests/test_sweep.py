@@ -0,0 +1,75 @@
+import pytest
+
+pytestmark = pytest.mark.anyio
+
+LEASING = {
+    "vehicle_price": 5000000,
+    "lease_term_months": [24, 36, 48],
+    "residual_value_percentage": {"start": 40, "stop": 60, "step": 10},
+    "interest_rate": [8, 12],
+    "down_payment": [0, 500000]
+}
+MURABAHA = {
+    "asset_cost": 3000000,
+    "payment_term_months": {"start": 12, "stop": 60, "step": 12},
+    "payment_frequency": ["monthly", "quarterly"],
+    "profit_margin_percentage": [8, 12]
+}
+
+
+async def test_leasing_sweep_cells_match_single_leases(client):
+    response = await client.post("/api/sweep/leasing", json={**LEASING, "top_k": 3})
+    assert response.status_code == 200
+    body = response.json()
+    assert body["cells"] == 3 * 3 * 2 * 2
+    top = body["top"]
+    for i in range(3):
+        single = await client.post("/api/leasing", json={
+            "vehicle_price": 5000000,
+            "lease_term_months": int(top["lease_term_months"][i]),
+            "residual_value_percentage": top["residual_value_percentage"][i],
+            "interest_rate": top["interest_rate"][i],
+            "down_payment": top["down_payment"][i]
+        })
+        assert single.json()["monthly_payment"] == pytest.approx(top["monthly_payment"][i], abs=0.01)
+    assert top["monthly_payment"] == sorted(top["monthly_payment"])
+
+
+@pytest.mark.parametrize("axis, values", [
+    ("residual_value_percentage", [150]),
+    ("residual_value_percentage", [0]),
+    ("lease_term_months", [0.5]),
+    ("lease_term_months", {"start": 12, "stop": 18, "step": 1.5}),
+    ("lease_term_months", [-12]),
+    ("interest_rate", [-1]),
+    ("down_payment", [-100]),
+])
+async def test_leasing_sweep_rejects_values_the_single_lease_rejects(client, axis, values):
+    response = await client.post("/api/sweep/leasing", json={**LEASING, axis: values})
+    assert response.status_code == 400
+    assert axis in response.json()["detail"]
+
+
+async def test_leasing_sweep_rejects_negative_money_factor(client):
+    request = {k: v for k, v in LEASING.items() if k != "interest_rate"}
+    response = await client.post("/api/sweep/leasing", json={**request, "money_factor": [0.002, -0.001]})
+    assert response.status_code == 400
+
+
+async def test_murabaha_sweep_accepts_whole_month_ranges(client):
+    response = await client.post("/api/sweep/murabaha", json=MURABAHA)
+    assert response.status_code == 200
+    body = response.json()
+    assert body["shape"] == [5, 2, 2]
+    assert body["axes"]["payment_term_months"] == [12, 24, 36, 48, 60]
+
+
+@pytest.mark.parametrize("axis, values", [
+    ("payment_term_months", [12.5]),
+    ("payment_term_months", [0]),
+    ("profit_margin_percentage", [-5]),
+])
+async def test_murabaha_sweep_rejects_invalid_axes(client, axis, values):
+    response = await client.post("/api/sweep/murabaha", json={**MURABAHA, axis: values})
+    assert response.status_code == 400
+    assert axis in response.json()["detail"]
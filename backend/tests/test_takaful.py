@@ -0,0 +1,146 @@
+import json
+
+import numpy as np
+import pytest
+
+from app.routes import takaful
+from app.services.mortality import CommutationTable
+
+pytestmark = pytest.mark.anyio
+
+CENSUS = (
+    "age,coverage_amount,term_years,health_status\n"
+    "30,1000000,10,excellent\n"
+    "45,2500000,5,poor\n"
+    "60,500000,20,\n"
+    "200,1000000,10,good\n"
+    "52,750000,0,average\n"
+)
+
+
+def test_commutation_columns_match_hand_computed_contributions():
+    # Three ages at 25%: v = 0.8, p30 = 0.9, so for two years of cover
+    # A = 0.8 * 0.1 + 0.64 * 0.9 * 0.2 = 0.1952 and a = 1 + 0.8 * 0.9 = 1.72
+    table = CommutationTable(np.array([0.1, 0.2, 1.0]), 30, 0.25)
+    assert table.net_single_contribution(30, 2, 1000) == pytest.approx(195.2)
+    assert table.net_annual_contribution(30, 2, 1000) == pytest.approx(1000 * 0.1952 / 1.72)
+    # Cover past the end of the table stops at the last age
+    assert table.net_annual_contribution(31, 5, 1000) == pytest.approx(table.net_annual_contribution(31, 2, 1000))
+
+
+async def test_group_json_prices_members_like_single_quotes(client):
+    response = await client.post("/api/takaful/group", content=CENSUS)
+    assert response.status_code == 200
+    body = response.json()
+    members = body["members"]
+    assert members["status"] == ["ok", "ok", "ok", "rejected", "rejected"]
+    # A blank health status prices as good
+    assert members["health_status"][2] == "good"
+
+    for i in range(3):
+        single = await client.post("/api/takaful", json={
+            "age": members["age"][i],
+            "coverage_amount": members["coverage_amount"][i],
+            "term_years": members["term_years"][i],
+            "health_status": members["health_status"][i]
+        })
+        assert members["annual_contribution"][i] == pytest.approx(single.json()["annual_contribution"], abs=0.01)
+
+    summary = body["summary"]
+    assert summary["members"] == 3 and summary["rejected_members"] == 2
+    assert summary["total_coverage"] == 4000000
+    assert summary["total_annual_contribution"] == pytest.approx(sum(members["annual_contribution"]), abs=0.05)
+
+
+async def test_group_streamed_formats_match_json(client, monkeypatch):
+    monkeypatch.setattr(takaful, "GROUP_CHUNK_MEMBERS", 2)
+    quote = (await client.post("/api/takaful/group", content=CENSUS)).json()
+
+    csv = await client.post("/api/takaful/group?format=csv", content=CENSUS)
+    lines = csv.text.splitlines()
+    assert lines[0] == ",".join(takaful.GROUP_MEMBER_COLUMNS)
+    rows = [line.split(",") for line in lines[1:]]
+    assert [int(r[0]) for r in rows] == [1, 2, 3, 4, 5]
+    assert [float(r[-1]) for r in rows] == pytest.approx(quote["members"]["annual_contribution"], abs=0.01)
+
+    ndjson = await client.post("/api/takaful/group?format=ndjson", content=CENSUS)
+    records = [json.loads(line) for line in ndjson.text.splitlines()]
+    assert [r["status"] for r in records[:-1]] == quote["members"]["status"]
+    assert records[-1]["summary"]["total_annual_contribution"] == quote["summary"]["total_annual_contribution"]
+
+
+async def test_group_json_rejects_censuses_over_the_member_cap(client, monkeypatch):
+    monkeypatch.setattr(takaful, "GROUP_JSON_MAX_MEMBERS", 4)
+    monkeypatch.setattr(takaful, "GROUP_CHUNK_MEMBERS", 2)
+    response = await client.post("/api/takaful/group", content=CENSUS)
+    assert response.status_code == 400
+    assert "format=ndjson" in response.json()["detail"]
+
+    streamed = await client.post("/api/takaful/group?format=ndjson", content=CENSUS)
+    assert streamed.status_code == 200
+    assert len(streamed.text.splitlines()) == 6
+
+
+async def test_group_rejects_a_census_without_required_columns(client):
+    response = await client.post("/api/takaful/group", content="age,term_years\n30,10\n")
+    assert response.status_code == 400
+
+
+def hand_computed_net_annual(qx, age, term, coverage, interest_rate):
+    """S A / a from survival probabilities year by year, without commutation columns"""
+    v = 1 / (1 + interest_rate)
+    survival, insurance, annuity = 1.0, 0.0, 0.0
+    for t in range(term):
+        annuity += v ** t * survival
+        insurance += v ** (t + 1) * survival * qx[age + t]
+        survival *= 1 - qx[age + t]
+    return coverage * insurance / annuity
+
+
+async def test_contribution_matches_hand_computed_value(client):
+    from app.services.mortality import load_mortality_table
+
+    qx = load_mortality_table("gompertz_makeham")["qx"]
+    expected = hand_computed_net_annual(qx, 40, 10, 1000000, 0.04)
+    assert expected == pytest.approx(2590.08, abs=0.01)
+
+    response = await client.post("/api/takaful", json={
+        "age": 40, "coverage_amount": 1000000, "term_years": 10, "health_status": "good",
+        "interest_rate": 0.04, "wakalah_fee": 0.25
+    })
+    body = response.json()
+    assert body["net_annual_contribution"] == pytest.approx(expected, abs=0.01)
+    assert body["annual_contribution"] == pytest.approx(expected / 0.75, abs=0.01)
+    assert body["wakalah_fee"] == pytest.approx(expected / 0.75 - expected, abs=0.02)
+    assert body["covered_years"] == 10
+
+
+@pytest.mark.parametrize("age", [0, 111, 200])
+async def test_age_outside_the_table_is_rejected(client, age):
+    response = await client.post("/api/takaful", json={
+        "age": age, "coverage_amount": 1000000, "term_years": 10, "health_status": "good"
+    })
+    assert response.status_code == 400
+
+
+async def test_unknown_health_status_prices_as_good(client):
+    quotes = []
+    for health_status in ("good", "Unknown", "GOOD"):
+        response = await client.post("/api/takaful", json={
+            "age": 35, "coverage_amount": 1000000, "term_years": 15, "health_status": health_status
+        })
+        quotes.append(response.json())
+    assert quotes[0] == quotes[1] == quotes[2]
+
+    poor = await client.post("/api/takaful", json={
+        "age": 35, "coverage_amount": 1000000, "term_years": 15, "health_status": "poor"
+    })
+    assert poor.json()["annual_contribution"] > quotes[0]["annual_contribution"]
+
+
+async def test_legacy_alias_returns_the_same_quote(client):
+    request = {"age": 50, "coverage_amount": 500000, "term_years": 20, "health_status": "average"}
+    current = await client.post("/api/takaful", json=request)
+    legacy = await client.post("/api/api/takaful", json=request)
+    assert current.status_code == legacy.status_code == 200
+    assert legacy.json() == current.json()
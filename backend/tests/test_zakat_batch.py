@@ -0,0 +1,63 @@
+import numpy as np
+import pytest
+
+from app.routes.zakat import calculate_zakat_batch
+
+pytestmark = pytest.mark.anyio
+
+RATES = {"gold_rate_per_gram": 20000, "silver_rate_per_gram": 250}
+
+ROSTER = {
+    "cash": [500000, 100000, 0, 2500000],
+    "gold": [100, 10, 0, 0],
+    "silver": [0, 200, 0, 1000],
+    "business_assets": [0, 0, 50000, 1000000],
+    "liabilities": [0, 50000, 0, 3000000]
+}
+
+
+def test_batch_function_matches_scalar_rule():
+    columns = {c: np.asarray(v, dtype=np.float64) for c, v in ROSTER.items()}
+    result = calculate_zakat_batch(**columns, gold_rate=20000, silver_rate=250)
+    nisab = 85 * 20000
+    total = columns["cash"] + columns["gold"] * 20000 + columns["silver"] * 250 + columns["business_assets"]
+    zakatable = np.maximum(total - columns["liabilities"], 0)
+    assert result["nisab"] == nisab
+    np.testing.assert_allclose(result["zakat_due"], np.where(zakatable >= nisab, zakatable * 0.025, 0))
+
+
+async def test_batch_matches_single_household_endpoint(client):
+    batch = (await client.post("/api/zakat/batch", json={**ROSTER, **RATES})).json()
+    assert batch["count"] == 4
+
+    for i in range(4):
+        household = {c: v[i] for c, v in ROSTER.items()}
+        single = (await client.post("/api/zakat", json={**household, **RATES})).json()
+        assert batch["zakat_due"][i] == single["zakat_due"]
+        assert batch["is_zakat_applicable"][i] == single["is_zakat_applicable"]
+    assert batch["total_zakat_due"] == pytest.approx(sum(batch["zakat_due"]))
+
+
+async def test_csv_matches_columnar_payload(client):
+    header = ",".join(["household"] + list(ROSTER))
+    lines = [",".join([f"h{i}"] + [str(v[i]) for v in ROSTER.values()]) for i in range(4)]
+    response = await client.post("/api/zakat/batch/csv", params=RATES, content="\n".join([header] + lines) + "\n")
+    assert response.status_code == 200
+    columnar = (await client.post("/api/zakat/batch", json={**ROSTER, **RATES})).json()
+    assert response.json()["zakat_due"] == columnar["zakat_due"]
+
+
+async def test_omitted_columns_count_as_zero(client):
+    result = (await client.post("/api/zakat/batch", json={"cash": [2000000, 1000], **RATES})).json()
+    assert result["zakat_due"] == [50000, 0]
+    assert result["applicable_count"] == 1
+
+
+@pytest.mark.parametrize("body", [
+    {"cash": [1, 2], "gold": [1]},
+    {"cash": [-1]},
+    {}
+])
+async def test_bad_batches_are_rejected(client, body):
+    response = await client.post("/api/zakat/batch", json={**body, **RATES})
+    assert response.status_code == 400